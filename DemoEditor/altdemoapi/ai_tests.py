@@ -1,5 +1,9 @@
+import time
 import unittest
+from types import SimpleNamespace
 import ai_utils
+import load
+from resilience import CircuitOpenError
 
 new_agent = ai_utils.Agent()
 
@@ -10,9 +14,151 @@ class ResponseTests(unittest.TestCase):
     def new_response(text: str):
         return ai_utils.ResponseTemplate(text)
 
+    @staticmethod
+    def sample(num: int) -> str:
+        path = ai_utils.Agent.configure_debug_path(load.CONFIG.test_file_dir, f"test_sample{num}")
+        with open(path, "r") as file:
+            return file.read()
+
     def test_line_interpreter(self):
         self.new_response("Issues in your code:")
 
+    def test_labeled_sections(self):
+        template = ai_utils.Agent.parse_response(self.sample(5))
+        self.assertEqual(1, len(template.problem_section.internal))
+        self.assertEqual("Practice defining and using functions to encapsulate code.",
+                         template.skill_section.internal["Function Definition"])
+
+    def test_heading_variants(self):
+        template = ai_utils.Agent.parse_response(self.sample(2))
+        self.assertEqual(5, len(template.skill_section.internal))
+        self.assertIn("Debugging Techniques", template.skill_section.internal)
+
+    def test_bold_label_outside_colon(self):
+        template = ai_utils.Agent.parse_response(self.sample(1))
+        self.assertIn("Understanding Indentation", template.skill_section.internal)
+
+    def test_no_header_does_not_fail(self):
+        template = ai_utils.Agent.parse_response(self.sample(0))
+        self.assertGreater(len(template.problem_section.internal), 0)
+
+    def test_correct(self):
+        self.assertEqual("Good Job!", ai_utils.Agent.parse_response(self.sample(3)))
+
+    def test_skill_labels_like_headers(self):
+        template = ai_utils.Agent.parse_response(
+            "**Problems:**\n1. The input is never converted to int\n**Skills:**\n"
+            "**Error Handling:** Use try/except.\n**Problem Solving:** Break the task into steps.\n"
+            "**Debugging Errors:** Read the traceback.\n**Errors:** Check types before using values."
+        )
+        self.assertEqual(["1. The input is never converted to int"], template.problem_section.internal)
+        self.assertEqual(["Error Handling", "Problem Solving", "Debugging Errors", "Errors"],
+                         list(template.skill_section.internal))
+
+
+class PromptBuilderTests(unittest.TestCase):
+
+    def test_context_sent_once(self):
+        builder = ai_utils.PromptBuilder("explain my mistakes", 100)
+        instructions, input_value = builder.code_check("print hi", "print('hi')", "python")
+        self.assertIn("explain my mistakes", instructions)
+        self.assertNotIn("explain my mistakes", input_value)
+
+    def test_trim_to_budget(self):
+        builder = ai_utils.PromptBuilder("", 50)
+        code = "\n".join(f"value_{num} = {num}" for num in range(500))
+        trimmed = builder.trim_code(code)
+        self.assertLessEqual(builder.estimate_tokens(trimmed), 60)
+        self.assertTrue(trimmed.startswith("value_0 = 0"))
+        self.assertTrue(trimmed.endswith("value_499 = 499"))
+        self.assertIn("lines omitted", trimmed)
+        self.assertNotIn("#", trimmed)
+
+    def test_trim_single_long_line(self):
+        builder = ai_utils.PromptBuilder("", 50)
+        code = ";".join(f"v{num}={num}" for num in range(500))
+        trimmed = builder.trim_code(code)
+        self.assertLessEqual(builder.estimate_tokens(trimmed), 60)
+        self.assertTrue(trimmed.startswith("v0=0;v1=1;"))
+        self.assertTrue(trimmed.endswith(";v499=499"))
+        self.assertIn("characters omitted", trimmed)
+
+
+class StructuredResponseTests(unittest.TestCase):
+
+    def test_feedback_maps_to_template(self):
+        template = ai_utils.Agent.parse_structured_response(
+            '{"correct": false, "problems": ["No function defined"], '
+            '"skills": [{"label": "Functions", "description": "Define and call functions."}]}'
+        )
+        self.assertEqual(["No function defined"], template.problem_section.internal)
+        self.assertEqual({"Functions": "Define and call functions."}, template.skill_section.internal)
+
+    def test_correct(self):
+        self.assertEqual("Good Job!", ai_utils.Agent.parse_structured_response(
+            '{"correct": true, "problems": [], "skills": []}'))
+
+    def test_falls_back_to_text(self):
+        template = ai_utils.Agent.parse_structured_response("**Problems:**\n1. Typo\n**Skills:**\n1. **Spelling:** Check names")
+        self.assertEqual({"Spelling": "Check names"}, template.skill_section.internal)
+
+    def test_non_object_json_falls_back_to_text(self):
+        template = ai_utils.Agent.parse_structured_response('"Looks good"')
+        self.assertEqual(['"Looks good"'], template.problem_section.internal)
+        self.assertIsInstance(ai_utils.Agent.parse_structured_response("[]"), ai_utils.ResponseTemplate)
+
+    def test_hints_from_non_object_json(self):
+        agent = ai_utils.Agent()
+        agent.hedge_percentile = None
+        agent.uses_structured = lambda model: True
+        for output, hints in (('"1. Think about the loop bounds"', []), ("[1, 2]", []),
+                              ('{"hints": ["Think about the loop bounds", 3]}', ["Think about the loop bounds"])):
+            with self.subTest(output=output):
+                create = lambda **request: SimpleNamespace(output_text=output, usage=None)
+                agent.client = SimpleNamespace(responses=SimpleNamespace(create=create))
+                agent.answer_cache.clear()
+                if hints:
+                    self.assertEqual(hints, agent.get_hints("Sum a list"))
+                else:
+                    with self.assertRaises(Exception) as raised:
+                        agent.get_hints("Sum a list")
+                    self.assertNotIsInstance(raised.exception, AttributeError)
+
+
+class CategorizationTests(unittest.TestCase):
+
+    def test_stray_lines(self):
+        categories = ai_utils.Agent.categorization_to_dict(
+            "Here are the groups:\n**Loops** {\n    a@x.com,\n    b@x.com\n},\nFunctions: {\n    c@x.com\n}\nDone"
+        )
+        self.assertEqual({"Loops": ["a@x.com", "b@x.com"], "Functions": ["c@x.com"]}, categories)
+
+
+class AnswerCacheTests(unittest.TestCase):
+
+    def setUp(self):
+        self.agent = ai_utils.Agent()
+        create = lambda **request: SimpleNamespace(output_text=f"{request['model']} answer", usage=None)
+        self.agent.client = SimpleNamespace(responses=SimpleNamespace(create=create))
+        self.agent.hedge_percentile = None
+
+    def open_breaker(self):
+        self.agent.breaker.state = self.agent.breaker.OPEN
+        self.agent.breaker.opened_at = time.monotonic()
+
+    def test_cached_per_model(self):
+        self.agent.make_request("check", "code", model="model-a")
+        self.open_breaker()
+        self.assertEqual("model-a answer", self.agent.make_request("check", "code", model="model-a"))
+        with self.assertRaises(CircuitOpenError):
+            self.agent.make_request("check", "code", model="model-b")
+
+    def test_cached_per_format(self):
+        self.agent.make_request("check", "code", model="model-a")
+        self.open_breaker()
+        with self.assertRaises(CircuitOpenError):
+            self.agent.make_request("check", "code", model="model-a", schema=("feedback", {"type": "object"}))
+
 
 class OpenAITests(unittest.TestCase):
 
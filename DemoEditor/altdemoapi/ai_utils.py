@@ -17,10 +17,121 @@ ResponseTemplate:
 """
 
 
-from openai import OpenAI
+from collections import deque, OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from resilience import CircuitBreaker, CircuitOpenError, LatencyTracker, hedged
+import hashlib
 import load
-import re
+import json
 import os
+import time
+
+# Header phrases for the two response sections -- a short line ending in ':' or a markdown heading is a header
+# only when its text as a whole is one of these (optionally followed by a suffix such as 'in your code'), so
+# skill labels like 'Error Handling:' or 'Problem Solving:' are not mistaken for headers
+PROBLEM_HEADERS = ("problem", "problems", "issue", "issues", "error", "errors", "mistake", "mistakes",
+                   "problems found", "issues found", "errors found", "possible issues", "potential issues",
+                   "common mistakes")
+SKILL_HEADERS = ("skill", "skills", "skills to work on", "skills to improve", "skills to practice",
+                 "skills to develop", "skills for improvement", "suggested skills", "recommended skills")
+HEADER_SUFFIXES = (" in your code", " with your code", " in the code", " with the code")
+MAX_HEADER_LENGTH = 80
+MARKDOWN_CHARS = "*_#`> \t"
+
+# JSON schemas for structured-output mode -- map directly onto ResponseTemplate and the category dict
+FEEDBACK_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "correct": {"type": "boolean"},
+        "problems": {"type": "array", "items": {"type": "string"}},
+        "skills": {
+            "type": "array",
+            "items": {
+                "type": "object",
+                "properties": {"label": {"type": "string"}, "description": {"type": "string"}},
+                "required": ["label", "description"],
+                "additionalProperties": False,
+            },
+        },
+    },
+    "required": ["correct", "problems", "skills"],
+    "additionalProperties": False,
+}
+FALLBACK_HINT = "Start by restating the prompt in your own words, then write down the inputs and the expected output."
+ANSWER_CACHE_SIZE = 512
+
+HINTS_SCHEMA = {
+    "type": "object",
+    "properties": {"hints": {"type": "array", "items": {"type": "string"}}},
+    "required": ["hints"],
+    "additionalProperties": False,
+}
+
+CATEGORY_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "categories": {
+            "type": "array",
+            "items": {
+                "type": "object",
+                "properties": {"name": {"type": "string"}, "students": {"type": "array", "items": {"type": "string"}}},
+                "required": ["name", "students"],
+                "additionalProperties": False,
+            },
+        },
+    },
+    "required": ["categories"],
+    "additionalProperties": False,
+}
+
+
+def _strip_list_marker(line: str) -> str:
+    """
+    Remove a leading list marker ('1.', '2)', '-', '*', '+', '•') from a stripped line
+    """
+    i = 0
+    while i < len(line) and line[i].isdigit():
+        i += 1
+    if 0 < i < len(line) and line[i] in ".)":
+        return line[i + 1:].lstrip()
+    if line[:2] in ("- ", "* ", "+ ", "• "):
+        return line[2:].lstrip()
+    return line
+
+
+def _is_list_item(line: str) -> bool:
+    return _strip_list_marker(line) is not line
+
+
+def _section_header(line: str):
+    """
+    Classify a stripped line as a section header
+
+    Returns
+    -------
+    tuple
+        (section name or None, text following the header on the same line)
+    """
+    if len(line) > MAX_HEADER_LENGTH or _is_list_item(line):
+        return None, ""
+    is_heading = line.startswith("#")
+    colon = line.find(":")
+    if colon == -1:
+        head, rest = line, ""
+        if not is_heading and not line.rstrip("*_").endswith(":"):
+            return None, ""
+    else:
+        head, rest = line[:colon], line[colon + 1:].lstrip(MARKDOWN_CHARS)
+    head = " ".join(head.strip(MARKDOWN_CHARS).lower().split())
+    for suffix in HEADER_SUFFIXES:
+        if head.endswith(suffix):
+            head = head[:-len(suffix)]
+            break
+    if head in SKILL_HEADERS:
+        return "skills", rest
+    if head in PROBLEM_HEADERS:
+        return "problems", rest
+    return None, ""
 
 
 class Section:
@@ -63,13 +174,15 @@ class SkillSection(Section):
 
     def __init__(self):
         self.internal = {}
+        self._last_label = None
 
     def append(self, line: str):
         """
-        Skill strings take the form 'LineNumber. **Skill Label:** Skill text'
-         - lines are split into label, text pairs
-         - labels are found by the head (the second star) and the tail (the first colon)
+        Skill strings usually take the form 'LineNumber. **Skill Label:** Skill text'
+         - list markers and markdown emphasis around the label are dropped ('**Label:**', '**Label**:', '- Label:')
          - text is everything following the first colon
+         - a list item without a colon becomes a label with empty text
+         - any other line without a colon continues the text of the previous skill
 
         Parameters
         ----------
@@ -77,11 +190,23 @@ class SkillSection(Section):
             Line of AI response text
         """
 
-        label_head = line.find("*") + 2
-        label_tail = line.find(":")
-        label = line[label_head: label_tail]
-        text = line[label_tail+1:]
+        stripped = line.strip()
+        item = _strip_list_marker(stripped)
+        colon = item.find(":")
+        if colon > 0:
+            label = item[:colon].strip(MARKDOWN_CHARS)
+            text = item[colon + 1:].lstrip(MARKDOWN_CHARS).strip()
+        elif item is not stripped or self._last_label is None:
+            label, text = item.strip(MARKDOWN_CHARS), ""
+        else:
+            previous = self.internal[self._last_label]
+            self.internal[self._last_label] = f"{previous} {item}" if previous else item
+            return
+
+        if not label:
+            return
         self.internal[label] = text
+        self._last_label = label
 
 
 class ResponseTemplate:
@@ -93,35 +218,77 @@ class ResponseTemplate:
         self.problem_section = ProblemSection()
         self.skill_section = SkillSection()
         self.text = text
+        # Set on locally generated stand-in feedback (AI unavailable)
+        self.fallback = False
 
     def str_to_template(self):
         """
-        Convert AI response to template
+        Convert AI response to template in a single pass over the lines
             - Takes structure:
                 **Problems:**
                     ...
                 **Skills:**
                     ...
+            - Header variants such as '### Skills to Work On:' or 'Issues in your code:' are accepted
+            - Within Skills, bold 'Label:' lines followed by text are skills even if the label reads like a header
+            - Text before the first header is kept as problem text instead of failing the parse
         """
 
-        print(self.text)
-
-        if len(self.text) == 0 or self.text is None:
+        if self.text is None or len(self.text) == 0:
             raise Exception(load.ERRORS.null_response)
-        else:
-            lines = re.split(r"\n+", self.text)
-            curr_section = None
-            for line in lines:
-                if line.isspace():
-                    continue
-                elif "problems:" in line.lower():
-                    curr_section = self.problem_section
-                elif "skills:" in line.lower():
-                    curr_section = self.skill_section
-                elif curr_section is None:
-                    raise Exception(load.ERRORS.ai_response_format)
-                else:
-                    curr_section.append(line)
+
+        curr_section = None
+        for line in self.text.splitlines():
+            line = line.strip()
+            if not line:
+                continue
+            section, rest = _section_header(line)
+            if curr_section is self.skill_section and rest and line.startswith("**"):
+                # '**Errors:** handle bad input' inside Skills is a skill label, not a new section
+                section = None
+            if section is not None:
+                curr_section = self.skill_section if section == "skills" else self.problem_section
+                if rest:
+                    curr_section.append(rest)
+            elif curr_section is None:
+                self.default_message(line)
+            else:
+                curr_section.append(line)
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "ResponseTemplate":
+        """
+        Build a template from a structured (FEEDBACK_SCHEMA) response
+            - text is rendered in the **Problems:** / **Skills:** layout so callers showing `text` are unchanged
+        """
+        problems = [problem.strip() for problem in data.get("problems", []) if problem.strip()]
+        skills = [(skill["label"].strip(), skill["description"].strip()) for skill in data.get("skills", [])]
+
+        lines = ["**Problems:**"]
+        lines += [f"{num}. {problem}" for num, problem in enumerate(problems, 1)]
+        lines.append("**Skills:**")
+        lines += [f"{num}. **{label}:** {description}" for num, (label, description) in enumerate(skills, 1)]
+
+        template = cls("\n".join(lines))
+        template.problem_section.internal.extend(problems)
+        template.skill_section.internal.update(skills)
+        return template
+
+    def to_dict(self) -> dict:
+        """
+        Inverse of from_dict -- used to send a parsed response between processes
+        """
+        return {
+            "problems": list(self.problem_section.internal),
+            "skills": [{"label": label, "description": description}
+                       for label, description in self.skill_section.internal.items()],
+        }
+
+    def is_low_confidence(self) -> bool:
+        """
+        A parsed response missing either section is treated as low confidence and escalated
+        """
+        return not self.problem_section.internal or not self.skill_section.internal
 
     def skill_list(self):
         skills = ""
@@ -137,6 +304,73 @@ class FormatTemplate:
         self.text = text
 
 
+class PromptBuilder:
+    """
+    PromptBuilder assembles code-check requests so that the longest possible prefix is identical across requests
+    (providers cache repeated prompt prefixes)
+        - instructions: role + context, static for the whole process and sent once
+        - input: question prompt (shared by the whole class) before the student code (unique per request)
+        - code is trimmed to a token budget, keeping its head and tail
+    """
+
+    CHARS_PER_TOKEN = 4
+
+    def __init__(self, context: str, code_token_budget=None):
+        self.instructions = f"You are a coding assistant, {context}"
+        self.code_token_budget = code_token_budget
+
+    @classmethod
+    def estimate_tokens(cls, text: str) -> int:
+        """
+        Rough token estimate (~4 characters per token for English text and code)
+        """
+        return (len(text) + cls.CHARS_PER_TOKEN - 1) // cls.CHARS_PER_TOKEN
+
+    def trim_code(self, code: str) -> str:
+        """
+        Trim code above the token budget to its first two thirds and last third, marking what was omitted
+            - whole lines are kept where possible; when even the first line does not fit (minified or single-line
+              code) characters are kept instead
+            - the marker is plain bracketed text, not a comment, as the code may be in any language
+        """
+        if not self.code_token_budget or self.estimate_tokens(code) <= self.code_token_budget:
+            return code
+        char_budget = self.code_token_budget * self.CHARS_PER_TOKEN
+        lines = code.splitlines()
+
+        head, used = [], 0
+        for line in lines:
+            if used + len(line) + 1 > char_budget * 2 // 3:
+                break
+            head.append(line)
+            used += len(line) + 1
+        if not head:
+            head_chars, tail_chars = char_budget * 2 // 3, char_budget // 3
+            omitted = len(code) - head_chars - tail_chars
+            return f"{code[:head_chars]}\n[... {omitted} characters omitted ...]\n{code[-tail_chars:]}"
+        tail, used = [], 0
+        for line in reversed(lines[len(head):]):
+            if used + len(line) + 1 > char_budget // 3:
+                break
+            tail.append(line)
+            used += len(line) + 1
+        tail.reverse()
+
+        omitted = len(lines) - len(head) - len(tail)
+        return "\n".join(head + [f"[... {omitted} lines omitted ...]"] + tail)
+
+    def code_check(self, prompt: str, code_sample: str, language: str) -> tuple[str, str]:
+        """
+        Returns
+        -------
+        tuple
+            (instructions, input) for Agent.make_request
+        """
+        input_value = (f"I was asked to write code that behaves as follows:\n{prompt}\n\n"
+                       f"My {language} code:\n{self.trim_code(code_sample)}")
+        return self.instructions, input_value
+
+
 class Agent:
     """
     Agent defines a wrapper class for the OpenAI API
@@ -147,6 +381,30 @@ class Agent:
     def __init__(self):
         self.api_key = load.OPEN_AI_API_KEY
         self.ai_context = load.CONFIG.ai_context
+        # Default model for tasks without a route in CONFIG.ai_routes
+        self.model = "gpt-4o"
+        self.routes: dict[str, dict] = load.CONFIG.ai_routes or {}
+        # JSON-schema responses when enabled -- applied per request to models that support them,
+        # older models use the text parsers
+        self.structured = bool(load.CONFIG.ai_structured_output)
+        self.prompt_builders = {
+            True: PromptBuilder(load.CONFIG.ai_structured_context, load.CONFIG.ai_code_token_budget),
+            False: PromptBuilder(self.ai_context, load.CONFIG.ai_code_token_budget),
+        }
+        # Token counts of recent requests: {task, model, prompt_tokens, completion_tokens, cached_tokens, latency}
+        self.usage_log = deque(maxlen=1000)
+        # Recent outputs by (task, input), served when a model times out
+        self.answer_cache: OrderedDict[str, str] = OrderedDict()
+
+        # Fail fast while the provider is failing or slow, and optionally hedge slow requests
+        breaker_conf = load.CONFIG.ai_breaker or {}
+        self.breaker = CircuitBreaker(failure_threshold=breaker_conf.get("failure_threshold", 5),
+                                      slow_call_seconds=breaker_conf.get("slow_call_seconds"),
+                                      cooldown=breaker_conf.get("cooldown_seconds", 30))
+        hedge_conf = load.CONFIG.ai_hedge or {}
+        self.hedge_percentile = hedge_conf.get("percentile", 95) if hedge_conf.get("enabled") else None
+        self.latency = LatencyTracker(min_samples=hedge_conf.get("min_samples", 20))
+        self.executor = ThreadPoolExecutor(max_workers=8, thread_name_prefix="ai-hedge")
         
         # Check if API key is set
         if not self.api_key:
@@ -155,7 +413,12 @@ class Agent:
                 "Please set it in your .env file or environment variables."
             )
         
+        # The SDK is imported here rather than at module import so workers that never build an agent skip it
+        from openai import OpenAI, APITimeoutError
+
         self.client = OpenAI(api_key=self.api_key,)
+        # Failures that mean "no answer right now" rather than a bad request
+        self.unavailable_errors = (APITimeoutError, CircuitOpenError)
 
     @staticmethod
     def _write_sample(file: str, text: str):
@@ -177,13 +440,50 @@ class Agent:
     def _exists(path: str) -> bool:
         return os.path.exists(path)
 
-    def code_check(self, prompt: str, code_sample: str, language: str, debug_path=None) -> str:
-        return self.make_request(instructions=f"You are a coding assistant, {self.ai_context}",
-                                 input_value=f"""I was asked to write code that behaves as follows:\n{prompt}\n
-                                      can you {self.ai_context}, my {language} code:\n{code_sample}""",
-                                 debug_path=debug_path)
+    def uses_structured(self, model: str) -> bool:
+        return self.structured and model in (load.CONFIG.ai_structured_models or [])
+
+    def route(self, task: str, input_tokens: int = 0) -> list[str]:
+        """
+        Models to try for a task, cheapest first
 
-    def generate_skills(self, skills, debug_path=None):
+        Routes come from CONFIG.ai_routes as {task: {model, escalate_model, large_input_tokens, timeout}}
+            - the escalation model is tried after a parse failure or a low-confidence response
+            - inputs above large_input_tokens go straight to the escalation model
+        """
+        route = self.routes.get(task, {})
+        primary = route.get("model", self.model)
+        escalate = route.get("escalate_model")
+        large_input_tokens = route.get("large_input_tokens")
+        if escalate and large_input_tokens and input_tokens > large_input_tokens:
+            return [escalate]
+        if not escalate or escalate == primary:
+            return [primary]
+        return [primary, escalate]
+
+    def code_check(self, prompt: str, code_sample: str, language: str, debug_path=None, model=None) -> str:
+        model = model or self.route("code_check")[0]
+        structured = self.uses_structured(model)
+        instructions, input_value = self.prompt_builders[structured].code_check(prompt, code_sample, language)
+        return self.make_request(instructions=instructions,
+                                 input_value=input_value,
+                                 debug_path=debug_path,
+                                 schema=("feedback", FEEDBACK_SCHEMA) if structured else None,
+                                 task="code_check",
+                                 model=model)
+
+    def generate_skills(self, skills, debug_path=None, model=None):
+        model = model or self.route("categorize")[0]
+        if self.uses_structured(model):
+            return self.make_request(instructions="You are a categorizing agent, group students into categories "
+                                                  "by the similarity of the skills they need to work on",
+                                     input_value=f"""Group the following students into categories based on skill
+                                                    similarity, listing each student's index under its category:
+                                                    {skills}""",
+                                     debug_path=debug_path,
+                                     schema=("categories", CATEGORY_SCHEMA),
+                                     task="categorize",
+                                     model=model)
         context = """
         The following inputs take the form:
         <email> {
@@ -203,30 +503,153 @@ class Agent:
                                  input_value=f"""Group the following into categories based on skill similarity,
                                                 using the input, output requirements:
                                                 {skills}""",
-                                 debug_path=debug_path)
+                                 debug_path=debug_path,
+                                 task="categorize",
+                                 model=model)
 
     def get_help(self, prompt, debug_path=None):
         context = """
             Help me get started with the following coding prompt without giving me the answer, keep it vague.
         """
-        return self.make_request(instructions=f"You are a coding assistant, {self.ai_context}",
-                                 input_value=prompt,
-                                 debug_path=debug_path)
+        try:
+            return self.make_request(instructions=f"You are a coding assistant, {context}",
+                                     input_value=prompt,
+                                     debug_path=debug_path,
+                                     task="hint")
+        except self.unavailable_errors:
+            print("Warning: hint request unavailable, using fallback hint")
+            return FALLBACK_HINT
+
+    @staticmethod
+    def _list_items(text: str) -> list[str]:
+        return [_strip_list_marker(line.strip()) for line in text.splitlines() if _is_list_item(line.strip())]
+
+    def get_hints(self, prompt, levels: int = 3, debug_path=None) -> list[str]:
+        """
+        Tiered hints for a coding prompt, from a vague nudge to a concrete next step, in one request
+
+        Returns
+        -------
+        list[str]
+            Up to `levels` hints, most general first
 
-    def make_request(self, instructions, input_value, debug_path=None) -> str:
+        Raises
+        ------
+        Exception
+            If no hints could be parsed from the response
+        """
+        model = self.route("hint")[0]
+        instructions = (f"You are a coding assistant. Write {levels} hints for the coding prompt, each more specific "
+                        f"than the last: the first a vague nudge, the last a concrete next step. Never give the "
+                        f"answer or write code.")
+        if self.uses_structured(model):
+            output = self.make_request(instructions=instructions, input_value=prompt, debug_path=debug_path,
+                                       schema=("hints", HINTS_SCHEMA), task="hint", model=model)
+            try:
+                data = json.loads(output)
+            except (TypeError, ValueError):
+                data = None
+            hints = data.get("hints", []) if isinstance(data, dict) else self._list_items(output)
+        else:
+            output = self.make_request(instructions=f"{instructions} Reply with a numbered list, one hint per line.",
+                                       input_value=prompt, debug_path=debug_path, task="hint", model=model)
+            hints = self._list_items(output)
+        hints = [hint.strip() for hint in hints if isinstance(hint, str) and hint.strip()][:levels]
+        if not hints:
+            raise Exception(load.ERRORS.ai_response_format)
+        return hints
+
+    def make_request(self, instructions, input_value, debug_path=None, schema=None, task="request",
+                     model=None) -> str:
         """
         Make request to OpenAI API.
+
+        Parameters
+        ----------
+        schema: tuple
+            Optional (name, JSON schema) pair -- requests a strict structured-output response
+        task: str
+            Task label used for routing and recorded with the request's token usage
+        model: str
+            Model to use -- defaults to the first model routed for the task
+
+        Raises
+        ------
+        APITimeoutError
+            If the model times out and no earlier answer to the same input is cached
+        CircuitOpenError
+            If the circuit breaker is open and no earlier answer to the same input is cached
         """
-        response = self.client.responses.create(
-            model="gpt-4o",
-            instructions=instructions,
-            input=input_value
-        )
+        model = model or self.route(task)[0]
+        options = {}
+        if schema is not None:
+            name, json_schema = schema
+            options["text"] = {"format": {"type": "json_schema", "name": name, "schema": json_schema, "strict": True}}
+        timeout = self.routes.get(task, {}).get("timeout")
+        if timeout:
+            options["timeout"] = timeout
+
+        def create():
+            return self.client.responses.create(
+                model=model,
+                instructions=instructions,
+                input=input_value,
+                **options
+            )
+
+        latency_key = f"{task}:{model}"
+        hedge_delay = self.latency.percentile(latency_key, self.hedge_percentile) if self.hedge_percentile else None
+        # Answers are only reused for the same model and output format -- a text answer must never be
+        # handed to the structured parser, or one model's answer served as another's
+        response_format = "text" if schema is None else json.dumps(options["text"]["format"], sort_keys=True)
+        cache_key = hashlib.sha256("\0".join((task, model, response_format, str(input_value))).encode()).hexdigest()
+        start = time.perf_counter()
+        try:
+            response = self.breaker.call(lambda: hedged(self.executor, create, hedge_delay))
+        except self.unavailable_errors as e:
+            cached = self.answer_cache.get(cache_key)
+            if cached is None:
+                raise
+            print(f"Warning: {model} unavailable for {task} ({type(e).__name__}), serving cached answer")
+            return cached
+        latency = time.perf_counter() - start
+        self.latency.add(latency_key, latency)
+        self._record_usage(task, model, response, latency)
         text = response.output_text
+
+        self.answer_cache[cache_key] = text
+        self.answer_cache.move_to_end(cache_key)
+        while len(self.answer_cache) > ANSWER_CACHE_SIZE:
+            self.answer_cache.popitem(last=False)
         if debug_path:
             self._write_sample(debug_path, text)
         return text
 
+    def _record_usage(self, task: str, model: str, response, latency: float):
+        usage = getattr(response, "usage", None)
+        details = getattr(usage, "input_tokens_details", None)
+        self.usage_log.append({
+            "task": task,
+            "model": model,
+            "prompt_tokens": getattr(usage, "input_tokens", None),
+            "completion_tokens": getattr(usage, "output_tokens", None),
+            "cached_tokens": getattr(details, "cached_tokens", None),
+            "latency": latency,
+        })
+
+    def usage_summary(self) -> dict[str, dict]:
+        """
+        Total requests and token counts per task over the recent usage log
+        """
+        summary: dict[str, dict] = {}
+        for record in self.usage_log:
+            totals = summary.setdefault(record["task"], {"requests": 0, "prompt_tokens": 0,
+                                                         "completion_tokens": 0, "cached_tokens": 0})
+            totals["requests"] += 1
+            for key in ("prompt_tokens", "completion_tokens", "cached_tokens"):
+                totals[key] += record[key] or 0
+        return summary
+
     def test_request(self, prompt: str, code_sample: str, language: str):
         print(f"""Making test request: model=gpt-4o,
             instructions=You are a coding assistant, {self.ai_context},
@@ -246,16 +669,79 @@ class Agent:
         :param text:
         :return:
         """
-        if text == "correct":
+        if text.strip().strip(".!").lower() == "correct":
             return "Good Job!"
         else:
             parse_template = ResponseTemplate(text)
             parse_template.str_to_template()
         return parse_template
 
+    @staticmethod
+    def parse_structured_response(text) -> str | ResponseTemplate:
+        """
+        Parse a FEEDBACK_SCHEMA response, falling back to the text parser if it is not a JSON object
+        """
+        try:
+            data = json.loads(text)
+        except (TypeError, ValueError):
+            return Agent.parse_response(text)
+        if not isinstance(data, dict):
+            return Agent.parse_response(text)
+        if data.get("correct") and not data.get("problems"):
+            return "Good Job!"
+        return ResponseTemplate.from_dict(data)
+
+    @staticmethod
+    def fallback_feedback() -> ResponseTemplate:
+        """
+        Local stand-in feedback used when the AI provider times out
+        """
+        template = ResponseTemplate.from_dict({"problems": [load.ERRORS.ai_unavailable], "skills": []})
+        template.fallback = True
+        return template
+
+    @staticmethod
+    def checker_result_to_dict(result: str | ResponseTemplate) -> dict:
+        """
+        JSON-safe form of a run_checker result (sent back by AI workers)
+        """
+        if isinstance(result, str):
+            return {"correct": True, "text": result}
+        return dict(result.to_dict(), correct=False, text=result.text, fallback=result.fallback)
+
+    @staticmethod
+    def checker_result_from_dict(data: dict) -> str | ResponseTemplate:
+        if data["correct"]:
+            return data["text"]
+        template = ResponseTemplate.from_dict(data)
+        template.text = data["text"]
+        template.fallback = data.get("fallback", False)
+        return template
+
     def run_checker(self, prompt: str, code_sample: str, language: str, debug_path=None) -> str | ResponseTemplate:
-        output = self.code_check(prompt, code_sample, language, debug_path)
-        return self.parse_response(output)
+        """
+        Check code with the routed models, escalating on a parse failure or a low-confidence response
+        """
+        result = None
+        for model in self.route("code_check", PromptBuilder.estimate_tokens(code_sample)):
+            try:
+                output = self.code_check(prompt, code_sample, language, debug_path, model=model)
+            except self.unavailable_errors as e:
+                print(f"Warning: {model} unavailable for code_check ({type(e).__name__}), using fallback feedback")
+                return self.fallback_feedback()
+            try:
+                if self.uses_structured(model):
+                    result = self.parse_structured_response(output)
+                else:
+                    result = self.parse_response(output)
+            except Exception as e:
+                print(f"Warning: could not parse {model} response ({e}), escalating")
+                continue
+            if isinstance(result, str) or not result.is_low_confidence():
+                return result
+        if result is None:
+            raise Exception(load.ERRORS.ai_response_format)
+        return result
 
     @staticmethod
     def __build_conf(skill_map: dict[str, str]):
@@ -268,23 +754,57 @@ class Agent:
         return self.generate_skills(self.__build_conf(skill_map), debug_path)
 
     def run_skill_generator(self, skill_map: dict[str, str], debug_path=None):
-        output = self.culminate_all(skill_map, debug_path)
-        output = self.categorization_to_dict(output)
-        return output
+        """
+        Categorize students with the routed models, escalating when no categories could be parsed
+        """
+        conf = self.__build_conf(skill_map)
+        categories: dict[str, list[str]] = {}
+        for model in self.route("categorize", PromptBuilder.estimate_tokens(conf)):
+            try:
+                output = self.generate_skills(conf, debug_path, model=model)
+            except self.unavailable_errors as e:
+                print(f"Warning: {model} unavailable for categorize ({type(e).__name__})")
+                return categories
+            if self.uses_structured(model):
+                categories = self.structured_categories_to_dict(output)
+            else:
+                categories = self.categorization_to_dict(output)
+            if categories:
+                return categories
+        return categories
+
+    @staticmethod
+    def structured_categories_to_dict(category_str: str) -> dict[str, list[str]]:
+        """
+        Parse a CATEGORY_SCHEMA response, falling back to the brace-format parser if it is not valid JSON
+        """
+        try:
+            data = json.loads(category_str)
+        except (TypeError, ValueError):
+            return Agent.categorization_to_dict(category_str)
+        return {category["name"]: list(category["students"]) for category in data.get("categories", [])}
 
     @staticmethod
     def categorization_to_dict(category_str: str):
-        category_list = category_str.split("\n")
-        print(category_list)
+        """
+        Parse 'Category {' ... '}' blocks into a dict of category -> entries in a single pass
+            - markdown and trailing ':' around category names are dropped
+            - closing braces may carry a trailing comma
+            - stray lines outside a category block are ignored
+        """
         categories: dict[str, list[str]] = {}
-        current_category: str = ""
-        for line in category_list:
+        current_category = None
+        for line in category_str.splitlines():
             line = line.strip()
-            if line.endswith("{"):
-                current_category = line[:-1].strip()
-                categories[current_category] = []
-            elif line == "}":
+            if not line:
                 continue
-            else:
-                categories[current_category].append(line)
+            if line.endswith("{"):
+                current_category = line[:-1].strip(MARKDOWN_CHARS + ":")
+                categories.setdefault(current_category, [])
+            elif line.rstrip(",;") == "}":
+                current_category = None
+            elif current_category is not None:
+                entry = _strip_list_marker(line.rstrip(","))
+                if entry:
+                    categories[current_category].append(entry)
         return categories
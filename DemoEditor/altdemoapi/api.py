@@ -5,16 +5,29 @@
 __authors__ = ""
 
 import ai_utils
-from fastapi import FastAPI, Depends, HTTPException, status
-from fastapi.responses import JSONResponse
+from fastapi import FastAPI, Depends, HTTPException, Request, status
+from fastapi.responses import JSONResponse, Response, StreamingResponse
 import uuid
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
-import subprocess
 import asyncio
-import re
+import time
 from session import Session
 from redis_client import init_redis, close_redis
+from scheduler import QuestionScheduler
+from snapshot import Snapshot, SnapshotCache
+from feedback import ClusterGrader, FeedbackStore, GradingCoalescer, PENDING, READY, UNAVAILABLE
+from problem_stream import ProblemStream
+from skill_analytics import SkillAnalytics
+from hints import HintCache
+from jobs import JobQueue
+from exec_cache import ExecutionCache
+from user_service import UserService
+from submission_store import SubmissionStore
+from submission import Submission
+from oauth_service import AuthError, OAuthService
+import code_executor
+import load
 from pydantic import BaseModel
 from typing import Optional
 import json
@@ -23,14 +36,50 @@ api = FastAPI()
 # Initialize Redis on startup and close on shutdown (if available)
 @api.on_event("startup")
 async def _startup():
+    api.state.redis = None
     try:
-        await init_redis(api)
+        manager = await init_redis(api)
+        # Re-attach the shared client whenever the health probe sees Redis go down or come back
+        manager.on_change(_attach_redis)
     except Exception as e:
         # don't crash if redis is not available; fallback to in-memory session
         print(f"Warning: failed to initialize redis: {e}")
+        _attach_redis(None)
+    question_scheduler.start()
+    exec_jobs.start()
+    ai_jobs.start()
+    submission_store.start()
+    await oauth_service.start()
+    api.state.ready = True
+
+
+def _attach_redis(redis_client):
+    question_scheduler.attach(redis_client)
+    problem_stream.attach(redis_client)
+    feedback_store.attach(redis_client)
+    exec_jobs.attach(redis_client)
+    exec_cache.attach(redis_client)
+    skill_analytics.attach(redis_client)
+    hint_cache.attach(redis_client)
+    submission_store.attach(redis_client)
+    ai_jobs.attach(redis_client)
 
 @api.on_event("shutdown")
 async def _shutdown():
+    # The server has stopped accepting requests and finished open ones; let queued grading finish
+    api.state.ready = False
+    pending = grading.pending()
+    if pending:
+        drain_timeout = load.CONFIG.drain_timeout_seconds or 25
+        print(f"Draining {len(pending)} grading job(s) (up to {drain_timeout}s)")
+        done, not_done = await asyncio.wait(pending, timeout=drain_timeout)
+        if not_done:
+            print(f"Shutdown: {len(not_done)} grading job(s) did not finish")
+    await question_scheduler.stop()
+    await exec_jobs.stop()
+    await ai_jobs.stop()
+    await submission_store.stop()
+    await oauth_service.stop()
     try:
         await close_redis(api)
     except Exception:
@@ -54,55 +103,102 @@ def get_agent():
     return new_agent
 
 
-async def _schedule_end_of_question(question_id: str, duration: int):
+async def _auto_end_question(question_id: str):
     """
-    Background task that waits `duration` seconds and then ends the question
-    if it is still active. Also runs categorization like `end_session`.
+    Scheduler callback that ends the question if it is still active.
+    Also runs categorization like `end_session`.
+    Fired exactly once per question by `question_scheduler` -- either when the deadline passes
+    or as soon as every expected student has responded.
     """
-    try:
-        # Sleep for the configured duration
-        await asyncio.sleep(duration)
+    # Only proceed if this question is still active
+    if str(student_answer_session.current_question_id) != str(question_id):
+        print(f"Scheduled end: question {question_id} is no longer active, skipping auto-end.")
+        return
 
-        # Only proceed if this question is still active
-        if student_answer_session.current_question_id != question_id:
-            print(f"Scheduled end: question {question_id} is no longer active, skipping auto-end.")
-            return
+    print(f"Scheduled end: auto-ending question {question_id}")
 
-        print(f"Scheduled end: auto-ending question {question_id} after {duration} seconds")
+    # Run categorization similar to /api/endSession
+    agent = get_agent()
+    if agent is not None:
+        try:
+            skill_map = {}
+            for student_id, submission in student_answer_session.answers.items():
+                if submission.skills:
+                    skills_list = [f"{skill}: {description}" for skill, description in submission.skills]
+                    skill_map[student_id] = ", ".join(skills_list)
+
+            if skill_map:
+                categorized_skills = await asyncio.to_thread(agent.run_skill_generator, skill_map)
+                print(f"Auto-categorized skills for question {question_id}: {categorized_skills}")
+        except Exception as e:
+            print(f"Error during auto-categorization for question {question_id}: {e}")
 
-        # Run categorization similar to /api/endSession
-        agent = get_agent()
-        if agent is not None:
-            try:
-                skill_map = {}
-                for student_id, (student_code, response_template) in student_answer_session.answers.items():
-                    if hasattr(response_template, "skill_section") and hasattr(response_template.skill_section, "internal"):
-                        skills_dict = response_template.skill_section.internal
-                        skills_list = [f"{skill}: {description}" for skill, description in skills_dict.items()]
-                        skill_map[student_id] = ", ".join(skills_list)
-
-                if skill_map:
-                    categorized_skills = agent.run_skill_generator(skill_map)
-                    print(f"Auto-categorized skills for question {question_id}: {categorized_skills}")
-            except Exception as e:
-                print(f"Error during auto-categorization for question {question_id}: {e}")
+    # Finally end the question session
+    student_answer_session.end_question()
+    print(f"Question {question_id} ended by scheduler.")
 
-        # Finally end the question session
-        student_answer_session.end_question()
-        print(f"Question {question_id} ended by scheduler.")
 
-    except Exception as e:
-        print(f"Error in scheduled end for question {question_id}: {e}")
+question_scheduler = QuestionScheduler(_auto_end_question)
 
 # Security
 security = HTTPBearer()
 
-# Separate sessions for problems and student answers
-problem_session = Session()
+# Problems are broadcast through per-class streams; answers are kept in the session
+problem_stream = ProblemStream()
 student_answer_session = Session()
 
 # In-memory storage for class sections (fallback when DB isn't configured)
 classes = {}
+# join_code -> class_id, so joining a class is a dict lookup instead of a scan over every class
+class_join_codes: dict[str, str] = {}
+
+# Google ID tokens are checked locally against cached signing keys, refreshed in the background
+oauth_service = OAuthService()
+# Cached user lookups; logins at the start of a class are upserted in batches
+user_service = UserService(cache_ttl=load.CONFIG.user_cache_ttl_seconds or 300,
+                           batch_window=load.CONFIG.login_batch_window_seconds or 0.02)
+
+# Serialized snapshots of the hot teacher polling routes, keyed by session version
+snapshots = SnapshotCache()
+
+# Background AI feedback results, and per-student debounced grading of the latest submission
+feedback_store = FeedbackStore()
+grading = GradingCoalescer(feedback_store, load.CONFIG.grading_debounce_seconds or 0)
+# Submissions that are the same solution up to naming share one AI call
+cluster_grader = ClusterGrader()
+# Every answer is saved under its question: Redis right away, MySQL in batched write-behind
+submission_store = SubmissionStore(flush_interval=load.CONFIG.submission_flush_seconds or 1.0)
+# Skill rollups per class, time bucket and student, updated as feedback arrives
+skill_analytics = SkillAnalytics(bucket_seconds=load.CONFIG.skill_bucket_seconds or 86400,
+                                 history_limit=load.CONFIG.skill_history_limit or 100,
+                                 aliases=load.CONFIG.skill_aliases)
+# Tiered hints per prompt, generated in the background when the problem is created
+hint_cache = HintCache(ttl=load.CONFIG.hint_ttl_seconds or 86400)
+# Gradings deferred while the AI provider's breaker is open re-check it this often
+BREAKER_POLL_SECONDS = 1.0
+# Runs each student's submissions one at a time
+student_run_locks: dict[str, asyncio.Lock] = {}
+
+# Code execution and AI grading run on the worker services when any are up (worker.py), else in-process
+exec_jobs = JobQueue("exec", timeout=load.CONFIG.job_timeout_seconds or 60)
+ai_jobs = JobQueue("ai", timeout=load.CONFIG.job_timeout_seconds or 60)
+
+# Results of deterministic runs, so re-running unchanged code skips the interpreter
+_exec_cache_conf = load.CONFIG.exec_cache or {}
+exec_cache = ExecutionCache(ttl=_exec_cache_conf.get("ttl_seconds", 3600),
+                            max_entries=_exec_cache_conf.get("max_entries", 5000),
+                            local_entries=_exec_cache_conf.get("local_entries", 512),
+                            max_output_bytes=_exec_cache_conf.get("max_output_bytes", 64 * 1024))
+
+
+def _snapshot_response(request: Request, snapshot: Snapshot) -> Response:
+    """
+    Serve a pre-serialized snapshot, answering 304 when the client already has it
+    """
+    headers = {"ETag": snapshot.etag, "Cache-Control": "no-cache"}
+    if snapshot.matches(request.headers.get("if-none-match")):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    return Response(content=snapshot.body, media_type="application/json", headers=headers)
 
 
 # Pydantic models for OAuth
@@ -133,7 +229,7 @@ async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(s
     try:
         token = credentials.credentials
         payload = oauth_service.verify_jwt_token(token)
-        user = user_service.get_user_by_id(payload["user_id"])
+        user = await user_service.get_user_by_id(payload["user_id"])
         
         if not user:
             raise HTTPException(
@@ -151,99 +247,66 @@ async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(s
         )
 
 
-def _clean_extra_nl(lines: str):
-    """
-    handles new line translation from parsing editorRef
-    :param lines:
-    :return:
+async def _execute(code: str, stdin: Optional[str] = None, use_cache: bool = True) -> tuple[str, str, bool]:
     """
-    cleaned = re.sub(r"\r", "", lines)
-    print(f"Cleaned string: {cleaned}")
-    return cleaned
-
-
-def raw_to_file(code: dict):
-    """
-    Writes raw code input to file
-
-    Parameters
-    ----------
-    code: dict
-        Dictionary of form {"code": "..."} containing code to be executed by server
-    """
-    print(f"Got input: {code}")
-    with open("test.py", "w") as file:
-        file.write(_clean_extra_nl(code["code"]))
-
-
-def run_sub_process(py_file) -> tuple:
-    """
-    Run resulting python file
-    Returns stdout, stderr from execution
-
-    Parameters
-    ----------
+    Run a code sample, answering from the execution cache when the same deterministic run was seen before
 
     Returns
     -------
-
+    tuple
+        stdout, stderr, and whether the result came from the cache
     """
-    result = subprocess.run(f"python {py_file}", capture_output=True, text=True)
-    return result.stdout, result.stderr
+    use_cache = use_cache and (load.CONFIG.exec_cache or {}).get("enabled", True) and exec_cache.cacheable(code)
+    digest = exec_cache.key(code, stdin) if use_cache else None
+    if digest is not None:
+        cached = await exec_cache.get(digest)
+        if cached is not None:
+            return cached["out"], cached["err"], True
+
+    payload = {"code": code, "stdin": stdin}
+    result = await exec_jobs.run(payload, lambda: code_executor.execute(payload))
+    if digest is not None:
+        await exec_cache.put(digest, result)
+    return result["out"], result["err"], False
 
 
 @api.put("/api/submitCode")
-def submit_code(code: dict):
+async def submit_code(code: dict):
     """
     Route for code submission and execution
     Server gets code sample from front-end and returns output and error details
+    codeSample may carry "stdin", and "cache": false for programs whose output should never be reused
     :param code:
     :return:
     """
-    raw_to_file(code["codeSample"])
-    out, err = run_sub_process("test.py")
-    return {"status": "received", "out": out, "err": err}
+    sample = code["codeSample"]
+    out, err, cached = await _execute(sample["code"], sample.get("stdin"), sample.get("cache", True))
+    return {"status": "received", "out": out, "err": err, "cached": cached}
+
+def _problem_response(entry) -> dict:
+    if entry is None:
+        return {"status": "queue empty"}
+    offset, problem = entry
+    return {
+        "status": "queue has element",
+        "prompt": problem["prompt"],
+        "duration": problem.get("duration"),
+        "question_id": problem.get("question_id"),
+        "offset": offset,
+    }
+
 
 @api.get("/api/peekProblem")
-async def peek_problem():
+async def peek_problem(offset: Optional[str] = None, class_id: Optional[str] = None):
     """
-    Look at the next problem WITHOUT removing it from the queue.
+    Look at the next problem for a student without recording anything server-side.
+    `offset` is the id of the last problem the student received; without it the latest problem is returned.
     """
-    redis_client = getattr(api.state, "redis", None)
     try:
-        if redis_client is not None:
-            # Look at the first item without popping
-            item = await redis_client.lindex("problems", 0)
-            if item is not None:
-                problem = json.loads(item) 
-                return {
-                    "status": "queue has element",
-                    "prompt": problem["prompt"],
-                    "duration": problem.get("duration"),
-                }
-            return {"status": "queue empty"}
-        else:
-            if problem_session.has_prompt():
-                problem = problem_session.prompt  # you implement this
-                return {
-                    "status": "queue has element",
-                    "prompt": problem["prompt"],
-                    "duration": problem.get("duration"),
-                }
-            else:
-                return {"status": "queue empty"}
-            
-    except Exception:
-        # Silently fall back to in-memory (not an error during normal operation)
-        if problem_session.has_prompt():
-            problem = problem_session.prompt
-            return {
-                "status": "queue has element",
-                "prompt": problem["prompt"],
-                "duration": problem.get("duration"),
-            }
-        else:
-            return {"status": "queue empty"}
+        return _problem_response(await problem_stream.next_after(offset, class_id))
+    except ValueError:
+        return JSONResponse(status_code=status.HTTP_400_BAD_REQUEST,
+                            content={"status": "error", "message": "invalid 'offset'"})
 
 
 @api.put("/api/createProblem")
@@ -259,7 +322,8 @@ async def create_problem(new_prompt: dict):
     expected_students: int = new_prompt.get("expected_students", 0)
 
     # Generate a question ID
-    question_id = 1234
+    question_id = uuid.uuid4().hex[:12]
+    class_id = new_prompt.get("class_id")
     
     # Bundle them into one object
     problem_data = {
@@ -268,71 +332,168 @@ async def create_problem(new_prompt: dict):
         "duration": duration,
     }
     
+    # The new question replaces the active one: drop its pending auto-end so it cannot fire mid-question
+    previous_question_id = student_answer_session.current_question_id
+    if previous_question_id is not None:
+        try:
+            await question_scheduler.cancel(previous_question_id)
+        except Exception as e:
+            print(f"Failed to cancel auto-end for question {previous_question_id}: {e}")
+
     # Start tracking this question in the session
-    student_answer_session.start_question(question_id, duration, expected_students)
+    student_answer_session.start_question(question_id, duration, expected_students, class_id)
     # Set the prompt in student_answer_session so it's available when retrieving answers
     student_answer_session.new_prompt(prompt)
-    # If duration provided, schedule a server-side auto-end task
-    if duration is not None and duration > 0:
-        try:
-            asyncio.create_task(_schedule_end_of_question(question_id, duration))
-        except Exception as e:
-            print(f"Failed to schedule auto-end for question {question_id}: {e}")
-    
-    # Try to write to Redis, fallback to in-memory session if Redis unavailable
-    redis_client = getattr(api.state, "redis", None)
+    # Register the question with the shared auto-end scheduler -- timed questions get a deadline,
+    # questions with an expected student count get an open-ended entry that `add_answer` can fire
     try:
-        if redis_client is not None:
-            await redis_client.rpush("problems", json.dumps(problem_data))
-        else:
-            problem_session.new_prompt(problem_data)
+        if duration is not None and duration > 0:
+            await question_scheduler.schedule(question_id, duration)
+        elif expected_students > 0:
+            await question_scheduler.schedule(question_id, None)
     except Exception as e:
-        print(f"Redis write failed, falling back to in-memory queue: {e}")
-        problem_session.new_prompt(problem_data)
+        print(f"Failed to schedule auto-end for question {question_id}: {e}")
+    
+    # Have hints ready before the first student asks
+    hint_cache.prefetch(prompt, lambda: _generate_hints(prompt))
+
+    # Broadcast to the class problem stream (Redis Streams, in-memory fallback)
+    offset = await problem_stream.publish(problem_data, class_id)
+
+    return {"status": "received", "question_id": question_id, "offset": offset}
+
 
-    return {"status": "received", "question_id": question_id}
+async def _generate_hints(prompt: str) -> Optional[list[str]]:
+    agent = get_agent()
+    if agent is None or agent.breaker.is_open():
+        return None
+    return await asyncio.to_thread(agent.get_hints, prompt, load.CONFIG.hint_levels or 3)
+
+
+@api.get("/api/hint")
+async def get_hint(level: int = 1):
+    """
+    Hint for the current problem, `level` 1 being the most general
+    Only the active problem's prompt is served, so callers cannot trigger generation for arbitrary text.
+    Levels past the last available hint return the last one. Hints are served from the cache; a request
+    arriving before the background generation finishes waits for that same generation.
+    Returns {"level", "levels", "hint", "status": "ready" | "fallback"}
+    """
+    prompt = student_answer_session.prompt
+    if not prompt:
+        return JSONResponse(status_code=status.HTTP_404_NOT_FOUND,
+                            content={"status": "error", "message": "no active problem"})
+    hints = await hint_cache.get(prompt, lambda: _generate_hints(prompt))
+    if not hints:
+        return {"level": 1, "levels": 1, "hint": ai_utils.FALLBACK_HINT, "status": "fallback"}
+    level = max(1, min(level, len(hints)))
+    return {"level": level, "levels": len(hints), "hint": hints[level - 1], "status": "ready"}
 
 
 @api.get("/api/getProblem")
-async def get_problem():
+async def get_problem(offset: Optional[str] = None, class_id: Optional[str] = None):
     """
     Route for sending practice problem to front end
     On student front-end requesting prompt
+    Reads the class problem stream after the student's `offset` (or the latest problem without one);
+    the returned `offset` is passed back on the next call so every student gets each problem exactly once.
     :return:
     """
-    redis_client = getattr(api.state, "redis", None)
     try:
-        if redis_client is not None:
-            item = await redis_client.lpop("problems")
-            if item is not None:
-                problem = json.loads(item)
-                return {
-                    "status": "queue has element",
-                    "prompt": problem["prompt"],
-                    "duration": problem.get("duration"),
-                }
-            return {"status": "queue empty"}
+        return _problem_response(await problem_stream.next_after(offset, class_id))
+    except ValueError:
+        return JSONResponse(status_code=status.HTTP_400_BAD_REQUEST,
+                            content={"status": "error", "message": "invalid 'offset'"})
+
+
+async def _check_code(prompt: str, student_code: str):
+    """
+    Run the AI checker on an AI worker when one is up, otherwise with this process's agent
+    Returns the run_checker result, or None when no agent is available
+    """
+    def local():
+        agent = get_agent()  # Use the safe getter that initializes lazily
+        if agent is None:
+            return None
+        return ai_utils.Agent.checker_result_to_dict(agent.run_checker(prompt, student_code, "python"))
+
+    result = await ai_jobs.run({"prompt": prompt, "code": student_code, "language": "python"}, local)
+    return None if result is None else ai_utils.Agent.checker_result_from_dict(result)
+
+
+async def _grade_submission(feedback_id: str, student: str, student_code: str, seq: int, prompt: str,
+                            question_id: Optional[str] = None, class_id: Optional[str] = None):
+    """
+    Background AI analysis for a submission
+    Stores the result against `feedback_id` and attaches the parsed feedback to the student's answer.
+    `question_id` and `class_id` are those the answer was submitted under -- the session may have ended
+    the question or moved on by the time grading finishes.
+    """
+    ai_response = None
+    template = None
+    try:
+        if load.CONFIG.cluster_grading:
+            template = await cluster_grader.grade(prompt, student_code, lambda: _check_code(prompt, student_code))
         else:
-            if problem_session.has_prompt():
-                problem = problem_session.prompt
-                return {
-                    "status": "queue has element",
-                    "prompt": problem["prompt"],
-                    "duration": problem.get("duration"),
-                }
+            template = await _check_code(prompt, student_code)
+        if template is not None:
+            # run_checker returns either a string ("Good Job!") or ResponseTemplate object
+            if isinstance(template, str):
+                ai_response = template
             else:
-                return {"status": "queue empty"}
-    except Exception:
-        # Silently fall back to in-memory (not an error during normal operation)
-        if problem_session.has_prompt():
-            problem = problem_session.prompt
-            return {
-                "status": "queue has element",
-                "prompt": problem["prompt"],
-                "duration": problem.get("duration"),
-            }
-        else:
-            return {"status": "queue empty"}
+                ai_response = template.text if hasattr(template, 'text') else str(template)
+    except Exception as e:
+        print(f"Warning: AI analysis failed ({e}), storing answer without AI feedback")
+        template = None
+
+    counted = False
+    if template is not None:
+        attached = student_answer_session.attach_feedback(student, seq, template)
+        # Once the teacher has moved on the answer is no longer in the session, but it still counts
+        # towards its own question
+        moved_on = student_answer_session.current_question_id not in (None, question_id)
+        counted = (attached or moved_on) and question_id is not None and not getattr(template, "fallback", False)
+        if attached or moved_on:
+            graded = student_answer_session.answers[student] if attached \
+                else Submission.from_response(student, student_code, template, seq)
+            await submission_store.save(question_id, graded)
+    if counted:
+        # A correct answer records no skills, replacing any the student's earlier attempt had
+        skills = [] if isinstance(template, str) else template.skill_section.internal.keys()
+        try:
+            await skill_analytics.record(class_id, student, question_id, skills)
+        except Exception as e:
+            print(f"Warning: could not record skill analytics ({e})")
+    await feedback_store.complete(feedback_id, ai_response or "AI analysis unavailable",
+                                  READY if ai_response else UNAVAILABLE)
+    await _end_if_all_responded(question_id)
+
+
+async def _end_if_all_responded(question_id: Optional[str]):
+    """
+    End the question right away once every expected student has responded and every answer to it has
+    been graded, so the summary taken when it ends sees all the skills
+    """
+    if question_id is None or question_id != student_answer_session.current_question_id \
+            or not student_answer_session.expected_reached():
+        return
+    # The grading job calling this is still listed until it returns
+    current = asyncio.current_task()
+    if any(task is not current for task in grading.pending(question_id)):
+        return
+    await question_scheduler.fire_now(question_id)
+
+
+def _after_breaker(agent, job):
+    """
+    Wrap a grading job so it starts once the agent's circuit breaker has cooled down (open or probing
+    breakers are re-checked every BREAKER_POLL_SECONDS)
+    """
+    async def deferred():
+        while agent.breaker.is_open():
+            await asyncio.sleep(BREAKER_POLL_SECONDS)
+        await job()
+    return deferred
 
 
 @api.post('/api/studentAnswers')
@@ -340,45 +501,57 @@ async def create_student_answers(code: dict):
     """
     Route for sending student answers of question to the backend from the front end
     Now accepts question_id directly (preferred) or falls back to prompt matching
+
+    Execution output is returned right away together with a `feedback_id`; AI analysis runs in the
+    background and is fetched from /api/feedback/{feedback_id} once `feedback_status` is no longer "pending".
     """
     try:
         print(f"Got input: {code}")
         student = code["studentAnswers"]["studentEmail"]
         student_code = code["studentAnswers"]["code"]
         
-        with open(f"{student}_run.py", "w") as file:
-            file.write(_clean_extra_nl(student_code))
-        
-        out, err = run_sub_process(f"{student}_run.py")
-        
-        # Try to get AI response, but handle gracefully if agent fails
-        ai_response = None
-        try:
-            agent = get_agent()  # Use the safe getter that initializes lazily
-            if agent is not None:
-                template = agent.run_checker(
-                    student_answer_session.prompt,
-                    student_code,
-                    "python",
-                )
-                # run_checker returns either a string ("Good Job!") or ResponseTemplate object
-                if isinstance(template, str):
-                    ai_response = template
-                else:
-                    ai_response = template.text if hasattr(template, 'text') else str(template)
-                student_answer_session.add_answer(student, student_code, template)
+        # Run a student's rapid resubmissions one at a time, off the event loop
+        async with student_run_locks.setdefault(student, asyncio.Lock()):
+            out, err, _ = await _execute(student_code, use_cache=code["studentAnswers"].get("cache", True))
+
+        # Store the answer now so the teacher sees it; feedback is attached when the analysis finishes
+        student_answer_session.add_answer(student, student_code, None)
+        seq = student_answer_session.answers[student].seq
+        # The question this answer belongs to, fixed now -- it may end before grading finishes
+        prompt = student_answer_session.prompt
+        question_id = student_answer_session.current_question_id
+        class_id = student_answer_session.class_id
+        await submission_store.save(question_id, student_answer_session.answers[student])
+        feedback_id = str(uuid.uuid4())
+        await feedback_store.create(feedback_id, student)
+
+        remote_ai = await ai_jobs.has_workers()
+        agent = None if remote_ai else get_agent()
+        if not remote_ai and agent is None:
+            # No agent configured -- this submission is never graded
+            feedback_status = UNAVAILABLE
+            ai_response = "AI analysis unavailable"
+            await feedback_store.complete(feedback_id, ai_response, UNAVAILABLE)
+            await _end_if_all_responded(question_id)
+        else:
+            feedback_status = PENDING
+            job = lambda: _grade_submission(feedback_id, student, student_code, seq, prompt, question_id, class_id)
+            if agent is not None and agent.breaker.is_open():
+                # The provider is failing -- hold the grading until the breaker lets calls through again
+                ai_response = "AI feedback deferred"
+                job = _after_breaker(agent, job)
             else:
-                # If no agent, just store the code
-                student_answer_session.add_answer(student, student_code, None)
-        except Exception as e:
-            print(f"Warning: AI analysis failed ({e}), storing answer without AI feedback")
-            student_answer_session.add_answer(student, student_code, None)
-        
+                ai_response = "AI analysis pending"
+            # Only the latest submission per student is graded; older queued ones receive its result
+            grading.submit(student, feedback_id, job, group=question_id)
+
         return {
             "status": "received",
             "out": out,
             "err": err,
-            "ai_response": ai_response or "AI analysis unavailable"
+            "feedback_id": feedback_id,
+            "feedback_status": feedback_status,
+            "ai_response": ai_response
         }
     except Exception as e:
         print(f"Error in create_student_answers: {e}")
@@ -390,6 +563,149 @@ async def create_student_answers(code: dict):
         )
 
 
+@api.post('/api/rerunAnswers')
+async def rerun_answers(data: dict = None):
+    """
+    Re-run every stored answer of the current question, e.g. against a new input
+    Body: {"stdin": "...", "concurrency": n} (both optional)
+
+    Identical programs run once and share the result. Streams NDJSON: one
+    {"student", "out", "err", "cached", "shared_with"} line per student as their program finishes,
+    then a final {"done": true, "students", "unique_programs"} line.
+    """
+    data = data or {}
+    stdin = data.get("stdin")
+    max_concurrency = load.CONFIG.batch_exec_concurrency or 8
+    concurrency = max(1, min(int(data.get("concurrency") or max_concurrency), max_concurrency))
+    groups = student_answer_session.get_answer_groups(lambda program: exec_cache.key(program, stdin))
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def run_program(program: str, students: list[str]):
+        async with semaphore:
+            try:
+                out, err, cached = await _execute(program, stdin)
+            except Exception as e:
+                out, err, cached = "", f"Execution failed: {e}", False
+        return students, out, err, cached
+
+    async def results():
+        tasks = [asyncio.create_task(run_program(program, students)) for program, students in groups.values()]
+        try:
+            for finished in asyncio.as_completed(tasks):
+                students, out, err, cached = await finished
+                for student in students:
+                    line = {"student": student, "out": out, "err": err, "cached": cached,
+                            "shared_with": len(students) - 1}
+                    yield json.dumps(line) + "\n"
+            yield json.dumps({"done": True, "students": sum(len(students) for _, students in groups.values()),
+                              "unique_programs": len(groups)}) + "\n"
+        finally:
+            # Client went away -- stop runs that have not started
+            for task in tasks:
+                task.cancel()
+
+    return StreamingResponse(results(), media_type="application/x-ndjson")
+
+
+@api.get('/api/similarAnswers')
+async def similar_answers(student: str, threshold: float = 0.5, limit: Optional[int] = None):
+    """
+    Students whose current answer resembles `student`'s (names, comments and layout ignored)
+    Returns {"student", "similar": [{"student", "similarity"}]} ordered by estimated similarity
+    """
+    if student not in student_answer_session.answers:
+        return JSONResponse(status_code=status.HTTP_404_NOT_FOUND,
+                            content={"status": "error", "message": f"no answer from {student}"})
+    matches = student_answer_session.similarity.similar(student, threshold, limit)
+    return {
+        "student": student,
+        "similar": [{"student": other, "similarity": round(score, 3)} for other, score in matches],
+    }
+
+
+@api.get('/api/answerGroups')
+async def answer_groups(threshold: float = 0.8):
+    """
+    Group the current answers by solution shape -- students linked by similarity >= `threshold`
+    """
+    return {"threshold": threshold, "groups": student_answer_session.similarity.groups(threshold)}
+
+
+@api.get('/api/analytics/skills')
+async def class_skill_analytics(class_id: Optional[str] = None, top: Optional[int] = None):
+    """
+    Most common skills across the class's latest graded answers
+    """
+    return {"class_id": class_id, "skills": await skill_analytics.class_skills(class_id, top)}
+
+
+@api.get('/api/analytics/skills/timeline')
+async def skill_timeline(class_id: Optional[str] = None, since: Optional[float] = None, top: Optional[int] = None):
+    """
+    Skill counts per time bucket (skill_bucket_seconds wide), oldest first
+    """
+    return {
+        "class_id": class_id,
+        "bucket_seconds": skill_analytics.bucket_seconds,
+        "buckets": await skill_analytics.timeline(class_id, since, top),
+    }
+
+
+@api.get('/api/analytics/students/{student}')
+async def student_skill_analytics(student: str, class_id: Optional[str] = None):
+    """
+    A student's skill counts and graded-answer history
+    """
+    return dict(await skill_analytics.student_skills(class_id, student), class_id=class_id)
+
+
+@api.get('/api/questions/{question_id}/submissions')
+async def question_submissions(question_id: str):
+    """
+    Saved submissions to a question (including ended ones), oldest first
+    """
+    try:
+        submissions = await submission_store.load(question_id)
+    except Exception as e:
+        return JSONResponse(status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                            content={"status": "error", "message": f"submissions unavailable: {e}"})
+    return {
+        "question_id": question_id,
+        "submissions": [{"student": submission.student, "seq": submission.seq, "code": submission.code,
+                         "submitted_at": submission.submitted_at, "feedback": submission.summary()}
+                        for submission in submissions],
+    }
+
+
+@api.get('/api/feedback/{feedback_id}')
+async def get_feedback(feedback_id: str, wait: float = 0):
+    """
+    Route for retrieving the background AI feedback of a submission
+    Pass `wait` (seconds, max 30) to hold the request until the feedback is ready instead of polling.
+
+    Returns:
+    {
+        "status": "success",
+        "feedback_id": str,
+        "feedback_status": "pending" | "ready" | "unavailable",
+        "ai_response": str
+    }
+    """
+    if wait > 0:
+        record = await feedback_store.wait(feedback_id, min(wait, 30))
+    else:
+        record = await feedback_store.get(feedback_id)
+    if record is None:
+        return JSONResponse(status_code=status.HTTP_404_NOT_FOUND,
+                            content={"status": "error", "message": "Unknown feedback id"})
+    return {
+        "status": "success",
+        "feedback_id": feedback_id,
+        "feedback_status": record["status"],
+        "ai_response": record["ai_response"]
+    }
+
+
 # @api.get('/api/endSession')
 # async def end_session():
 #     """
@@ -409,7 +725,7 @@ async def create_student_answers(code: dict):
 
 
 @api.get('/api/questionStatus')
-async def get_question_status():
+async def get_question_status(request: Request):
     """
     Get the status of the currently active question.
     Used by the teacher to display timer and see student response count.
@@ -426,8 +742,11 @@ async def get_question_status():
     }
     """
     try:
-        status = student_answer_session.get_question_status()
-        return status
+        # time_remaining changes every second while a question is active, so the tick is part of the key
+        tick = int(time.time()) if student_answer_session.current_question_id is not None else 0
+        snapshot = snapshots.get(("questionStatus", student_answer_session.version, tick),
+                                 student_answer_session.get_question_status)
+        return _snapshot_response(request, snapshot)
     except Exception as e:
         print(f"Error getting question status: {e}")
         return {
@@ -449,6 +768,9 @@ async def end_question_session(data: dict = None):
     }
     
     """
+    # Drop the pending auto-end deadline so the scheduler does not fire for this question
+    if student_answer_session.current_question_id is not None:
+        await question_scheduler.cancel(student_answer_session.current_question_id)
     # End the question session (clears metadata but keeps answers for retrieval)
     student_answer_session.end_question()
     
@@ -498,41 +820,80 @@ async def end_question_session(data: dict = None):
     #     }
     
 
+def _student_answers_payload() -> dict:
+    """
+    Build the getStudentAnswers payload from the current answer session
+    """
+    # 1. Retrieve the answers from the in-memory session
+    # session.py's get_answers() returns a list of code strings
+    answers = student_answer_session.get_answers()
+    
+    # 2. Retrieve metadata about the current question
+    prompt_text = student_answer_session.prompt
+    question_id = student_answer_session.current_question_id or "current_session"
+    
+    # 3. If there is no active question and no answers, return empty list
+    if not prompt_text and not answers:
+        return {
+            "status": "success",
+            "questions": []
+        }
+
+    # 4. Construct the data object exactly how the React Frontend expects it
+    # The frontend expects an array called "questions"
+    question_data = {
+        "question_id": question_id,
+        "prompt": prompt_text if prompt_text else "No active prompt",
+        "answers": answers, # List of strings containing code
+        "answer_count": len(answers)
+    }
+
+    return {
+        "status": "success",
+        "questions": [question_data]
+    }
+
+
+def _student_answers_delta_payload(since: int, limit: Optional[int]) -> dict:
+    """
+    Build one page of the incremental getStudentAnswers payload
+    """
+    page = student_answer_session.get_answer_page(since, limit)
+    return {
+        "status": "success",
+        "question_id": student_answer_session.current_question_id or "current_session",
+        "prompt": student_answer_session.prompt,
+        "answer_count": len(student_answer_session.answers),
+        **page,
+    }
+
+
 @api.get('/api/getStudentAnswers')
-async def get_student_answers():
+async def get_student_answers(request: Request, since: Optional[int] = None, cursor: Optional[int] = None,
+                              limit: Optional[int] = None):
     """
     Route to retrieve student answers to be displayed for the teacher.
     Returns a list of questions (currently just the active one) and their answers.
+    Identical polls share one serialized snapshot and get a 304 when the ETag matches.
+
+    Delta sync: pass `since` (a sequence number from `latest_seq`) to get only submissions added or
+    changed after it, `limit` to page the result, and the returned `next_cursor` as `cursor` to get
+    the following page. Each submission carries the student email, its sequence number and a
+    feedback summary.
     """
     try:
-        # 1. Retrieve the answers from the in-memory session
-        # session.py's get_answers() returns a list of code strings
-        answers = student_answer_session.get_answers()
-        
-        # 2. Retrieve metadata about the current question
-        prompt_text = student_answer_session.prompt
-        question_id = student_answer_session.current_question_id or "current_session"
-        
-        # 3. If there is no active question and no answers, return empty list
-        if not prompt_text and not answers:
-             return {
-                "status": "success",
-                "questions": []
-            }
-
-        # 4. Construct the data object exactly how the React Frontend expects it
-        # The frontend expects an array called "questions"
-        question_data = {
-            "question_id": question_id,
-            "prompt": prompt_text if prompt_text else "No active prompt",
-            "answers": answers, # List of strings containing code
-            "answer_count": len(answers)
-        }
-
-        return {
-            "status": "success",
-            "questions": [question_data] 
-        }
+        if since is None and cursor is None and limit is None:
+            snapshot = snapshots.get(("getStudentAnswers", student_answer_session.version),
+                                     _student_answers_payload)
+            return _snapshot_response(request, snapshot)
+
+        start = cursor if cursor is not None else (since or 0)
+        if limit is not None and limit <= 0:
+            return JSONResponse(status_code=status.HTTP_400_BAD_REQUEST,
+                                content={"status": "error", "message": "'limit' must be positive"})
+        snapshot = snapshots.get(("getStudentAnswers", student_answer_session.version, start, limit),
+                                 lambda: _student_answers_delta_payload(start, limit))
+        return _snapshot_response(request, snapshot)
 
     except Exception as e:
         print(f"Error retrieving student answers: {e}")
@@ -610,7 +971,7 @@ async def google_auth(request: GoogleTokenRequest):
         google_user_info = await oauth_service.verify_google_token(request.token)
         
         # Create or update user in database
-        user_info = user_service.create_or_update_user(google_user_info)
+        user_info = await user_service.create_or_update_user(google_user_info)
         
         # Create JWT token
         jwt_token = oauth_service.create_jwt_token(
@@ -626,6 +987,11 @@ async def google_auth(request: GoogleTokenRequest):
         
     except HTTPException:
         raise
+    except AuthError as e:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail=f"Invalid Google token: {e}"
+        )
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
@@ -649,7 +1015,7 @@ async def update_user_role(
     """
     Update user role (teacher/student)
     """
-    success = user_service.update_user_role(current_user["user_id"], request.role)
+    success = await user_service.update_user_role(current_user["user_id"], request.role)
     
     if success:
         return {"message": "Role updated successfully", "new_role": request.role}
@@ -682,50 +1048,76 @@ async def protected_test(current_user: dict = Depends(get_current_user)):
     }
 
 
+@api.get("/healthz")
+async def healthz():
+    """
+    Liveness probe -- the process is up and serving requests
+    """
+    return {"status": "ok"}
+
+
+@api.get("/readyz")
+async def readyz():
+    """
+    Readiness probe -- 503 until startup completes and again once shutdown starts draining
+    Redis and the worker services are reported but not required: the API falls back to in-process work
+    """
+    ready = getattr(api.state, "ready", False)
+    body = {
+        "status": "ready" if ready else "not_ready",
+        "redis_connected": getattr(api.state, "redis", None) is not None,
+        "exec_workers": await exec_jobs.has_workers(),
+        "ai_workers": await ai_jobs.has_workers(),
+    }
+    if not ready:
+        return JSONResponse(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, content=body)
+    return body
+
+
 @api.get("/api/queueStatus")
 async def queue_status():
     """
     Non-destructive debug endpoint that reports queue lengths and Redis connection status.
     Returns:
-      { redis_connected: bool, problems_len: int, student_answers_len: int, error?: str }
+      { redis_connected: bool, problem_streams: {class_id: int}, problems_len: int, student_answers_len: int,
+        job_queues: {name: {queued, workers, awaiting_reply}}, error?: str }
     """
     redis_client = getattr(api.state, "redis", None)
+    queues = (exec_jobs, ai_jobs)
     status = {
         "redis_connected": False,
-        "problems_len": None,
-        "student_answers_len": None
+        "problem_streams": problem_stream.lengths(),
+        "student_answers_len": len(student_answer_session.answers),
+        "job_queues": {queue.name: queue.status() for queue in queues},
     }
     try:
         if redis_client is not None:
-            # check connectivity and lengths
-            pong = await redis_client.ping()
+            # connectivity, every class stream and both job queues in a single round trip
+            async with redis_client.pipeline(transaction=False) as pipe:
+                pipe.ping()
+                ProblemStream.pipe_lengths(pipe)
+                for queue in queues:
+                    queue.pipe_status(pipe)
+                pong, lengths, *counts = await pipe.execute()
             status["redis_connected"] = bool(pong)
-            status["problems_len"] = await redis_client.llen("problems")
-            status["student_answers_len"] = await redis_client.llen("student_answers")
-        else:
-            # fallback to in-memory session counts
-            status["redis_connected"] = False
-            status["problems_len"] = len(problem_session.prompts)
-            status["student_answers_len"] = len(student_answer_session.prompts)
+            status["problem_streams"] = problem_stream.lengths(lengths)
+            for num, queue in enumerate(queues):
+                status["job_queues"][queue.name] = queue.status(*counts[2 * num:2 * num + 2])
     except Exception as e:
-        # On any error report it and also return in-memory counts if available
+        # On any error report it alongside the in-memory counts
         status["error"] = str(e)
-        status["redis_connected"] = False
-        try:
-            status["problems_len"] = len(problem_session.prompts)
-            status["student_answers_len"] = len(student_answer_session.prompts)
-        except Exception:
-            status["problems_len"] = None
-            status["student_answers_len"] = None
-
+    status["problems_len"] = sum(status["problem_streams"].values())
     return status
 
 
 def _generate_join_code(length=6):
-    """Generate a random alphanumeric join code for a class."""
+    """Generate a random alphanumeric join code for a class, unique among current classes."""
     import random
     import string
-    return ''.join(random.choices(string.ascii_uppercase + string.digits, k=length))
+    while True:
+        join_code = ''.join(random.choices(string.ascii_uppercase + string.digits, k=length))
+        if join_code not in class_join_codes:
+            return join_code
 
 
 @api.get("/api/classes")
@@ -768,6 +1160,7 @@ async def create_class(payload: dict):
             "description": description or "",
             "join_code": join_code,
         }
+        class_join_codes[join_code] = class_id
 
         return {"status": "success", "class": classes[class_id]}
     except Exception as e:
@@ -782,7 +1175,7 @@ async def delete_class(class_id: str):
     try:
         cid = class_id.strip()
         if cid in classes:
-            del classes[cid]
+            class_join_codes.pop(classes.pop(cid).get("join_code"), None)
             return {"status": "success", "message": "Class deleted"}
         else:
             # idempotent - return success even if not found
@@ -799,9 +1192,38 @@ async def join_class(payload: dict):
     join_code = payload.get("join_code") if isinstance(payload, dict) else None
     if not join_code:
         return JSONResponse(status_code=status.HTTP_400_BAD_REQUEST, content={"status": "error", "message": "missing 'join_code'"})
-    
-    for cid, c in classes.items():
-        if c.get("join_code") == join_code:
-            return {"status": "success", "class": c}
-    
+
+    class_id = class_join_codes.get(join_code.strip().upper())
+    if class_id in classes:
+        return {"status": "success", "class": classes[class_id]}
+
     return JSONResponse(status_code=status.HTTP_404_NOT_FOUND, content={"status": "error", "message": "Invalid join code"})
+
+
+@api.post("/api/classes/{class_id}/roster")
+async def import_class_roster(class_id: str, request: Request):
+    """
+    Import a class roster from CSV (request body, text/csv) -- columns email, name, role
+    Rows are upserted in batches, so re-importing an updated roster is safe.
+    """
+    if class_id not in classes:
+        return JSONResponse(status_code=status.HTTP_404_NOT_FOUND, content={"status": "error", "message": "Class not found"})
+    csv_text = (await request.body()).decode("utf-8", errors="replace")
+    if not csv_text.strip():
+        return JSONResponse(status_code=status.HTTP_400_BAD_REQUEST, content={"status": "error", "message": "empty roster"})
+    try:
+        result = await user_service.import_roster(class_id, csv_text)
+        return {"status": "success", **result}
+    except Exception as e:
+        return JSONResponse(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, content={"status": "error", "message": str(e)})
+
+
+@api.get("/api/classes/{class_id}/roster")
+async def get_class_roster(class_id: str):
+    """
+    Return the imported roster of a class.
+    """
+    try:
+        return {"status": "success", "roster": await user_service.get_roster(class_id)}
+    except Exception as e:
+        return JSONResponse(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, content={"status": "error", "message": str(e)})
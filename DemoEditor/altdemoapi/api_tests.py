@@ -0,0 +1,280 @@
+import asyncio
+import unittest
+from types import SimpleNamespace
+from unittest import mock
+
+from fastapi.testclient import TestClient
+
+import ai_utils
+import api
+from feedback import ClusterGrader, FeedbackStore, GradingCoalescer
+from hints import HintCache
+from jobs import JobQueue
+from problem_stream import ProblemStream
+from scheduler import QuestionScheduler
+from session import Session
+from skill_analytics import SkillAnalytics
+from submission_store import SubmissionStore
+
+FEEDBACK = '''**Problems:**
+- The loop stops one element early
+**Skills:**
+- For Loops: iterate over the whole range
+'''
+
+
+def feedback() -> ai_utils.ResponseTemplate:
+    template = ai_utils.ResponseTemplate(FEEDBACK)
+    template.str_to_template()
+    return template
+
+
+class ApiTestCase(unittest.TestCase):
+    """
+    Runs api handlers against fresh in-memory state (no Redis, no AI provider)
+    """
+
+    def setUp(self):
+        self.session = Session()
+        self.analytics = SkillAnalytics()
+        self.store = FeedbackStore()
+        self.saved = SubmissionStore(db_factory=lambda: None)
+        # code -> event the AI check waits for, to hold a grading in flight
+        self.gates: dict[str, asyncio.Event] = {}
+        self.ended: list[tuple[str, list[dict]]] = []
+
+        async def check_code(prompt, code):
+            if code in self.gates:
+                await self.gates[code].wait()
+            return feedback()
+
+        async def execute(code, stdin=None, use_cache=True):
+            return "", "", False
+
+        async def fire_now(question_id):
+            # Stands in for the scheduler ending the question: note what the summary would see
+            self.ended.append((question_id, await self.analytics.class_skills(self.session.class_id)))
+            return True
+
+        self.breaker_open = False
+        agent = SimpleNamespace(breaker=SimpleNamespace(is_open=lambda: self.breaker_open))
+
+        patches = [
+            mock.patch.object(api, "student_answer_session", self.session),
+            mock.patch.object(api, "skill_analytics", self.analytics),
+            mock.patch.object(api, "feedback_store", self.store),
+            mock.patch.object(api, "submission_store", self.saved),
+            mock.patch.object(api, "grading", GradingCoalescer(self.store, 0)),
+            mock.patch.object(api, "cluster_grader", ClusterGrader()),
+            mock.patch.object(api, "_check_code", check_code),
+            mock.patch.object(api, "_execute", execute),
+            mock.patch.object(api, "get_agent", lambda: agent),
+            mock.patch.object(api, "question_scheduler", SimpleNamespace(fire_now=fire_now)),
+            mock.patch.object(api, "BREAKER_POLL_SECONDS", 0.01),
+        ]
+        for patch in patches:
+            patch.start()
+            self.addCleanup(patch.stop)
+
+    @staticmethod
+    def answer(student: str, code: str) -> dict:
+        return {"studentAnswers": {"studentEmail": student, "code": code}}
+
+    def submit(self, student: str, code: str = "for i in range(3):\n    print(i)\n") -> int:
+        self.session.add_answer(student, code, None)
+        return self.session.answers[student].seq
+
+
+class GradingAnalyticsTests(ApiTestCase):
+
+    def grade(self, student: str, seq: int, question_id: str, class_id: str):
+        asyncio.run(api._grade_submission("f1", student, "code", seq, "prompt", question_id, class_id))
+
+    def test_question_ends_before_grading(self):
+        self.session.start_question("q1", None, 0, "c1")
+        seq = self.submit("ada@example.edu")
+        self.session.end_question()
+        self.grade("ada@example.edu", seq, "q1", "c1")
+        self.assertEqual(["for loops"], [entry["skill"] for entry in asyncio.run(self.analytics.class_skills("c1"))])
+        self.assertIn("skills:c1:answer:q1:ada@example.edu", self.analytics._answers)
+        self.assertNotIn("skills:c1:answer:None:ada@example.edu", self.analytics._answers)
+        self.assertFalse(self.saved._buffer[("q1", "ada@example.edu")]["correct"])
+
+    def test_next_question_started_before_grading(self):
+        self.session.start_question("q1", None, 0, "c1")
+        seq = self.submit("ada@example.edu")
+        self.session.start_question("q2", None, 0, "c2")
+        self.grade("ada@example.edu", seq, "q1", "c1")
+        self.assertEqual(1, len(asyncio.run(self.analytics.class_skills("c1"))))
+        self.assertEqual([], asyncio.run(self.analytics.class_skills("c2")))
+        self.assertEqual(["skills:c1:answer:q1:ada@example.edu"], list(self.analytics._answers))
+
+
+
+class AutoEndTests(ApiTestCase):
+
+    def test_waits_for_pending_gradings(self):
+        async def run():
+            self.session.start_question("q1", None, 2, "c1")
+            self.gates["slow = 1"] = asyncio.Event()
+            await api.create_student_answers(self.answer("ada@example.edu", "slow = 1"))
+            await api.create_student_answers(self.answer("alan@example.edu", "print(2)"))
+            while len(api.grading.pending("q1")) > 1:
+                await asyncio.sleep(0.01)
+            # Every expected student has answered but one grading is still in flight
+            self.assertEqual([], self.ended)
+            self.gates["slow = 1"].set()
+            await asyncio.wait_for(asyncio.gather(*api.grading.pending()), 5)
+
+        asyncio.run(run())
+        self.assertEqual([("q1", [{"skill": "for loops", "count": 2}])], self.ended)
+
+
+
+class DeferredGradingTests(ApiTestCase):
+
+    def test_graded_after_breaker_closes(self):
+        async def run():
+            self.session.start_question("q1", None, 0, "c1")
+            self.breaker_open = True
+            reply = await api.create_student_answers(self.answer("ada@example.edu", "print(1)"))
+            await asyncio.sleep(0.05)
+            held = await self.store.get(reply["feedback_id"])
+            self.breaker_open = False
+            done = await self.store.wait(reply["feedback_id"], 5)
+            return reply, held, done
+
+        reply, held, done = asyncio.run(run())
+        self.assertEqual(("pending", "AI feedback deferred"), (reply["feedback_status"], reply["ai_response"]))
+        self.assertEqual("pending", held["status"])
+        self.assertEqual("ready", done["status"])
+        self.assertIn("loop stops one element early", done["ai_response"])
+
+
+
+class HintTests(ApiTestCase):
+
+    def test_only_active_prompt(self):
+        generated = []
+
+        async def generate(prompt):
+            generated.append(prompt)
+            return ["Think about the range", "range(len(nums)) stops before len(nums)"]
+
+        self.session.new_prompt("Sum a list")
+        with mock.patch.object(api, "hint_cache", HintCache()), mock.patch.object(api, "_generate_hints", generate):
+            reply = TestClient(api.api).get("/api/hint", params={"level": 2, "prompt": "Write my essay"}).json()
+        self.assertEqual(["Sum a list"], generated)
+        self.assertEqual("range(len(nums)) stops before len(nums)", reply["hint"])
+
+
+class CreateProblemTests(ApiTestCase):
+
+    def test_new_problem_cancels_previous_deadline(self):
+        fired = []
+
+        async def on_due(question_id):
+            fired.append(question_id)
+
+        async def generate(prompt):
+            return None
+
+        scheduler = QuestionScheduler(on_due)
+
+        async def run():
+            first = await api.create_problem({"prompt": "Sum a list", "duration": 60})
+            scheduled = dict(scheduler._local)
+            second = await api.create_problem({"prompt": "Reverse a list"})
+            return first["question_id"], second["question_id"], scheduled
+
+        with mock.patch.object(api, "question_scheduler", scheduler), mock.patch.object(api, "hint_cache", HintCache()), \
+                mock.patch.object(api, "_generate_hints", generate), mock.patch.object(api, "problem_stream", ProblemStream()):
+            first, second, scheduled = asyncio.run(run())
+        self.assertEqual([first], list(scheduled))
+        self.assertEqual({}, scheduler._local)
+        self.assertEqual(second, self.session.current_question_id)
+        self.assertEqual([], fired)
+
+
+class StudentAnswersTests(ApiTestCase):
+
+    def test_pages_by_cursor(self):
+        for student in ("ada@example.edu", "alan@example.edu", "grace@example.edu"):
+            self.submit(student)
+        client = TestClient(api.api)
+        first = client.get("/api/getStudentAnswers", params={"limit": 2}).json()
+        rest = client.get("/api/getStudentAnswers", params={"cursor": first["next_cursor"], "limit": 2}).json()
+        self.assertEqual(2, first["next_cursor"])
+        self.assertEqual(["ada@example.edu", "alan@example.edu"], [entry["student"] for entry in first["submissions"]])
+        self.assertEqual(["grace@example.edu"], [entry["student"] for entry in rest["submissions"]])
+
+    def test_malformed_cursor_is_rejected(self):
+        reply = TestClient(api.api).get("/api/getStudentAnswers", params={"cursor": "abc"})
+        self.assertEqual(422, reply.status_code)
+
+
+class QueueStatusTests(ApiTestCase):
+
+    def test_reports_class_streams_and_job_queues(self):
+        stream = ProblemStream()
+
+        async def run():
+            await stream.publish({"prompt": "Sum a list"}, "c1")
+            await stream.publish({"prompt": "Reverse a list"}, "c1")
+            await stream.publish({"prompt": "FizzBuzz"}, "c2")
+            return await api.queue_status()
+
+        self.submit("ada@example.edu")
+        with mock.patch.object(api, "problem_stream", stream), \
+                mock.patch.object(api, "exec_jobs", JobQueue("exec")), mock.patch.object(api, "ai_jobs", JobQueue("ai")):
+            status = asyncio.run(run())
+        self.assertEqual({"c1": 2, "c2": 1}, status["problem_streams"])
+        self.assertEqual(3, status["problems_len"])
+        self.assertEqual(1, status["student_answers_len"])
+        self.assertEqual(["exec", "ai"], list(status["job_queues"]))
+        self.assertNotIn("error", status)
+
+    def test_redis_status_is_one_round_trip(self):
+        class RecordingPipeline:
+            def __init__(self):
+                self.commands = []
+
+            async def __aenter__(self):
+                return self
+
+            async def __aexit__(self, *exc):
+                return False
+
+            def __getattr__(self, command):
+                return lambda *args, **kwargs: self.commands.append(command)
+
+            async def execute(self):
+                round_trips.append(self.commands)
+                return [True, ["problems:c1", 2, "problems:c2", 1], 4, 1, 0, 0]
+
+        round_trips = []
+        redis = SimpleNamespace(pipeline=lambda transaction: RecordingPipeline())
+        with mock.patch.object(api.api.state, "redis", redis, create=True), \
+                mock.patch.object(api, "exec_jobs", JobQueue("exec")), mock.patch.object(api, "ai_jobs", JobQueue("ai")):
+            status = asyncio.run(api.queue_status())
+        self.assertEqual([["ping", "eval", "llen", "zcount", "llen", "zcount"]], round_trips)
+        self.assertTrue(status["redis_connected"])
+        self.assertEqual({"c1": 2, "c2": 1}, status["problem_streams"])
+        self.assertEqual({"queued": 4, "workers": 1, "awaiting_reply": 0}, status["job_queues"]["exec"])
+
+    def test_offset_reads_strictly_after(self):
+        class RecordingRedis:
+            async def xrange(self, key, min, max, count):
+                ranges.append(min)
+                return []
+
+        ranges = []
+        stream = ProblemStream()
+        stream.attach(RecordingRedis())
+        asyncio.run(stream.next_after("1700000000000-4", "c1"))
+        # Inclusive start one past the offset: no "(" exclusive ranges, which need Redis 6.2
+        self.assertEqual(["1700000000000-5"], ranges)
+
+
+if __name__ == "__main__":
+    unittest.main()
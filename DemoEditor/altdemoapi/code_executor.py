@@ -1,5 +1,111 @@
-import ai_utils
+"""
+Student code execution
 
+Each run writes the code to its own temporary file and runs it with the server's interpreter, so
+concurrent runs (in the API or in an execution worker) never share a file. With `exec_mode: fork` on a
+POSIX host, runs are forked from pre-warmed template processes instead (see fork_server.py), falling back
+to a subprocess if the fork server fails. Every run uses the same PYTHONHASHSEED, so iterating a set or
+dict of strings prints the same order each time and cached results stay valid.
 
-def execute():
+Functions
+---------
+run_code:
+    Run a code sample and return (stdout, stderr)
+execute:
+    Job handler for the "exec" queue -- {"code": ...} -> {"out": ..., "err": ...}
+"""
 
+import os
+import re
+import subprocess
+import sys
+import tempfile
+import threading
+from typing import Optional
+
+import load
+from fork_server import ForkServer, ForkServerError
+
+DEFAULT_TIMEOUT = 10.0
+TIMEOUT_MESSAGE = "Execution timed out"
+HASH_SEED = "0"
+
+_fork_server: Optional[ForkServer] = None
+_fork_server_lock = threading.Lock()
+
+
+def _get_fork_server() -> Optional[ForkServer]:
+    """
+    Fork server for this process, started on first use when CONFIG.exec_mode is "fork"
+    """
+    global _fork_server
+    if load.CONFIG.exec_mode != "fork" or not ForkServer.supported():
+        return None
+    with _fork_server_lock:
+        if _fork_server is None:
+            _fork_server = ForkServer(load.CONFIG.exec_preload or [], load.CONFIG.exec_fork_pool or 4,
+                                      env=_run_env())
+        return _fork_server
+
+
+def _run_env() -> dict:
+    return {**os.environ, "PYTHONHASHSEED": HASH_SEED}
+
+
+def clean_code(lines: str) -> str:
+    """
+    Handle new line translation from parsing editorRef
+    """
+    return re.sub(r"\r", "", lines)
+
+
+def run_code(code: str, stdin: Optional[str] = None, timeout: Optional[float] = None) -> tuple[str, str]:
+    """
+    Run a python code sample in a fresh interpreter
+
+    Parameters
+    ----------
+    code: str
+        Code to run
+    stdin: Optional[str]
+        Text fed to the program's standard input
+    timeout: Optional[float]
+        Seconds before the run is killed -- defaults to CONFIG.exec_timeout_seconds
+
+    Returns
+    -------
+    tuple
+        stdout, stderr from execution
+    """
+    timeout = timeout or load.CONFIG.exec_timeout_seconds or DEFAULT_TIMEOUT
+    fork_server = _get_fork_server()
+    if fork_server is not None:
+        try:
+            result = fork_server.run(clean_code(code), stdin, timeout)
+        except ForkServerError as e:
+            print(f"Warning: {e}, running in a subprocess")
+        else:
+            if result["returncode"] is None:
+                return result["out"], f"{TIMEOUT_MESSAGE} after {timeout:g} seconds"
+            return result["out"], result["err"]
+
+    fd, path = tempfile.mkstemp(prefix="run_", suffix=".py")
+    try:
+        with os.fdopen(fd, "w") as file:
+            file.write(clean_code(code))
+        result = subprocess.run([sys.executable, path], input=stdin, capture_output=True, text=True,
+                                timeout=timeout, env=_run_env())
+        return result.stdout, result.stderr
+    except subprocess.TimeoutExpired as e:
+        out = e.stdout.decode() if isinstance(e.stdout, bytes) else (e.stdout or "")
+        return out, f"{TIMEOUT_MESSAGE} after {timeout:g} seconds"
+    finally:
+        os.unlink(path)
+
+
+def execute(payload: dict) -> dict:
+    """
+    Job handler for the "exec" queue
+    """
+    out, err = run_code(payload["code"], payload.get("stdin"))
+    return {"out": out, "err": err}
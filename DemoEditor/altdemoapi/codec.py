@@ -0,0 +1,97 @@
+"""
+Text codec for large stored values (submitted code, AI feedback, queued problems)
+
+Values at or above `MIN_COMPRESS_BYTES` are compressed with zstd when the `zstandard` package is installed,
+zlib otherwise, and stored as base85 text so they remain valid for the `decode_responses=True` Redis client
+and for TEXT columns. Smaller values are stored unchanged. Encoded values start with a NUL marker, so values
+written before the codec existed decode as themselves.
+
+Classes
+-------
+LazyText:
+    Encoded value that is only decompressed on first access
+"""
+
+import base64
+import zlib
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+MIN_COMPRESS_BYTES = 512
+
+_MARK = "\x00"
+_ZLIB = _MARK + "z"
+_ZSTD = _MARK + "s"
+_RAW = _MARK + "r"
+
+
+def encode(text: str) -> str:
+    """
+    Compress `text` when it is large enough to benefit
+
+    Parameters
+    ----------
+    text: str
+        Value to store
+
+    Returns
+    -------
+    str
+        Encoded value -- `text` itself for small payloads
+    """
+    data = text.encode()
+    if len(data) < MIN_COMPRESS_BYTES:
+        # Escape the rare small value that already looks encoded
+        return _RAW + text if text.startswith(_MARK) else text
+
+    if zstandard is not None:
+        marker, packed = _ZSTD, zstandard.ZstdCompressor(level=3).compress(data)
+    else:
+        marker, packed = _ZLIB, zlib.compress(data, 6)
+    encoded = marker + base64.b85encode(packed).decode("ascii")
+    # Incompressible input: storing it raw is smaller
+    if len(encoded) >= len(data):
+        return _RAW + text if text.startswith(_MARK) else text
+    return encoded
+
+
+def decode(value):
+    """
+    Reverse `encode` -- values without a codec marker (including None) are returned unchanged
+    """
+    if not isinstance(value, str) or not value.startswith(_MARK):
+        return value
+    marker, body = value[:2], value[2:]
+    if marker == _RAW:
+        return body
+    if marker == _ZLIB:
+        return zlib.decompress(base64.b85decode(body)).decode()
+    if marker == _ZSTD:
+        if zstandard is None:
+            raise RuntimeError("Value was compressed with zstd but the zstandard package is not installed")
+        return zstandard.ZstdDecompressor().decompress(base64.b85decode(body)).decode()
+    return value
+
+
+class LazyText:
+    """
+    LazyText holds an encoded value and decodes it the first time `value` is read
+    """
+
+    __slots__ = ("encoded", "_value")
+
+    def __init__(self, encoded: str):
+        self.encoded = encoded
+        self._value = None
+
+    @property
+    def value(self) -> str:
+        if self._value is None:
+            self._value = decode(self.encoded)
+        return self._value
+
+    def __str__(self):
+        return self.value
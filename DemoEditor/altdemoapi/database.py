@@ -1,16 +1,21 @@
-import pymysql as sql
 import load
 import os
-from typing import Any
+from typing import TYPE_CHECKING, Any
+
+if TYPE_CHECKING:
+    import pymysql
 
 
 class Database:
 
     def __init__(self):
+        # pymysql is imported on first use so importing this module stays cheap
+        import pymysql
+
         try:
-            self.conn: sql.Connection = self.connect()
+            self.conn: pymysql.Connection = self.connect()
             self.cursor = self.conn.cursor()
-        except sql.Error as e:
+        except pymysql.Error as e:
             raise RuntimeError(f"{load.ERRORS.db_run_time}: {e}")
 
     @staticmethod
@@ -75,8 +80,10 @@ class Database:
             self.conn.close()
 
     @staticmethod
-    def connect() -> sql.Connection:
-        return sql.connect(
+    def connect() -> "pymysql.Connection":
+        import pymysql
+
+        return pymysql.connect(
             user=load.DB_USER,
             password=load.DB_PASSWORD,
             host=load.DB_HOST,
@@ -84,12 +91,37 @@ class Database:
         )
 
     def execute(self, query: load.Query, params: dict[str, Any], fetch_one: bool = False, commit: bool = False):
+        import pymysql
+
         try:
             sql_query, param_list = query.to_sql(params)
             self.cursor.execute(sql_query, param_list or ())
             if commit:
                 self.conn.commit()
             return self.cursor.fetchone() if fetch_one else self.cursor.fetchall()
-        except sql.Error as e:
+        except pymysql.Error as e:
+            self.conn.rollback()
+            raise RuntimeError(f"Database query failed: {e}")
+
+    def execute_many(self, query: load.Query, rows: list[dict[str, Any]], commit: bool = True) -> int:
+        """
+        Run one statement for many parameter sets in a single round trip (multi-row INSERT for inserts)
+
+        Returns
+        -------
+        int
+            Rows affected
+        """
+        import pymysql
+
+        if not rows:
+            return 0
+        try:
+            sql_query = query.to_sql(rows[0])[0]
+            affected = self.cursor.executemany(sql_query, [query.to_sql(row)[1] for row in rows])
+            if commit:
+                self.conn.commit()
+            return affected
+        except pymysql.Error as e:
             self.conn.rollback()
             raise RuntimeError(f"Database query failed: {e}")
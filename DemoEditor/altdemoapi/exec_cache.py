@@ -0,0 +1,160 @@
+"""
+Execution result cache
+
+Students press "Run" repeatedly on unchanged code. A run is cached under a hash of the cleaned code, the
+stdin and the interpreter version, so an identical run is answered from memory (or from Redis when another
+worker ran it) instead of starting a new interpreter. Only programs whose output depends on nothing but
+the code and its input are cached: every import must be a module known to be deterministic, and names
+exposing the run's environment or object identity (`__file__`, `open`, `id`, ...) rule a program out.
+Output showing an object address is never stored, and callers can opt out per request.
+
+Classes
+-------
+ExecutionCache:
+    Two-level (in-process LRU + Redis with TTL and an entry cap) cache of (out, err) results
+"""
+
+import ast
+import hashlib
+import json
+import re
+import sys
+import time
+from collections import OrderedDict
+from typing import Optional
+
+import code_executor
+
+# Modules whose output depends only on the program's own input (with a fixed PYTHONHASHSEED) -- anything
+# else (random, time, os, sys, io, pathlib, platform, ...) makes a program uncacheable
+DETERMINISTIC_MODULES = frozenset({
+    "__future__", "abc", "array", "bisect", "cmath", "collections", "copy", "dataclasses", "decimal", "enum",
+    "fractions", "functools", "heapq", "itertools", "json", "keyword", "math", "numbers", "operator",
+    "pprint", "re", "statistics", "string", "textwrap", "typing", "unicodedata",
+})
+# Builtins and module globals that expose the environment, object identity or dynamic code
+NONDETERMINISTIC_NAMES = frozenset({
+    "__builtins__", "__file__", "__import__", "__loader__", "__spec__", "breakpoint", "compile", "eval",
+    "exec", "globals", "hash", "id", "locals", "open", "vars",
+})
+# Default reprs such as '<__main__.Node object at 0x7f...>' differ between runs
+_ADDRESS = re.compile(r" at 0x[0-9a-fA-F]+")
+INDEX_KEY = "exec:index"
+
+
+def _run_key(digest: str) -> str:
+    return f"exec:{digest}"
+
+
+class ExecutionCache:
+    """
+    ExecutionCache stores {out, err} for deterministic programs
+        - key: blake2b(cleaned code, stdin, interpreter version)
+        - in-process LRU of `local_entries`, plus Redis entries expiring after `ttl` seconds and capped at
+          `max_entries` (oldest evicted first through the `exec:index` sorted set)
+        - results larger than `max_output_bytes`, timed-out runs and output showing object addresses are
+          not stored
+    """
+
+    def __init__(self, ttl: int = 3600, max_entries: int = 5000, local_entries: int = 512,
+                 max_output_bytes: int = 64 * 1024):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.local_entries = local_entries
+        self.max_output_bytes = max_output_bytes
+        self.redis = None
+        self._local: OrderedDict[str, tuple[float, dict]] = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def attach(self, redis_client):
+        self.redis = redis_client
+
+    @staticmethod
+    def key(code: str, stdin: Optional[str] = None) -> str:
+        digest = hashlib.blake2b(digest_size=16)
+        for part in (code_executor.clean_code(code), stdin or "", sys.version):
+            digest.update(part.encode())
+            digest.update(b"\0")
+        return digest.hexdigest()
+
+    @staticmethod
+    def cacheable(code: str) -> bool:
+        """
+        True if the program imports only deterministic modules and uses none of the nondeterministic names
+        Code that does not parse is cacheable -- it always fails with the same syntax error
+        """
+        try:
+            tree = ast.parse(code_executor.clean_code(code))
+        except (SyntaxError, ValueError):
+            return True
+        for node in ast.walk(tree):
+            if isinstance(node, ast.Import):
+                modules = [alias.name for alias in node.names]
+            elif isinstance(node, ast.ImportFrom):
+                modules = [node.module or ""] if not node.level else [""]
+            elif isinstance(node, ast.Name):
+                if node.id in NONDETERMINISTIC_NAMES:
+                    return False
+                continue
+            else:
+                continue
+            if any(module.split(".")[0] not in DETERMINISTIC_MODULES for module in modules):
+                return False
+        return True
+
+    def _local_get(self, digest: str) -> Optional[dict]:
+        entry = self._local.get(digest)
+        if entry is None:
+            return None
+        stored_at, result = entry
+        if time.monotonic() - stored_at > self.ttl:
+            del self._local[digest]
+            return None
+        self._local.move_to_end(digest)
+        return result
+
+    def _local_put(self, digest: str, result: dict):
+        self._local[digest] = (time.monotonic(), result)
+        self._local.move_to_end(digest)
+        while len(self._local) > self.local_entries:
+            self._local.popitem(last=False)
+
+    async def get(self, digest: str) -> Optional[dict]:
+        result = self._local_get(digest)
+        if result is None and self.redis is not None:
+            try:
+                stored = await self.redis.get(_run_key(digest))
+                if stored is not None:
+                    result = json.loads(stored)
+                    self._local_put(digest, result)
+            except Exception as e:
+                print(f"Execution cache: redis read failed ({e})")
+        if result is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return result
+
+    async def put(self, digest: str, result: dict):
+        if result["err"].startswith(code_executor.TIMEOUT_MESSAGE) \
+                or _ADDRESS.search(result["out"]) or _ADDRESS.search(result["err"]):
+            return
+        data = json.dumps({"out": result["out"], "err": result["err"]})
+        if len(data) > self.max_output_bytes:
+            return
+        self._local_put(digest, result)
+        if self.redis is None:
+            return
+        try:
+            async with self.redis.pipeline(transaction=False) as pipe:
+                pipe.set(_run_key(digest), data, ex=self.ttl)
+                pipe.zadd(INDEX_KEY, {digest: time.time()})
+                pipe.zcard(INDEX_KEY)
+                *_, size = await pipe.execute()
+            if size > self.max_entries:
+                evicted = await self.redis.zpopmin(INDEX_KEY, size - self.max_entries)
+                if evicted:
+                    await self.redis.delete(*[_run_key(old) for old, _ in evicted])
+        except Exception as e:
+            print(f"Execution cache: redis write failed ({e})")
@@ -0,0 +1,55 @@
+import asyncio
+import unittest
+from unittest import mock
+
+import code_executor
+from exec_cache import ExecutionCache
+from fork_server import ForkServer
+
+SET_OF_STRINGS = 'print({"apple", "banana", "cherry", "date", "elderberry", "fig", "grape"})\n'
+
+
+class CacheableTests(unittest.TestCase):
+
+    def test_deterministic_programs(self):
+        for code in ("import math\nprint(math.sqrt(2))\n",
+                     "from collections import Counter\nprint(Counter(input()))\n",
+                     SET_OF_STRINGS,
+                     "def f(:\n"):
+            with self.subTest(code=code):
+                self.assertTrue(ExecutionCache.cacheable(code))
+
+    def test_environment_dependent_programs(self):
+        for code in ("import sys\nprint(sys.argv)\n",
+                     "print(__file__)\n",
+                     "import pathlib\nprint(pathlib.Path.cwd())\n",
+                     "import io\nprint(io.open('data.txt').read())\n",
+                     "import shutil\nprint(shutil.disk_usage('/'))\n",
+                     "import builtins\nprint(builtins.open('data.txt').read())\n",
+                     "import platform\nprint(platform.node())\n",
+                     "from . import helper\n",
+                     "reader = open\nprint(reader('data.txt').read())\n",
+                     "print(id([]))\n"):
+            with self.subTest(code=code):
+                self.assertFalse(ExecutionCache.cacheable(code))
+
+    def test_object_addresses_not_stored(self):
+        cache = ExecutionCache()
+        asyncio.run(cache.put("d1", {"out": "<__main__.Node object at 0x7f3a2c1b0d90>\n", "err": ""}))
+        self.assertIsNone(asyncio.run(cache.get("d1")))
+
+
+class HashSeedTests(unittest.TestCase):
+
+    def test_set_order_repeats_across_runs(self):
+        with mock.patch.object(code_executor, "_get_fork_server", lambda: None):
+            outputs = {code_executor.run_code(SET_OF_STRINGS)[0] for _ in range(4)}
+        self.assertEqual(1, len(outputs))
+        if ForkServer.supported():
+            server = ForkServer([], size=1, env=code_executor._run_env())
+            self.addCleanup(server.close)
+            self.assertEqual(outputs, {server.run(SET_OF_STRINGS, None, 5)["out"]})
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,269 @@
+"""
+Deferred AI feedback storage
+
+Submissions return their execution output immediately with a feedback id; AI analysis runs in the
+background and its result is stored here against that id. Records live in Redis hashes
+(`feedback:<id>`, expiring after `ttl` seconds) so any worker can serve them, with an in-memory
+fallback. Readers in this process can wait for a pending record instead of polling.
+
+Classes
+-------
+FeedbackStore:
+    Pending/ready feedback records keyed by feedback id
+GradingCoalescer:
+    Per-student debounced grading -- a newer submission supersedes one still queued or in flight
+ClusterGrader:
+    One AI grading call per distinct solution, shared by every student who submitted it
+"""
+
+import asyncio
+import codec
+import hashlib
+import time
+from collections import OrderedDict
+from similarity import normalize_source
+from typing import Any, Awaitable, Callable, Optional
+
+PENDING = "pending"
+READY = "ready"
+UNAVAILABLE = "unavailable"
+
+
+class FeedbackStore:
+    """
+    FeedbackStore keeps one record per submission: {feedback_id, student, status, ai_response, updated_at}
+    """
+
+    def __init__(self, ttl: int = 3600):
+        self.ttl = ttl
+        self.redis = None
+        self._local: dict[str, dict] = {}
+        self._events: dict[str, asyncio.Event] = {}
+        # feedback id -> ids of superseded submissions that should receive its result
+        self._aliases: dict[str, list[str]] = {}
+
+    def attach(self, redis_client):
+        self.redis = redis_client
+
+    @staticmethod
+    def _key(feedback_id: str) -> str:
+        return f"feedback:{feedback_id}"
+
+    async def _write(self, record: dict):
+        self._local[record["feedback_id"]] = record
+        if self.redis is not None:
+            stored = dict(record, ai_response=codec.encode(record["ai_response"] or ""))
+            try:
+                async with self.redis.pipeline(transaction=False) as pipe:
+                    pipe.hset(self._key(record["feedback_id"]), mapping=stored)
+                    pipe.expire(self._key(record["feedback_id"]), self.ttl)
+                    await pipe.execute()
+            except Exception as e:
+                print(f"Feedback store: redis write failed ({e}), keeping record in memory")
+
+    def _prune(self):
+        cutoff = time.time() - self.ttl
+        for feedback_id in [fid for fid, record in self._local.items() if record["updated_at"] < cutoff]:
+            del self._local[feedback_id]
+            self._events.pop(feedback_id, None)
+            self._aliases.pop(feedback_id, None)
+
+    async def create(self, feedback_id: str, student: str) -> dict:
+        """
+        Register a pending record for a new submission
+        """
+        self._prune()
+        record = {"feedback_id": feedback_id, "student": student, "status": PENDING,
+                  "ai_response": "", "updated_at": time.time()}
+        self._events[feedback_id] = asyncio.Event()
+        await self._write(record)
+        return record
+
+    async def complete(self, feedback_id: str, ai_response: Optional[str], status: str = READY):
+        """
+        Store the finished analysis and wake any local waiters
+
+        Parameters
+        ----------
+        feedback_id: str
+            Id returned with the submission
+        ai_response: Optional[str]
+            Feedback text shown to the student
+        status: str
+            READY, or UNAVAILABLE when no analysis could be produced
+        """
+        for target in [feedback_id] + self._aliases.pop(feedback_id, []):
+            record = self._local.get(target, {"feedback_id": target, "student": ""})
+            record = dict(record, status=status, ai_response=ai_response or "", updated_at=time.time())
+            await self._write(record)
+            event = self._events.pop(target, None)
+            if event is not None:
+                event.set()
+
+    def supersede(self, old_id: str, new_id: str):
+        """
+        Deliver the result of `new_id` to `old_id` (and anything `old_id` already superseded) when it completes
+        """
+        self._aliases.setdefault(new_id, []).extend([old_id] + self._aliases.pop(old_id, []))
+
+    async def get(self, feedback_id: str) -> Optional[dict]:
+        """
+        Look up a record -- Redis first so records written by other workers are visible
+        """
+        if self.redis is not None:
+            try:
+                stored = await self.redis.hgetall(self._key(feedback_id))
+                if stored:
+                    stored["ai_response"] = codec.decode(stored.get("ai_response", ""))
+                    stored["updated_at"] = float(stored.get("updated_at", 0))
+                    return stored
+            except Exception as e:
+                print(f"Feedback store: redis read failed ({e})")
+        return self._local.get(feedback_id)
+
+    async def wait(self, feedback_id: str, timeout: float) -> Optional[dict]:
+        """
+        Return the record once it is no longer pending, or as it stands after `timeout` seconds
+        """
+        event = self._events.get(feedback_id)
+        if event is not None:
+            try:
+                await asyncio.wait_for(event.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+        return await self.get(feedback_id)
+
+
+class GradingCoalescer:
+    """
+    GradingCoalescer runs at most one grading job per student
+        - a job waits `debounce` seconds before starting, so bursts of resubmissions collapse into one
+        - a newer submission cancels the student's queued or in-flight job and inherits its feedback id,
+          so anyone waiting on the superseded submission receives the final result
+    """
+
+    def __init__(self, store: FeedbackStore, debounce: float = 1.0):
+        self.store = store
+        self.debounce = debounce
+        self._jobs: dict[str, tuple[str, asyncio.Task, Any]] = {}
+
+    def submit(self, student: str, feedback_id: str, job: Callable[[], Awaitable[None]], group: Any = None):
+        """
+        Queue grading for the student's latest submission
+
+        Parameters
+        ----------
+        student: str
+            Student email
+        feedback_id: str
+            Feedback id of the new submission
+        job: Callable
+            Coroutine function performing the grading and completing `feedback_id`
+        group: Any
+            Tag the job is counted under in `pending` (e.g. the question the submission answers)
+        """
+        previous = self._jobs.get(student)
+        if previous is not None:
+            old_id, old_task, _ = previous
+            if not old_task.done():
+                old_task.cancel()
+                self.store.supersede(old_id, feedback_id)
+                print(f"Grading for {student}: submission {old_id} superseded by {feedback_id}")
+        task = asyncio.create_task(self._run(student, feedback_id, job))
+        self._jobs[student] = (feedback_id, task, group)
+
+    async def _run(self, student: str, feedback_id: str, job: Callable[[], Awaitable[None]]):
+        try:
+            await asyncio.sleep(self.debounce)
+            await job()
+        finally:
+            current = self._jobs.get(student)
+            if current is not None and current[0] == feedback_id:
+                del self._jobs[student]
+
+    def pending(self, group: Any = None) -> list[asyncio.Task]:
+        """
+        Grading tasks still queued or running in this process, only those submitted under `group` if given
+        """
+        return [task for _, task, job_group in self._jobs.values()
+                if not task.done() and (group is None or job_group == group)]
+
+
+# Result handed to waiting cluster members when the grading call was cancelled or failed
+_ABANDONED = object()
+
+
+class ClusterGrader:
+    """
+    ClusterGrader grades each solution cluster once
+        - a cluster is the prompt plus the submission's normalized source (identifiers renamed, comments
+          stripped), so answers differing only in names or layout share one AI call
+        - the first member runs the call; members arriving meanwhile wait for it, later ones reuse the result
+        - failed, cancelled or fallback results are not kept -- the next member grades again
+        - the most recent `max_entries` clusters are remembered
+    """
+
+    def __init__(self, max_entries: int = 1024):
+        self.max_entries = max_entries
+        self._results: OrderedDict[str, asyncio.Future] = OrderedDict()
+        self.calls = 0
+        self.reused = 0
+
+    @staticmethod
+    def key(prompt: str, code: str) -> str:
+        digest = hashlib.blake2b(digest_size=16)
+        digest.update(prompt.encode())
+        digest.update(b"\0")
+        digest.update(normalize_source(code).encode())
+        return digest.hexdigest()
+
+    @staticmethod
+    def _reusable(result) -> bool:
+        return result is not None and not getattr(result, "fallback", False)
+
+    async def grade(self, prompt: str, code: str, grade: Callable[[], Awaitable[Any]]) -> Any:
+        """
+        Grade a submission, sharing the result with its cluster
+
+        Parameters
+        ----------
+        prompt: str
+            Question prompt
+        code: str
+            Submitted code
+        grade: Callable
+            Coroutine function making the AI call for this submission
+        """
+        key = self.key(prompt, code)
+        while True:
+            future = self._results.get(key)
+            if future is None:
+                break
+            self._results.move_to_end(key)
+            result = await asyncio.shield(future)
+            if result is not _ABANDONED:
+                self.reused += 1
+                return result
+
+        future = asyncio.get_running_loop().create_future()
+        self._results[key] = future
+        while len(self._results) > self.max_entries:
+            self._results.popitem(last=False)
+        self.calls += 1
+        try:
+            result = await grade()
+        except BaseException:
+            self._forget(key, future)
+            future.set_result(_ABANDONED)
+            raise
+        if not self._reusable(result):
+            self._forget(key, future)
+        future.set_result(result)
+        return result
+
+    def _forget(self, key: str, future: asyncio.Future):
+        if self._results.get(key) is future:
+            del self._results[key]
+
+    def clear(self):
+        self._results.clear()
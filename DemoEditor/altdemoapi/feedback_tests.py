@@ -0,0 +1,47 @@
+import asyncio
+import unittest
+
+from feedback import ClusterGrader
+
+
+class ClusterGraderTests(unittest.TestCase):
+
+    def grade_all(self, *codes: str) -> tuple[list[str], int]:
+        grader = ClusterGrader()
+
+        async def run():
+            results = []
+            for code in codes:
+                async def grade(code=code):
+                    return f"feedback for {code!r}"
+                results.append(await grader.grade("Print two numbers", code, grade))
+            return results
+
+        return asyncio.run(run()), grader.calls
+
+    def test_renamed_programs_share_result(self):
+        results, calls = self.grade_all("a = 1\nprint(a)\n", "count = 1\nprint(count)  # show it\n")
+        self.assertEqual(1, calls)
+        self.assertEqual(results[0], results[1])
+
+    def test_builtin_keywords_keep_programs_apart(self):
+        pairs = [
+            ('sep = ", "\nprint(1, 2, sep=sep)\n', 'end = ", "\nprint(1, 2, end=end)\n'),
+            ("xs = [2, 1]\nreverse = True\nprint(sorted(xs, reverse=reverse))\n",
+             "xs = [2, 1]\nkey = True\nprint(sorted(xs, key=key))\n"),
+        ]
+        for first, second in pairs:
+            with self.subTest(first=first):
+                results, calls = self.grade_all(first, second)
+                self.assertEqual(2, calls)
+                self.assertNotEqual(results[0], results[1])
+
+    def test_user_function_keywords_follow_rename(self):
+        results, calls = self.grade_all("def f(a, b=1):\n    return a + b\nprint(f(1, b=2))\n",
+                                        "def add(x, y=1):\n    return x + y\nprint(add(1, y=2))\n")
+        self.assertEqual(1, calls)
+        self.assertEqual(results[0], results[1])
+
+
+if __name__ == "__main__":
+    unittest.main()
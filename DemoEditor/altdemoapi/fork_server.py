@@ -0,0 +1,263 @@
+"""
+Fork server for student code runs (POSIX only)
+
+A template process is started once with a set of modules already imported. For every run it forks a
+copy-on-write child that executes the code in a fresh `__main__` namespace, so a run skips interpreter
+startup and the preloaded imports. The template is its own single-threaded process -- the API and the
+workers are threaded and must not fork themselves.
+
+Run as a script this module is the template process: it reads length-prefixed JSON requests
+({code, stdin, timeout}) on stdin and answers {out, err, returncode} on stdout.
+
+Classes
+-------
+ForkServer:
+    Pool of template processes used by code_executor when `exec_mode` is "fork"
+"""
+
+import json
+import os
+import select
+import signal
+import struct
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import traceback
+from typing import Optional
+
+_HEADER = struct.Struct("!I")
+
+
+class ForkServerError(Exception):
+    """
+    The template process failed or exited -- the run should fall back to a plain subprocess
+    """
+
+
+def _send(stream, message: dict):
+    data = json.dumps(message).encode()
+    stream.write(_HEADER.pack(len(data)) + data)
+    stream.flush()
+
+
+def _receive(stream) -> Optional[dict]:
+    header = stream.read(_HEADER.size)
+    if len(header) < _HEADER.size:
+        return None
+    (size,) = _HEADER.unpack(header)
+    return json.loads(stream.read(size))
+
+
+def _run_child(code: str):
+    """
+    Body of the forked child: stdin/stdout/stderr are already redirected
+    """
+    if "random" in sys.modules:
+        # Children inherit the template's generator state -- reseed so runs don't share random numbers
+        sys.modules["random"].seed()
+    sys.argv = ["main.py"]
+    namespace = {"__name__": "__main__", "__builtins__": __builtins__}
+    status = 0
+    try:
+        exec(compile(code, "main.py", "exec"), namespace)
+    except SystemExit as e:
+        if isinstance(e.code, int):
+            status = e.code
+        elif e.code is not None:
+            print(e.code, file=sys.stderr)
+            status = 1
+    except BaseException as e:
+        # Drop this function's frame so the traceback starts at the student's code
+        traceback.print_exception(type(e), e, e.__traceback__.tb_next)
+        status = 1
+    try:
+        sys.stdout.flush()
+        sys.stderr.flush()
+    finally:
+        os._exit(status)
+
+
+def _wait(pid: int, timeout: float) -> Optional[int]:
+    """
+    Wait for the child to exit; returns its exit status or None on timeout
+    """
+    deadline = time.monotonic() + timeout
+    pidfd = os.pidfd_open(pid) if hasattr(os, "pidfd_open") else None
+    try:
+        while True:
+            done, status = os.waitpid(pid, os.WNOHANG)
+            if done:
+                return os.waitstatus_to_exitcode(status)
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return None
+            if pidfd is not None:
+                select.select([pidfd], [], [], remaining)
+            else:
+                time.sleep(min(remaining, 0.002))
+    finally:
+        if pidfd is not None:
+            os.close(pidfd)
+
+
+def _serve(preload: list[str]):
+    import importlib
+
+    for module in preload:
+        try:
+            importlib.import_module(module)
+        except Exception as e:
+            print(f"fork server: could not preload {module} ({e})", file=sys.stderr)
+
+    # Keep the protocol on private descriptors so nothing else can write into it
+    requests = os.fdopen(os.dup(0), "rb")
+    replies = os.fdopen(os.dup(1), "wb")
+    null = os.open(os.devnull, os.O_RDWR)
+    os.dup2(null, 0)
+    os.dup2(null, 1)
+    _send(replies, {"ready": True})
+
+    while True:
+        request = _receive(requests)
+        if request is None:
+            return
+        with tempfile.TemporaryFile() as stdin, tempfile.TemporaryFile() as stdout, \
+                tempfile.TemporaryFile() as stderr:
+            stdin.write((request.get("stdin") or "").encode())
+            stdin.seek(0)
+            pid = os.fork()
+            if pid == 0:
+                requests.close()
+                replies.close()
+                os.dup2(stdin.fileno(), 0)
+                os.dup2(stdout.fileno(), 1)
+                os.dup2(stderr.fileno(), 2)
+                _run_child(request["code"])
+            returncode = _wait(pid, request["timeout"])
+            if returncode is None:
+                os.kill(pid, signal.SIGKILL)
+                os.waitpid(pid, 0)
+            stdout.seek(0)
+            stderr.seek(0)
+            _send(replies, {"out": stdout.read().decode(errors="replace"),
+                            "err": stderr.read().decode(errors="replace"),
+                            "returncode": returncode})
+
+
+class _Template:
+    def __init__(self, preload: list[str], env: Optional[dict] = None):
+        try:
+            self.process = subprocess.Popen([sys.executable, os.path.abspath(__file__), ",".join(preload)],
+                                            stdin=subprocess.PIPE, stdout=subprocess.PIPE, env=env)
+        except OSError as e:
+            raise ForkServerError(f"fork server could not start ({e})")
+        if _receive(self.process.stdout) is None:
+            raise ForkServerError("fork server failed to start")
+
+    def run(self, code: str, stdin: Optional[str], timeout: float) -> dict:
+        try:
+            _send(self.process.stdin, {"code": code, "stdin": stdin, "timeout": timeout})
+            reply = _receive(self.process.stdout)
+        except (BrokenPipeError, OSError) as e:
+            raise ForkServerError(f"fork server connection lost ({e})")
+        if reply is None:
+            raise ForkServerError("fork server exited")
+        return reply
+
+    def close(self):
+        try:
+            self.process.stdin.close()
+            self.process.wait(timeout=5)
+        except Exception:
+            self.process.kill()
+
+
+class ForkServer:
+    """
+    ForkServer keeps up to `size` template processes, each serving one run at a time
+        - templates are started on demand and replaced when one dies
+        - when all are busy a run waits for one to come back (or for a dead one's slot), up to its timeout
+    """
+
+    def __init__(self, preload: list[str], size: int = 4, env: Optional[dict] = None):
+        self.preload = list(preload)
+        self.size = size
+        # Environment of the template processes (children inherit it, including PYTHONHASHSEED)
+        self.env = env
+        self._idle: list[_Template] = []
+        self._started = 0
+        self._available = threading.Condition()
+
+    @staticmethod
+    def supported() -> bool:
+        return hasattr(os, "fork") and hasattr(os, "waitstatus_to_exitcode")
+
+    def _checkout(self, timeout: float) -> _Template:
+        deadline = time.monotonic() + timeout
+        with self._available:
+            while not self._idle and self._started >= self.size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise ForkServerError("no fork server template became free")
+                self._available.wait(remaining)
+            if self._idle:
+                return self._idle.pop()
+            self._started += 1
+        try:
+            return _Template(self.preload, self.env)
+        except BaseException:
+            self._discard(None)
+            raise
+
+    def _checkin(self, template: _Template):
+        with self._available:
+            self._idle.append(template)
+            self._available.notify()
+
+    def _discard(self, template: Optional[_Template]):
+        # Free the template's slot so a waiting run can start a replacement
+        if template is not None:
+            template.close()
+        with self._available:
+            self._started -= 1
+            self._available.notify()
+
+    def run(self, code: str, stdin: Optional[str], timeout: float) -> dict:
+        """
+        Run code in a child forked from a template
+
+        Returns
+        -------
+        dict
+            {out, err, returncode} -- returncode is None when the run was killed at `timeout`
+
+        Raises
+        ------
+        ForkServerError
+            If no template could run the code, or none became free within `timeout` seconds
+        """
+        template = self._checkout(timeout)
+        reply = None
+        try:
+            reply = template.run(code, stdin, timeout)
+            return reply
+        finally:
+            # A template whose run failed in any way is in an unknown state -- replace it
+            if reply is not None:
+                self._checkin(template)
+            else:
+                self._discard(template)
+
+    def close(self):
+        with self._available:
+            idle, self._idle = self._idle, []
+            self._started -= len(idle)
+        for template in idle:
+            template.close()
+
+
+if __name__ == "__main__":
+    _serve([module for module in (sys.argv[1] if len(sys.argv) > 1 else "").split(",") if module])
@@ -0,0 +1,67 @@
+import threading
+import time
+import unittest
+from unittest import mock
+
+import fork_server
+from fork_server import ForkServer, ForkServerError
+
+
+@unittest.skipUnless(ForkServer.supported(), "fork server needs os.fork")
+class ForkServerTests(unittest.TestCase):
+
+    def setUp(self):
+        self.server = ForkServer([], size=1)
+        self.addCleanup(self.server.close)
+
+    def run_in_thread(self, code: str, results: list, timeout: float = 5) -> threading.Thread:
+        def target():
+            try:
+                results.append(self.server.run(code, None, timeout)["out"])
+            except ForkServerError as e:
+                results.append(e)
+
+        thread = threading.Thread(target=target)
+        thread.start()
+        return thread
+
+    def test_runs_share_one_template(self):
+        results = []
+        threads = [self.run_in_thread(f"print({n})", results) for n in range(4)]
+        for thread in threads:
+            thread.join(10)
+        self.assertEqual(["0\n", "1\n", "2\n", "3\n"], sorted(results))
+        self.assertEqual(1, self.server._started)
+
+    def test_waiter_replaces_dead_template(self):
+        self.server.run("pass", None, 5)
+        process = self.server._idle[0].process
+        first, second = [], []
+        slow = self.run_in_thread("import time\ntime.sleep(2)", first)
+        time.sleep(0.2)
+        waiting = self.run_in_thread("print('after')", second)
+        time.sleep(0.2)
+        process.kill()
+        slow.join(10)
+        waiting.join(10)
+        self.assertIsInstance(first[0], ForkServerError)
+        self.assertEqual(["after\n"], second)
+
+    def test_unexpected_error_frees_template(self):
+        with mock.patch.object(fork_server._Template, "run", side_effect=RuntimeError("boom")):
+            with self.assertRaises(RuntimeError):
+                self.server.run("pass", None, 5)
+        self.assertEqual(0, self.server._started)
+        self.assertEqual("ok\n", self.server.run("print('ok')", None, 5)["out"])
+
+    def test_busy_pool_times_out(self):
+        results = []
+        slow = self.run_in_thread("import time\ntime.sleep(1)", results)
+        time.sleep(0.2)
+        with self.assertRaises(ForkServerError):
+            self.server.run("pass", None, 0.1)
+        slow.join(10)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,110 @@
+"""
+Precomputed hints
+
+Tiered hints for a prompt are generated once -- in the background when the problem is created -- and
+cached by prompt hash in Redis (`hints:<hash>`, expiring after `ttl` seconds) with an in-memory copy.
+Generation is single-flight: however many students ask while hints are being generated, one request is
+made and everyone waits for it.
+
+Classes
+-------
+HintCache:
+    Prompt-hash keyed hint tiers with background prefetch and single-flight generation
+"""
+
+import asyncio
+import hashlib
+import json
+import time
+from typing import Awaitable, Callable, Optional
+
+
+class HintCache:
+    """
+    HintCache stores a list of hints per prompt, most general first
+        - prefetch: start generating in the background if nothing is cached or in flight
+        - get: cached hints, or the result of the (shared) generation; None if generation fails
+    """
+
+    def __init__(self, ttl: int = 86400, max_entries: int = 256):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.redis = None
+        self._local: dict[str, tuple[float, list[str]]] = {}
+        self._inflight: dict[str, asyncio.Task] = {}
+
+    def attach(self, redis_client):
+        self.redis = redis_client
+
+    @staticmethod
+    def key(prompt: str) -> str:
+        return hashlib.blake2b(prompt.strip().encode(), digest_size=16).hexdigest()
+
+    async def _cached(self, key: str) -> Optional[list[str]]:
+        entry = self._local.get(key)
+        if entry is not None and time.time() - entry[0] < self.ttl:
+            return entry[1]
+        if self.redis is not None:
+            try:
+                stored = await self.redis.get(f"hints:{key}")
+                if stored:
+                    hints = json.loads(stored)
+                    self._local[key] = (time.time(), hints)
+                    return hints
+            except Exception as e:
+                print(f"Hint cache: redis read failed ({e})")
+        return None
+
+    async def _store(self, key: str, hints: list[str]):
+        self._local[key] = (time.time(), hints)
+        if len(self._local) > self.max_entries:
+            del self._local[min(self._local, key=lambda old: self._local[old][0])]
+        if self.redis is not None:
+            try:
+                await self.redis.set(f"hints:{key}", json.dumps(hints), ex=self.ttl)
+            except Exception as e:
+                print(f"Hint cache: redis write failed ({e})")
+
+    async def _generate(self, key: str, generate: Callable[[], Awaitable[Optional[list[str]]]]) -> Optional[list[str]]:
+        try:
+            hints = await self._cached(key)
+            if hints is None:
+                hints = await generate()
+                if hints:
+                    await self._store(key, hints)
+            return hints
+        except Exception as e:
+            print(f"Hint generation failed ({e})")
+            return None
+        finally:
+            self._inflight.pop(key, None)
+
+    def _start(self, key: str, generate: Callable[[], Awaitable[Optional[list[str]]]]) -> asyncio.Task:
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.create_task(self._generate(key, generate))
+            self._inflight[key] = task
+        return task
+
+    def prefetch(self, prompt: str, generate: Callable[[], Awaitable[Optional[list[str]]]]):
+        """
+        Generate hints for `prompt` in the background unless already cached or in flight
+
+        Parameters
+        ----------
+        prompt: str
+            Problem prompt
+        generate: Callable
+            Coroutine function returning the hint list (or None when hints cannot be generated)
+        """
+        self._start(self.key(prompt), generate)
+
+    async def get(self, prompt: str, generate: Callable[[], Awaitable[Optional[list[str]]]]) -> Optional[list[str]]:
+        """
+        Hints for `prompt`, generating them (once, shared by concurrent callers) if not cached
+        """
+        key = self.key(prompt)
+        hints = await self._cached(key)
+        if hints is not None:
+            return hints
+        return await asyncio.shield(self._start(key, generate))
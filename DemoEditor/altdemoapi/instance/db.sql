@@ -24,6 +24,32 @@ CREATE TABLE IF NOT EXISTS user_sessions (
     INDEX idx_token (jwt_token)
 );
 
+-- Submissions table: latest answer per student per question (code and problems are codec-encoded text)
+CREATE TABLE IF NOT EXISTS submissions (
+    submission_id INT AUTO_INCREMENT PRIMARY KEY,
+    question_id VARCHAR(64) NOT NULL,
+    student_email VARCHAR(255) NOT NULL,
+    seq INT NOT NULL,
+    code MEDIUMTEXT NOT NULL,
+    correct BOOLEAN,
+    problems MEDIUMTEXT,
+    skills JSON,
+    submitted_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    UNIQUE KEY uq_question_student (question_id, student_email),
+    INDEX idx_question_seq (question_id, seq)
+);
+
+-- Class rosters: students (or co-teachers) listed for a class, imported in bulk before they first log in
+CREATE TABLE IF NOT EXISTS class_rosters (
+    class_id VARCHAR(64) NOT NULL,
+    email VARCHAR(255) NOT NULL,
+    name VARCHAR(255),
+    role ENUM('teacher', 'student') DEFAULT 'student',
+    added_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (class_id, email),
+    INDEX idx_roster_email (email)
+);
+
 -- Update existing CLASS table to reference users
 ALTER TABLE CLASS 
 ADD COLUMN teacher_id INT,
@@ -0,0 +1,148 @@
+"""
+Redis-backed job queues for the execution and AI worker services
+
+The API pushes CPU- and latency-heavy work (running student code, AI grading) onto a Redis list
+(`jobs:<name>`) where `worker.py` processes consume it; results come back on a per-process reply list
+that a single listener task drains, so waiting on many jobs uses one Redis connection. Workers announce
+themselves in `workers:<name>` (a sorted set of heartbeat times). When no worker is alive, Redis is down,
+or a job times out, the work runs in this process instead.
+
+Classes
+-------
+JobQueue:
+    Client side of one named queue -- run a job remotely when workers are available, locally otherwise
+"""
+
+import asyncio
+import json
+import time
+import uuid
+from typing import Any, Callable, Optional
+
+WORKER_HEARTBEAT_SECONDS = 5
+WORKER_TTL = 15
+REPLY_TTL = 120
+
+
+def queue_key(name: str) -> str:
+    return f"jobs:{name}"
+
+
+def workers_key(name: str) -> str:
+    return f"workers:{name}"
+
+
+class JobQueue:
+    """
+    JobQueue sends jobs to the `name` worker service
+        - run: remote result when a worker is alive, otherwise the `local` callable run in a thread
+        - a remote job carries a deadline; workers drop jobs whose caller already gave up on them
+    """
+
+    def __init__(self, name: str, timeout: float = 60.0):
+        self.name = name
+        self.timeout = timeout
+        self.redis = None
+        self.reply_key = f"jobs:replies:{uuid.uuid4().hex}"
+        self._waiters: dict[str, asyncio.Future] = {}
+        self._listener: Optional[asyncio.Task] = None
+
+    def attach(self, redis_client):
+        self.redis = redis_client
+
+    def start(self):
+        if self._listener is None:
+            self._listener = asyncio.create_task(self._listen())
+
+    async def stop(self):
+        if self._listener is not None:
+            self._listener.cancel()
+            try:
+                await self._listener
+            except asyncio.CancelledError:
+                pass
+            self._listener = None
+
+    async def _listen(self):
+        while True:
+            redis_client = self.redis
+            if redis_client is None:
+                await asyncio.sleep(1)
+                continue
+            try:
+                item = await redis_client.blpop(self.reply_key, timeout=1)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"Job queue {self.name}: reply listener error ({e})")
+                await asyncio.sleep(1)
+                continue
+            if item is None:
+                continue
+            reply = json.loads(item[1])
+            waiter = self._waiters.pop(reply["id"], None)
+            if waiter is not None and not waiter.done():
+                waiter.set_result(reply)
+
+    async def has_workers(self) -> bool:
+        """
+        True when Redis is up and at least one worker heartbeat is recent
+        """
+        if self.redis is None or self._listener is None:
+            return False
+        try:
+            return await self.redis.zcount(workers_key(self.name), time.time() - WORKER_TTL, "+inf") > 0
+        except Exception:
+            return False
+
+    def pipe_status(self, pipe):
+        """
+        Queue the reads of this queue's depth and live worker count on a Redis pipeline; pass both replies to
+        `status`
+        """
+        pipe.llen(queue_key(self.name))
+        pipe.zcount(workers_key(self.name), time.time() - WORKER_TTL, "+inf")
+
+    def status(self, queued: Optional[int] = None, workers: Optional[int] = None) -> dict:
+        """
+        Jobs waiting in the queue and live workers (None while Redis is unavailable), plus this process's
+        jobs awaiting a reply
+        """
+        return {"queued": queued, "workers": workers, "awaiting_reply": len(self._waiters)}
+
+    async def _run_remote(self, payload: dict) -> Any:
+        job_id = uuid.uuid4().hex
+        deadline = time.time() + self.timeout
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters[job_id] = waiter
+        try:
+            job = {"id": job_id, "payload": payload, "reply_to": self.reply_key, "deadline": deadline}
+            await self.redis.rpush(queue_key(self.name), json.dumps(job))
+            reply = await asyncio.wait_for(waiter, self.timeout)
+        finally:
+            self._waiters.pop(job_id, None)
+        if "error" in reply:
+            raise RuntimeError(f"{self.name} worker failed: {reply['error']}")
+        return reply["result"]
+
+    async def run(self, payload: dict, local: Callable[[], Any]) -> Any:
+        """
+        Run a job on the worker service, or locally when that is not possible
+
+        Parameters
+        ----------
+        payload: dict
+            JSON-serializable job arguments passed to the worker's handler
+        local: Callable
+            Equivalent in-process call, run in a thread when no worker can take the job
+        """
+        if await self.has_workers():
+            try:
+                return await self._run_remote(payload)
+            except asyncio.TimeoutError:
+                print(f"Job queue {self.name}: no reply within {self.timeout:g}s, running locally")
+            except RuntimeError:
+                raise
+            except Exception as e:
+                print(f"Job queue {self.name}: remote run failed ({e}), running locally")
+        return await asyncio.to_thread(local)
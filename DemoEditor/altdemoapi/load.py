@@ -1,9 +1,25 @@
-import yaml
+"""
+Configuration loading
+
+Settings are loaded lazily: importing this module reads no files. `load.ERRORS`, `load.CONFIG`,
+`load.QUERIES` and the env-backed values (`load.OPEN_AI_API_KEY`, `load.DB_*`, ...) are resolved on first
+access through the module-level `SETTINGS`, and the yaml-backed ones are re-parsed when their file
+changes on disk (checked at most once every `RELOAD_CHECK_SECONDS`).
+
+Classes
+-------
+Settings:
+    Lazily loaded, hot-reloading holder for errors, config, queries and environment values
+"""
+
 import os
-from dotenv import load_dotenv
-from typing import Any
+import threading
+import time
+from typing import Any, Optional
 import re
 
+RELOAD_CHECK_SECONDS = 1.0
+
 
 class QueryTags:
     def __init__(self):
@@ -15,49 +31,84 @@ class QueryTags:
 
 
 class Loader:
+    # yaml file backing this loader, watched for hot reload (None when not file-backed)
+    source: Optional[str] = None
+
     def load(self):
         pass
 
     @staticmethod
-    def load_file(file_nm):
+    def resolve_path(file_nm: str) -> str:
         # Support both absolute paths and paths relative to this module
         if os.path.isabs(file_nm):
-            path = file_nm
-        else:
-            base = os.path.dirname(__file__)
-            path = os.path.join(base, file_nm)
-            # Fallback to given name if the constructed path doesn't exist
-            if not os.path.exists(path):
-                path = file_nm
-
-        with open(path, "r") as file:
+            return file_nm
+        base = os.path.dirname(__file__)
+        path = os.path.join(base, file_nm)
+        # Fallback to given name if the constructed path doesn't exist
+        return path if os.path.exists(path) else file_nm
+
+    @staticmethod
+    def load_file(file_nm):
+        import yaml
+
+        with open(Loader.resolve_path(file_nm), "r") as file:
             return yaml.safe_load(file)
 
 
 class Errors(Loader):
+    source = "config/errors.yaml"
+
     def __init__(self):
         self.null_response = None
         self.ai_response_format = None
         self.db_run_time = None
         self.db_set_up_exists = None
         self.missing_param = None
+        self.ai_unavailable = None
 
     def load(self):
-        loaded_errors: dict[str, Any] = self.load_file("config/errors.yaml")
+        loaded_errors: dict[str, Any] = self.load_file(self.source)
         error_fields = vars(self)
         for error, error_str in loaded_errors.items():
             error_fields[error] = error_str
 
 
 class Config(Loader):
+    source = "config/conf.yaml"
+
     def __init__(self):
         self.ai_context = None
         self.test_file_dir = None
         self.ai_sample_inc = None
         self.db_set_up_path = None
+        self.ai_structured_output = False
+        self.ai_structured_models = []
+        self.ai_structured_context = None
+        self.ai_code_token_budget = None
+        self.ai_routes = {}
+        self.ai_breaker = {}
+        self.ai_hedge = {}
+        self.grading_debounce_seconds = 0
+        self.exec_timeout_seconds = None
+        self.job_timeout_seconds = None
+        self.drain_timeout_seconds = None
+        self.exec_cache = {}
+        self.exec_mode = "subprocess"
+        self.exec_preload = []
+        self.exec_fork_pool = None
+        self.batch_exec_concurrency = None
+        self.cluster_grading = False
+        self.skill_bucket_seconds = None
+        self.skill_history_limit = None
+        self.skill_aliases = {}
+        self.hint_levels = None
+        self.hint_ttl_seconds = None
+        self.submission_flush_seconds = None
+        self.user_cache_ttl_seconds = None
+        self.login_batch_window_seconds = None
 
     def load(self):
-        loaded_config: dict[str, Any] = self.load_file("config/conf.yaml")
+        loaded_config: dict[str, Any] = self.load_file(self.source)
         config_fields = vars(self)
         for config, config_element in loaded_config.items():
             config_fields[config] = config_element
@@ -67,7 +118,8 @@ class Query:
     def __init__(self, name: str, query: str):
         self.name = name
         self.query = query
-        self.params = re.findall(r"\{(.*)}", self.query)
+        self.params = re.findall(r"\{(\w+)}", self.query)
+        self.sql = re.sub(r"\{(\w+)}", "%s", self.query)
 
     def to_sql(self, params: dict[str, Any]):
         values = []
@@ -75,27 +127,179 @@ class Query:
             if param not in params:
                 raise Exception(f"ERRORS.missing_param {param}")
             values.append(params[param])
-        re.sub(r"\{(.*)}", "%s", self.query)
-        return self.query, values
+        return self.sql, values
 
 
 class Queries(Loader):
     def __init__(self):
         self.test_query = "SELECT * FROM {table};"
+        self.insert_submission = Query(
+            "insert_submission",
+            "INSERT INTO submissions (question_id, student_email, seq, code, correct, problems, skills) "
+            "VALUES ({question_id}, {student_email}, {seq}, {code}, {correct}, {problems}, {skills}) "
+            "ON DUPLICATE KEY UPDATE seq = VALUES(seq), code = VALUES(code), correct = VALUES(correct), "
+            "problems = VALUES(problems), skills = VALUES(skills), submitted_at = CURRENT_TIMESTAMP;"
+        )
+        self.get_question_submissions = Query(
+            "get_question_submissions",
+            "SELECT student_email, code, seq, correct, problems, skills, submitted_at "
+            "FROM submissions WHERE question_id = {question_id} ORDER BY seq;"
+        )
+        user_columns = "user_id, google_id, email, name, picture_url, role"
+        self.get_user_by_id = Query(
+            "get_user_by_id",
+            f"SELECT {user_columns} FROM users WHERE user_id = {{user_id}};"
+        )
+        self.get_user_by_email = Query(
+            "get_user_by_email",
+            f"SELECT {user_columns} FROM users WHERE email = {{email}};"
+        )
+        self.get_users_by_logins = Query(
+            "get_users_by_logins",
+            f"SELECT {user_columns} FROM users WHERE google_id IN {{google_ids}} OR email IN {{emails}};"
+        )
+        self.upsert_user = Query(
+            "upsert_user",
+            "INSERT INTO users (google_id, email, name, picture_url) "
+            "VALUES ({google_id}, {email}, {name}, {picture_url}) "
+            "ON DUPLICATE KEY UPDATE email = VALUES(email), name = VALUES(name), picture_url = VALUES(picture_url);"
+        )
+        self.update_user_role = Query(
+            "update_user_role",
+            "UPDATE users SET role = {role} WHERE user_id = {user_id};"
+        )
+        self.upsert_roster_entry = Query(
+            "upsert_roster_entry",
+            "INSERT INTO class_rosters (class_id, email, name, role) VALUES ({class_id}, {email}, {name}, {role}) "
+            "ON DUPLICATE KEY UPDATE name = VALUES(name), role = VALUES(role);"
+        )
+        self.get_class_roster = Query(
+            "get_class_roster",
+            "SELECT email, name, role FROM class_rosters WHERE class_id = {class_id} ORDER BY email;"
+        )
+
+
+class Environment(Loader):
+    def __init__(self):
+        self.open_ai_api_key: Optional[str] = None
+        self.db_user: Optional[str] = None
+        self.db_password: Optional[str] = None
+        self.db_host: Optional[str] = None
+        self.db_database: Optional[str] = None
+        self.google_client_id: Optional[str] = None
+        self.jwt_secret: Optional[str] = None
+
+    def load(self):
+        from dotenv import load_dotenv
+
+        load_dotenv()
+        env_fields = vars(self)
+        for field in env_fields:
+            env_fields[field] = os.getenv(field.upper())
+
+
+class Settings:
+    """
+    Settings loads each part of the configuration on first use and keeps it current
+        - errors, config, queries and env are built on first access, never at import
+        - file-backed parts are swapped for a freshly parsed copy when their file's mtime changes;
+          a copy that fails to parse (e.g. a half-written file) is ignored and the old one kept
+    """
+
+    def __init__(self, check_interval: float = RELOAD_CHECK_SECONDS):
+        self.check_interval = check_interval
+        self._loaded: dict[str, Loader] = {}
+        self._mtimes: dict[str, float] = {}
+        self._checked_at = time.monotonic()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _mtime(loader_cls: type) -> Optional[float]:
+        if loader_cls.source is None:
+            return None
+        try:
+            return os.stat(Loader.resolve_path(loader_cls.source)).st_mtime
+        except OSError:
+            return None
+
+    def _build(self, name: str, loader_cls: type) -> Loader:
+        mtime = self._mtime(loader_cls)
+        loader = loader_cls()
+        loader.load()
+        self._loaded[name] = loader
+        self._mtimes[name] = mtime
+        return loader
+
+    def _get(self, name: str, loader_cls: type) -> Loader:
+        loader = self._loaded.get(name)
+        if loader is None:
+            with self._lock:
+                loader = self._loaded.get(name) or self._build(name, loader_cls)
+            return loader
+        now = time.monotonic()
+        if now - self._checked_at >= self.check_interval:
+            self._checked_at = now
+            self.reload_changed()
+            loader = self._loaded[name]
+        return loader
 
+    def reload_changed(self) -> list[str]:
+        """
+        Re-parse every loaded part whose backing file changed
 
-ERRORS = Errors()
-CONFIG = Config()
-QUERIES = Queries()
-ERRORS.load()
-CONFIG.load()
+        Returns
+        -------
+        list[str]
+            Names of the parts that were reloaded
+        """
+        reloaded = []
+        with self._lock:
+            for name, loader in list(self._loaded.items()):
+                mtime = self._mtime(type(loader))
+                if mtime is None or mtime == self._mtimes.get(name):
+                    continue
+                try:
+                    self._build(name, type(loader))
+                except Exception as e:
+                    # Don't retry until the file changes again
+                    self._mtimes[name] = mtime
+                    print(f"Settings: failed to reload {loader.source} ({e}), keeping previous values")
+                    continue
+                reloaded.append(name)
+        if reloaded:
+            print(f"Settings: reloaded {', '.join(reloaded)}")
+        return reloaded
 
-load_dotenv()
-OPEN_AI_API_KEY = os.getenv("OPEN_AI_API_KEY")
-DB_USER = os.getenv("DB_USER")
-DB_PASSWORD = os.getenv("DB_PASSWORD")
-DB_HOST = os.getenv("DB_HOST")
-DB_DATABASE = os.getenv("DB_DATABASE")
+    @property
+    def errors(self) -> Errors:
+        return self._get("errors", Errors)
+
+    @property
+    def config(self) -> Config:
+        return self._get("config", Config)
+
+    @property
+    def queries(self) -> Queries:
+        return self._get("queries", Queries)
+
+    @property
+    def env(self) -> Environment:
+        return self._get("env", Environment)
+
+
+SETTINGS = Settings()
+
+_SETTINGS_ATTRS = {"ERRORS": "errors", "CONFIG": "config", "QUERIES": "queries"}
+_ENV_ATTRS = {"OPEN_AI_API_KEY", "DB_USER", "DB_PASSWORD", "DB_HOST", "DB_DATABASE", "GOOGLE_CLIENT_ID", "JWT_SECRET"}
+
+
+def __getattr__(name: str):
+    # Module attributes resolved on access (PEP 562) so importing `load` stays cheap
+    if name in _SETTINGS_ATTRS:
+        return getattr(SETTINGS, _SETTINGS_ATTRS[name])
+    if name in _ENV_ATTRS:
+        return getattr(SETTINGS.env, name.lower())
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 """
 def increment_ai_samples():
@@ -110,6 +314,8 @@ def reset_ai_samples(num: int):
 
 
 def dump_conf(spec_config=None):
-    to_dump = CONFIG if not spec_config else spec_config
+    import yaml
+
+    to_dump = SETTINGS.config if not spec_config else spec_config
     with open("config/conf.yaml", "w") as conf_file:
         yaml.safe_dump(to_dump, conf_file)
@@ -0,0 +1,285 @@
+"""
+Google sign-in and session tokens
+
+Google ID tokens are verified locally: the token's RS256 signature is checked against Google's published
+signing keys (JWKS), then its audience, issuer, expiry and email verification. The keys are fetched once,
+kept for as long as Google's Cache-Control allows, and refreshed in the background before they expire, so
+a login costs one signature check and no outbound request. A token signed with a key we have not seen
+yet (Google rotated) triggers one immediate refresh, shared by every login waiting on it.
+
+Sessions use our own HS256 JWTs signed with JWT_SECRET.
+
+Classes
+-------
+AuthError:
+    A token was rejected
+KeySet:
+    Cached, background-refreshed signing keys from a JWKS source
+OAuthService:
+    Google ID-token verification and session JWTs
+"""
+
+import asyncio
+import re
+import secrets
+import time
+from typing import Any, Awaitable, Callable, Optional
+
+import load
+
+GOOGLE_CERTS_URL = "https://www.googleapis.com/oauth2/v3/certs"
+GOOGLE_ISSUERS = ("accounts.google.com", "https://accounts.google.com")
+SESSION_ALGORITHM = "HS256"
+_MAX_AGE = re.compile(r"max-age=(\d+)")
+
+
+class AuthError(Exception):
+    """
+    A Google ID token or session token is invalid, expired or cannot be checked
+    """
+
+
+async def fetch_google_keys(url: str = GOOGLE_CERTS_URL, timeout: float = 5.0) -> tuple[dict, Optional[float]]:
+    """
+    Download a JWKS document
+
+    Returns
+    -------
+    tuple
+        The JWKS ({"keys": [...]}) and its Cache-Control max-age in seconds (None if not given)
+    """
+    import httpx
+
+    async with httpx.AsyncClient(timeout=timeout) as client:
+        response = await client.get(url)
+        response.raise_for_status()
+    max_age = _MAX_AGE.search(response.headers.get("cache-control", ""))
+    return response.json(), float(max_age.group(1)) if max_age else None
+
+
+class KeySet:
+    """
+    KeySet keeps the public keys of a JWKS source by key id
+        - get: key for a `kid`, refreshing once (single-flight, at most every `min_refresh` seconds)
+          when the kid is unknown
+        - start / stop: background refresh ahead of expiry; a failed refresh keeps the old keys and
+          retries after `retry_seconds`
+    `fetch` returns (jwks, max_age); tests pass a local key set in place of Google's.
+    """
+
+    def __init__(self, fetch: Callable[[], Awaitable[tuple[dict, Optional[float]]]] = fetch_google_keys,
+                 default_ttl: float = 3600, min_refresh: float = 30, retry_seconds: float = 30):
+        self.fetch = fetch
+        self.default_ttl = default_ttl
+        self.min_refresh = min_refresh
+        self.retry_seconds = retry_seconds
+        self._keys: dict[str, Any] = {}
+        self._expires_at = 0.0
+        self._refreshed_at = float("-inf")
+        self._refreshing: Optional[asyncio.Task] = None
+        self._task: Optional[asyncio.Task] = None
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+    @staticmethod
+    def parse(jwks: dict) -> dict[str, Any]:
+        """
+        Public keys of a JWKS document by kid (keys that are not RSA signing keys are skipped)
+        """
+        import jwt
+
+        keys = {}
+        for jwk in jwks.get("keys", []):
+            if jwk.get("kty") != "RSA" or jwk.get("use", "sig") != "sig" or "kid" not in jwk:
+                continue
+            try:
+                keys[jwk["kid"]] = jwt.PyJWK(jwk, algorithm="RS256").key
+            except jwt.PyJWKError as e:
+                print(f"Key set: skipping key {jwk['kid']} ({e})")
+        return keys
+
+    async def _fetch(self):
+        try:
+            jwks, max_age = await self.fetch()
+            keys = self.parse(jwks)
+            if not keys:
+                raise AuthError("key set has no usable keys")
+            self._keys = keys
+            self._expires_at = time.monotonic() + (max_age if max_age is not None else self.default_ttl)
+        finally:
+            self._refreshed_at = time.monotonic()
+            self._refreshing = None
+
+    async def refresh(self):
+        """
+        Fetch the key set now, joining a refresh already in progress
+        """
+        if self._refreshing is None:
+            self._refreshing = asyncio.create_task(self._fetch())
+        await asyncio.shield(self._refreshing)
+
+    async def get(self, kid: str):
+        """
+        Public key for `kid`
+
+        Raises
+        ------
+        AuthError
+            If the kid is unknown after a refresh, or no keys could be fetched
+        """
+        key = self._keys.get(kid)
+        if key is not None:
+            return key
+        if self._refreshing is not None or time.monotonic() - self._refreshed_at >= self.min_refresh:
+            try:
+                await self.refresh()
+            except Exception as e:
+                if not self._keys:
+                    raise AuthError(f"signing keys unavailable ({e})")
+                print(f"Key set: refresh failed ({e}), keeping {len(self._keys)} key(s)")
+        key = self._keys.get(kid)
+        if key is None:
+            raise AuthError("token signed with an unknown key")
+        return key
+
+    async def _refresh_loop(self):
+        while True:
+            try:
+                await self.refresh()
+                # Refresh a little ahead of expiry so logins never wait on the fetch
+                delay = max(self.min_refresh, (self._expires_at - time.monotonic()) * 0.9)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"Key set: refresh failed ({e}), retrying in {self.retry_seconds}s")
+                delay = self.retry_seconds
+            await asyncio.sleep(delay)
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._refresh_loop())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+
+class OAuthService:
+    """
+    OAuthService checks Google sign-ins and issues session tokens
+        - verify_google_token: local signature and claim checks against the cached key set
+        - create_jwt_token / verify_jwt_token: HS256 session tokens valid for `session_ttl` seconds
+    `client_id` and `jwt_secret` default to GOOGLE_CLIENT_ID and JWT_SECRET from the environment.
+    """
+
+    def __init__(self, client_id: Optional[str] = None, jwt_secret: Optional[str] = None,
+                 keys: Optional[KeySet] = None, session_ttl: int = 24 * 3600, leeway: float = 60):
+        self._client_id = client_id
+        self._jwt_secret = jwt_secret
+        self.keys = keys if keys is not None else KeySet()
+        self.session_ttl = session_ttl
+        self.leeway = leeway
+
+    @property
+    def client_id(self) -> Optional[str]:
+        return self._client_id or load.GOOGLE_CLIENT_ID
+
+    @property
+    def jwt_secret(self) -> str:
+        if not self._jwt_secret:
+            self._jwt_secret = load.JWT_SECRET
+        if not self._jwt_secret:
+            # Sessions then only survive as long as this process -- fine for development, not production
+            print("Warning: JWT_SECRET is not set, using a random per-process secret")
+            self._jwt_secret = secrets.token_urlsafe(32)
+        return self._jwt_secret
+
+    async def start(self):
+        """
+        Load Google's keys and keep them fresh in the background
+        """
+        self.keys.start()
+
+    async def stop(self):
+        await self.keys.stop()
+
+    async def verify_google_token(self, token: str) -> dict:
+        """
+        Verify a Google ID token
+
+        Parameters
+        ----------
+        token: str
+            The `credential` returned by Google sign-in
+
+        Returns
+        -------
+        dict
+            {google_id, email, name, picture}
+
+        Raises
+        ------
+        AuthError
+            If the token is malformed, not signed by Google, expired, issued for another client or the
+            email is not verified
+        """
+        import jwt
+
+        if not self.client_id:
+            raise AuthError("GOOGLE_CLIENT_ID is not configured")
+        try:
+            header = jwt.get_unverified_header(token)
+        except jwt.PyJWTError as e:
+            raise AuthError(f"malformed token ({e})")
+        if header.get("alg") != "RS256":
+            raise AuthError("unexpected token algorithm")
+        key = await self.keys.get(header.get("kid", ""))
+        try:
+            claims = jwt.decode(token, key, algorithms=["RS256"], audience=self.client_id, leeway=self.leeway,
+                                options={"require": ["exp", "iat", "iss", "aud", "sub"]})
+        except jwt.PyJWTError as e:
+            raise AuthError(f"invalid token ({e})")
+        if claims["iss"] not in GOOGLE_ISSUERS:
+            raise AuthError("token not issued by Google")
+        if not claims.get("email") or not claims.get("email_verified"):
+            raise AuthError("email not verified")
+        return {
+            "google_id": claims["sub"],
+            "email": claims["email"],
+            "name": claims.get("name") or claims["email"],
+            "picture": claims.get("picture"),
+        }
+
+    def create_jwt_token(self, user_id: int, email: str, role: str) -> str:
+        """
+        Session token for a signed-in user
+        """
+        import jwt
+
+        now = int(time.time())
+        payload = {"sub": str(user_id), "user_id": user_id, "email": email, "role": role,
+                   "iat": now, "exp": now + self.session_ttl}
+        return jwt.encode(payload, self.jwt_secret, algorithm=SESSION_ALGORITHM)
+
+    def verify_jwt_token(self, token: str) -> dict:
+        """
+        Claims of a session token
+
+        Raises
+        ------
+        AuthError
+            If the token is invalid or expired
+        """
+        import jwt
+
+        try:
+            return jwt.decode(token, self.jwt_secret, algorithms=[SESSION_ALGORITHM],
+                              options={"require": ["exp", "user_id"]})
+        except jwt.PyJWTError as e:
+            raise AuthError(f"invalid session token ({e})")
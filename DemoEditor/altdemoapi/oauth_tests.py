@@ -0,0 +1,105 @@
+import asyncio
+import json
+import time
+import unittest
+
+import jwt
+from cryptography.hazmat.primitives.asymmetric import rsa
+from jwt.algorithms import RSAAlgorithm
+
+from oauth_service import AuthError, KeySet, OAuthService
+
+CLIENT_ID = "test-client.apps.googleusercontent.com"
+
+
+def make_key(kid: str):
+    private_key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    jwk = json.loads(RSAAlgorithm.to_jwk(private_key.public_key()))
+    jwk.update(kid=kid, use="sig", alg="RS256")
+    return private_key, jwk
+
+
+KEYS = dict((kid, make_key(kid)) for kid in ("old", "new"))
+
+
+class LocalKeys:
+    """
+    Stands in for Google's certs endpoint: serves the chosen keys and counts fetches
+    """
+
+    def __init__(self, *kids: str):
+        self.kids = list(kids)
+        self.fetches = 0
+
+    async def __call__(self):
+        self.fetches += 1
+        await asyncio.sleep(0)
+        return {"keys": [KEYS[kid][1] for kid in self.kids]}, 3600
+
+
+def google_token(kid: str = "old", **claims) -> str:
+    now = int(time.time())
+    payload = {"iss": "https://accounts.google.com", "aud": CLIENT_ID, "sub": "1234567890",
+               "email": "ada@example.edu", "email_verified": True, "name": "Ada", "picture": "https://pic",
+               "iat": now, "exp": now + 3600}
+    payload.update(claims)
+    return jwt.encode(payload, KEYS[kid][0], algorithm="RS256", headers={"kid": kid})
+
+
+class GoogleTokenTests(unittest.TestCase):
+
+    def setUp(self):
+        self.source = LocalKeys("old")
+        self.service = OAuthService(client_id=CLIENT_ID, jwt_secret="secret", keys=KeySet(self.source))
+
+    def verify(self, token: str) -> dict:
+        return asyncio.run(self.service.verify_google_token(token))
+
+    def test_valid_token(self):
+        self.assertEqual({"google_id": "1234567890", "email": "ada@example.edu", "name": "Ada",
+                          "picture": "https://pic"}, self.verify(google_token()))
+
+    def test_burst_of_logins_fetches_keys_once(self):
+        async def run():
+            return await asyncio.gather(*(self.service.verify_google_token(google_token()) for _ in range(50)))
+
+        self.assertEqual(50, len(asyncio.run(run())))
+        self.assertEqual(1, self.source.fetches)
+
+    def test_rejected_claims(self):
+        for claims in ({"aud": "someone-else"}, {"iss": "https://evil.example"}, {"email_verified": False},
+                       {"exp": int(time.time()) - 3600}):
+            with self.subTest(claims=claims), self.assertRaises(AuthError):
+                self.verify(google_token(**claims))
+
+    def test_rotated_key_refreshes(self):
+        self.verify(google_token("old"))
+        self.source.kids = ["new"]
+        self.service.keys.min_refresh = 0
+        self.assertEqual("ada@example.edu", self.verify(google_token("new"))["email"])
+        self.assertEqual(2, self.source.fetches)
+
+    def test_unknown_key_refresh_is_rate_limited(self):
+        self.verify(google_token("old"))
+        with self.assertRaises(AuthError):
+            self.verify(google_token("new"))
+        self.assertEqual(1, self.source.fetches)
+
+
+class SessionTokenTests(unittest.TestCase):
+
+    def setUp(self):
+        self.service = OAuthService(client_id=CLIENT_ID, jwt_secret="secret", keys=KeySet(LocalKeys()))
+
+    def test_round_trip(self):
+        claims = self.service.verify_jwt_token(self.service.create_jwt_token(7, "ada@example.edu", "teacher"))
+        self.assertEqual((7, "ada@example.edu", "teacher"), (claims["user_id"], claims["email"], claims["role"]))
+
+    def test_wrong_secret(self):
+        token = OAuthService(jwt_secret="other").create_jwt_token(7, "ada@example.edu", "teacher")
+        with self.assertRaises(AuthError):
+            self.service.verify_jwt_token(token)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,24 @@
+"""
+Benchmark for AI response parsing against the recorded samples in CONFIG.test_file_dir
+
+Usage: python parser_bench.py [iterations]
+"""
+
+import ai_utils
+import load
+import os
+import sys
+import timeit
+
+
+def bench(iterations: int = 2000):
+    sample_dir = load.CONFIG.test_file_dir
+    for file_nm in sorted(os.listdir(sample_dir)):
+        with open(os.path.join(sample_dir, file_nm), "r") as sample:
+            text = sample.read()
+        seconds = timeit.timeit(lambda: ai_utils.Agent.parse_response(text), number=iterations)
+        print(f"{file_nm}: {seconds / iterations * 1e6:.1f} us/parse ({len(text)} chars)")
+
+
+if __name__ == "__main__":
+    bench(int(sys.argv[1]) if len(sys.argv) > 1 else 2000)
@@ -0,0 +1,167 @@
+"""
+Problem broadcast built on Redis Streams
+
+Every problem a teacher creates is appended to the class stream (`problems:<class_id>`). Reading is
+non-destructive: each student keeps the id of the last problem they received (their offset) and asks for
+the next entry after it, so every student gets every problem exactly once and late joiners catch up from
+their own offset. Without an offset a reader gets the class's latest problem. While Redis is unavailable
+the same model runs on an in-memory list with the same id format. Stream keys are also recorded in the
+`problem_streams` set so status reads can count every class without scanning the keyspace.
+
+Classes
+-------
+ProblemStream:
+    Append-only per-class problem log with offset reads
+"""
+
+import bisect
+import codec
+import json
+import time
+from typing import Optional
+
+STREAM_MAXLEN = 1000
+DEFAULT_CLASS = "default"
+STREAMS_KEY = "problem_streams"
+
+# Length of every stream recorded in KEYS[1], as a flat [key, length, ...] list -- one command per status read
+_LENGTHS_SCRIPT = """
+local result = {}
+for _, key in ipairs(redis.call('SMEMBERS', KEYS[1])) do
+    result[#result + 1] = key
+    result[#result + 1] = redis.call('XLEN', key)
+end
+return result
+"""
+
+
+def _id_key(entry_id: str) -> tuple[int, int]:
+    millis, _, seq = entry_id.partition("-")
+    return int(millis), int(seq or 0)
+
+
+def _next_id(entry_id: str) -> str:
+    """
+    Smallest stream id after `entry_id` -- an inclusive XRANGE start from it reads strictly after the
+    offset without the exclusive "(" syntax, which needs Redis 6.2
+    """
+    millis, seq = _id_key(entry_id)
+    return f"{millis}-{seq + 1}"
+
+
+class ProblemStream:
+    """
+    ProblemStream publishes problems to a class stream and reads them by offset
+        - publish: append a problem, returns its stream id
+        - next_after: first problem after an offset (or the latest when no offset is given)
+        - pipe_lengths / lengths: number of problems kept per class
+    """
+
+    def __init__(self, maxlen: int = STREAM_MAXLEN):
+        self.maxlen = maxlen
+        self.redis = None
+        self._local: dict[str, list[tuple[tuple[int, int], str, dict]]] = {}
+
+    def attach(self, redis_client):
+        self.redis = redis_client
+
+    @staticmethod
+    def key(class_id: Optional[str]) -> str:
+        return f"problems:{class_id or DEFAULT_CLASS}"
+
+    def _local_publish(self, key: str, problem: dict) -> str:
+        entries = self._local.setdefault(key, [])
+        millis = int(time.time() * 1000)
+        seq = 0
+        if entries and entries[-1][0][0] >= millis:
+            millis, seq = entries[-1][0][0], entries[-1][0][1] + 1
+        entry_key = (millis, seq)
+        entry_id = f"{millis}-{seq}"
+        entries.append((entry_key, entry_id, problem))
+        del entries[:-self.maxlen]
+        return entry_id
+
+    def _local_next(self, key: str, offset: Optional[str]) -> Optional[tuple[str, dict]]:
+        entries = self._local.get(key)
+        if not entries:
+            return None
+        if not offset:
+            return entries[-1][1], entries[-1][2]
+        index = bisect.bisect_right(entries, _id_key(offset), key=lambda entry: entry[0])
+        if index >= len(entries):
+            return None
+        return entries[index][1], entries[index][2]
+
+    async def publish(self, problem: dict, class_id: Optional[str] = None) -> str:
+        """
+        Append a problem to the class stream
+
+        Returns
+        -------
+        str
+            Stream id of the new entry -- readers pass it back as their offset
+        """
+        key = self.key(class_id)
+        if self.redis is not None:
+            try:
+                async with self.redis.pipeline(transaction=False) as pipe:
+                    pipe.xadd(key, {"data": codec.encode(json.dumps(problem))}, maxlen=self.maxlen,
+                              approximate=True)
+                    pipe.sadd(STREAMS_KEY, key)
+                    entry_id, _ = await pipe.execute()
+                return entry_id
+            except Exception as e:
+                print(f"Redis write failed, falling back to in-memory problem stream: {e}")
+        return self._local_publish(key, problem)
+
+    async def next_after(self, offset: Optional[str] = None,
+                         class_id: Optional[str] = None) -> Optional[tuple[str, dict]]:
+        """
+        Read the first problem after `offset`, or the latest problem when no offset is given
+
+        Returns
+        -------
+        Optional[tuple]
+            (stream id, problem) or None if there is nothing newer
+        """
+        key = self.key(class_id)
+        start = _next_id(offset) if offset else None
+        if self.redis is not None:
+            try:
+                if start:
+                    entries = await self.redis.xrange(key, min=start, max="+", count=1)
+                else:
+                    entries = await self.redis.xrevrange(key, max="+", min="-", count=1)
+                if not entries:
+                    return None
+                entry_id, fields = entries[0]
+                return entry_id, json.loads(codec.decode(fields["data"]))
+            except Exception as e:
+                print(f"Redis read failed, falling back to in-memory problem stream: {e}")
+        return self._local_next(key, offset)
+
+    async def length(self, class_id: Optional[str] = None) -> int:
+        key = self.key(class_id)
+        if self.redis is not None:
+            try:
+                return await self.redis.xlen(key)
+            except Exception as e:
+                print(f"Redis read failed, falling back to in-memory problem stream: {e}")
+        return len(self._local.get(key, []))
+
+    @staticmethod
+    def pipe_lengths(pipe):
+        """
+        Queue the read of every class stream's length on a Redis pipeline; pass its reply to `lengths`
+        """
+        pipe.eval(_LENGTHS_SCRIPT, 1, STREAMS_KEY)
+
+    def lengths(self, reply: Optional[list] = None) -> dict[str, int]:
+        """
+        Number of problems in each class stream, keyed by class id -- from the reply to `pipe_lengths`, or
+        from the in-memory streams when there is none
+        """
+        prefix = self.key(None)[:-len(DEFAULT_CLASS)]
+        if reply is None:
+            return {key[len(prefix):]: len(entries) for key, entries in self._local.items()}
+        return {key[len(prefix):]: int(count) for key, count in zip(reply[::2], reply[1::2])}
@@ -1,22 +1,102 @@
+import asyncio
 import os
-from redis.asyncio import Redis
+from typing import Callable, Optional
+from redis.asyncio import BlockingConnectionPool, Redis
 
 REDIS_URL = os.getenv("REDIS_URL", "redis://localhost:6379/0")
+REDIS_POOL_SIZE = int(os.getenv("REDIS_POOL_SIZE", "20"))
+REDIS_HEALTH_INTERVAL = float(os.getenv("REDIS_HEALTH_INTERVAL", "5"))
+REDIS_TIMEOUT = float(os.getenv("REDIS_TIMEOUT", "2"))
+# How long a command waits for a free pooled connection before failing
+REDIS_POOL_TIMEOUT = float(os.getenv("REDIS_POOL_TIMEOUT", str(REDIS_TIMEOUT)))
 
-async def init_redis(app):
-    """Initialize a Redis client and attach it to app.state.redis"""
-    try:
-        client = Redis.from_url(REDIS_URL, decode_responses=True)
-        # Test the connection
-        await client.ping()
-        app.state.redis = client
-        print("✓ Redis connected successfully")
-    except Exception as e:
-        print(f"Redis unavailable ({type(e).__name__}): using in-memory fallback")
-        app.state.redis = None
+
+class RedisManager:
+    """
+    RedisManager owns a pooled Redis client and keeps probing it
+        - app.state.redis holds the client while Redis is healthy and None while it is down
+        - a background probe reconnects after an outage without restarting the process
+        - listeners are told about every switch so they can re-attach (or drop) the client
+        - the pool is bounded at `pool_size`; during a burst commands queue for a free connection (up to
+          `pool_timeout` seconds) instead of failing as if Redis were down
+    """
+
+    def __init__(self, app, url: str = REDIS_URL, pool_size: int = REDIS_POOL_SIZE,
+                 health_interval: float = REDIS_HEALTH_INTERVAL, pool_timeout: float = REDIS_POOL_TIMEOUT):
+        self.app = app
+        self.health_interval = health_interval
+        self.pool = BlockingConnectionPool.from_url(url, max_connections=pool_size, timeout=pool_timeout,
+                                                    decode_responses=True, socket_timeout=REDIS_TIMEOUT,
+                                                    socket_connect_timeout=REDIS_TIMEOUT,
+                                                    health_check_interval=health_interval)
+        self.client = Redis(connection_pool=self.pool)
+        self.healthy = False
+        self._listeners: list[Callable[[Optional[Redis]], None]] = []
+        self._task: Optional[asyncio.Task] = None
+
+    def on_change(self, listener: Callable[[Optional[Redis]], None]):
+        """
+        Register a callback receiving the client when Redis comes up and None when it goes down
+        """
+        self._listeners.append(listener)
+        listener(self.client if self.healthy else None)
+
+    def _set_healthy(self, healthy: bool):
+        if healthy == self.healthy:
+            return
+        self.healthy = healthy
+        current = self.client if healthy else None
+        self.app.state.redis = current
+        print("✓ Redis connected successfully" if healthy else "Redis unavailable: using in-memory fallback")
+        for listener in self._listeners:
+            listener(current)
+
+    async def probe(self) -> bool:
+        try:
+            healthy = bool(await self.client.ping())
+        except Exception as e:
+            if self.healthy:
+                print(f"Redis health probe failed ({type(e).__name__})")
+            healthy = False
+        self._set_healthy(healthy)
+        return healthy
+
+    async def _monitor(self):
+        while True:
+            await asyncio.sleep(self.health_interval)
+            await self.probe()
+
+    async def start(self):
+        self.app.state.redis = None
+        await self.probe()
+        if not self.healthy:
+            print("Redis unavailable: using in-memory fallback")
+        self._task = asyncio.create_task(self._monitor())
+
+    async def close(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        self.healthy = False
+        self.app.state.redis = None
+        await self.client.close()
+        await self.pool.disconnect()
+
+
+async def init_redis(app) -> RedisManager:
+    """Create the managed Redis client, attach it to app.state and start health probing"""
+    manager = RedisManager(app)
+    app.state.redis_manager = manager
+    await manager.start()
+    return manager
 
 async def close_redis(app):
-    client = getattr(app.state, "redis", None)
-    if client is not None:
-        await client.close()
-        app.state.redis = None
+    manager = getattr(app.state, "redis_manager", None)
+    if manager is not None:
+        await manager.close()
+        app.state.redis_manager = None
+    app.state.redis = None
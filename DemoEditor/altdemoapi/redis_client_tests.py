@@ -0,0 +1,65 @@
+import asyncio
+import unittest
+from types import SimpleNamespace
+
+from redis_client import RedisManager
+
+
+class SlowRedis:
+    """
+    Minimal RESP server: answers PING after `delay` seconds, anything else with +OK, and records how many
+    connections were open at once
+    """
+
+    def __init__(self, delay: float = 0.02):
+        self.delay = delay
+        self.open = 0
+        self.most_open = 0
+
+    async def handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        self.open += 1
+        self.most_open = max(self.most_open, self.open)
+        try:
+            while True:
+                header = await reader.readline()
+                if not header:
+                    return
+                args = []
+                for _ in range(int(header[1:])):
+                    size = int((await reader.readline())[1:])
+                    args.append((await reader.readexactly(size + 2))[:-2].decode())
+                if args[0].upper() == "PING":
+                    await asyncio.sleep(self.delay)
+                    writer.write(b"+PONG\r\n")
+                else:
+                    writer.write(b"+OK\r\n")
+                await writer.drain()
+        finally:
+            self.open -= 1
+            writer.close()
+
+
+class RedisPoolTests(unittest.TestCase):
+
+    def test_burst_waits_for_pooled_connections(self):
+        async def run():
+            redis = SlowRedis()
+            server = await asyncio.start_server(redis.handle, "127.0.0.1", 0)
+            port = server.sockets[0].getsockname()[1]
+            manager = RedisManager(SimpleNamespace(state=SimpleNamespace()), url=f"redis://127.0.0.1:{port}/0",
+                                   pool_size=2, pool_timeout=5)
+            try:
+                replies = await asyncio.gather(*(manager.client.ping() for _ in range(10)))
+            finally:
+                await manager.close()
+                server.close()
+                await server.wait_closed()
+            return replies, redis.most_open
+
+        replies, most_open = asyncio.run(run())
+        self.assertEqual([True] * 10, replies)
+        self.assertLessEqual(most_open, 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,168 @@
+"""
+Resilience utilities for calls to the AI provider
+
+Classes
+-------
+CircuitOpenError:
+    Raised instead of calling the provider while the breaker is open
+CircuitBreaker:
+    Trips after consecutive failures or slow calls, then lets a single probe through after a cooldown
+LatencyTracker:
+    Rolling latency samples per key with percentile lookup (used to time hedged requests)
+
+Functions
+---------
+hedged:
+    Run a call, and start a duplicate if the first has not returned by a latency percentile
+"""
+
+import threading
+import time
+from collections import deque
+from concurrent.futures import Executor, FIRST_COMPLETED, wait
+from typing import Callable, Optional
+
+
+class CircuitOpenError(Exception):
+    """
+    The circuit breaker is open -- the call was not attempted
+    """
+
+
+class CircuitBreaker:
+    """
+    CircuitBreaker guards a flaky dependency
+        - closed: calls pass through; `failure_threshold` consecutive failures or slow calls open the breaker
+        - open: calls fail fast with CircuitOpenError for `cooldown` seconds
+        - half-open: one probe call is let through; success closes the breaker, failure re-opens it
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, failure_threshold: int = 5, slow_call_seconds: Optional[float] = None, cooldown: float = 30.0):
+        self.failure_threshold = failure_threshold
+        self.slow_call_seconds = slow_call_seconds
+        self.cooldown = cooldown
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at: Optional[float] = None
+        self._probing = False
+        self._lock = threading.Lock()
+
+    def is_open(self) -> bool:
+        """
+        True while calls would be rejected (open and still cooling down, or a probe is already in flight)
+        """
+        with self._lock:
+            if self.state == self.OPEN:
+                return time.monotonic() - self.opened_at < self.cooldown
+            return self.state == self.HALF_OPEN and self._probing
+
+    def allow(self) -> bool:
+        with self._lock:
+            if self.state == self.CLOSED:
+                return True
+            if self.state == self.OPEN and time.monotonic() - self.opened_at >= self.cooldown:
+                self.state = self.HALF_OPEN
+                self._probing = False
+            if self.state == self.HALF_OPEN and not self._probing:
+                self._probing = True
+                return True
+            return False
+
+    def record_success(self, latency: float = 0.0):
+        if self.slow_call_seconds is not None and latency > self.slow_call_seconds:
+            self.record_failure()
+            return
+        with self._lock:
+            self.failures = 0
+            self.state = self.CLOSED
+            self._probing = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.state == self.HALF_OPEN or self.failures >= self.failure_threshold:
+                if self.state != self.OPEN:
+                    print(f"Circuit breaker opened after {self.failures} failed or slow calls")
+                self.state = self.OPEN
+                self.opened_at = time.monotonic()
+                self._probing = False
+
+    def call(self, func: Callable):
+        """
+        Call `func` through the breaker
+
+        Raises
+        ------
+        CircuitOpenError
+            If the breaker is open
+        """
+        if not self.allow():
+            raise CircuitOpenError("AI provider circuit is open")
+        start = time.perf_counter()
+        try:
+            result = func()
+        except Exception:
+            self.record_failure()
+            raise
+        self.record_success(time.perf_counter() - start)
+        return result
+
+
+class LatencyTracker:
+    """
+    LatencyTracker keeps the most recent `window` latencies per key
+    """
+
+    def __init__(self, window: int = 200, min_samples: int = 20):
+        self.window = window
+        self.min_samples = min_samples
+        self._samples: dict[str, deque] = {}
+
+    def add(self, key: str, latency: float):
+        self._samples.setdefault(key, deque(maxlen=self.window)).append(latency)
+
+    def percentile(self, key: str, pct: float) -> Optional[float]:
+        """
+        Latency at percentile `pct` (0-100), or None until `min_samples` samples exist
+        """
+        samples = self._samples.get(key)
+        if not samples or len(samples) < self.min_samples:
+            return None
+        ordered = sorted(samples)
+        index = min(len(ordered) - 1, int(len(ordered) * pct / 100))
+        return ordered[index]
+
+
+def hedged(executor: Executor, func: Callable, delay: Optional[float]):
+    """
+    Run `func`; if it has not finished after `delay` seconds, start a duplicate and return whichever succeeds first
+
+    Parameters
+    ----------
+    executor: Executor
+        Pool used to run the calls
+    func: Callable
+        The call to make (must be safe to duplicate)
+    delay: Optional[float]
+        Seconds to wait before hedging, or None to call once without hedging
+    """
+    if delay is None:
+        return func()
+    pending = {executor.submit(func)}
+    done, pending = wait(pending, timeout=delay)
+    if not done:
+        pending.add(executor.submit(func))
+
+    error = None
+    while True:
+        for future in done:
+            if future.exception() is None:
+                return future.result()
+            error = future.exception()
+        if not pending:
+            raise error
+        done, pending = wait(pending, return_when=FIRST_COMPLETED)
@@ -1,11 +1,31 @@
+import argparse
+import os
 import uvicorn
 import socket
 
 hostname = socket.gethostname()
 
 if __name__ == "__main__":
-    print("""--------------------------\n
+    parser = argparse.ArgumentParser(description="Run the demo api")
+    parser.add_argument("--prod", action="store_true",
+                        help="Production mode (also enabled by APP_ENV=production)")
+    args = parser.parse_args()
+
+    if args.prod or os.getenv("APP_ENV") == "production":
+        # Question sessions and classes live in process memory, so keep one worker per app replica unless
+        # every request for a class reaches the same worker
+        workers = int(os.getenv("WEB_CONCURRENCY", "1"))
+        print(f"""--------------------------\n
+    Running demo api (production) on {hostname} with {workers} worker(s)
+    \n----------------------------
+    """)
+        uvicorn.run(app="api:api", host=os.getenv("HOST", "0.0.0.0"), port=int(os.getenv("PORT", "8000")),
+                    workers=workers, proxy_headers=True, forwarded_allow_ips="*",
+                    # seconds to let open requests finish on SIGTERM before the app's shutdown drain starts
+                    timeout_graceful_shutdown=int(os.getenv("GRACEFUL_TIMEOUT", "10")))
+    else:
+        print("""--------------------------\n
     Running demo api with uvicorn
     \n----------------------------
     """)
-    uvicorn.run(app="api:api", host="localhost", port=8000, reload=False)
+        uvicorn.run(app="api:api", host="localhost", port=8000, reload=False)
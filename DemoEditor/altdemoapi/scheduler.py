@@ -0,0 +1,174 @@
+"""
+Question auto-end scheduler
+
+Deadlines for timed questions are kept in a Redis sorted set (member = question id, score = unix deadline)
+so that every worker sees the same schedule and a restart does not lose it. A single polling loop per
+worker claims due entries with ZREM -- only the worker whose ZREM removes the member fires the callback,
+which makes the auto-end happen exactly once across workers. When Redis is unavailable the schedule
+falls back to an in-memory dict with the same semantics.
+
+Classes
+-------
+QuestionScheduler:
+    Central deadline scheduler for question auto-end
+"""
+
+import asyncio
+import time
+from typing import Awaitable, Callable, Optional
+
+DEADLINES_KEY = "question_deadlines"
+
+
+class QuestionScheduler:
+    """
+    QuestionScheduler keeps one deadline per active question and fires `on_due` exactly once per deadline
+        - schedule: register or move a deadline
+        - cancel: drop a deadline (manual end)
+        - fire_now: claim a deadline immediately (e.g. all students responded)
+    """
+
+    def __init__(self, on_due: Callable[[str], Awaitable[None]], poll_interval: float = 0.5):
+        self.on_due = on_due
+        self.poll_interval = poll_interval
+        self.redis = None
+        self._local: dict[str, float] = {}
+        self._task: Optional[asyncio.Task] = None
+
+    def attach(self, redis_client):
+        """
+        Attach (or detach with None) the shared Redis client
+
+        Parameters
+        ----------
+        redis_client:
+            redis.asyncio client or None for the in-memory fallback
+        """
+        self.redis = redis_client
+
+    async def schedule(self, question_id, duration: Optional[float]):
+        """
+        Register the deadline for a question `duration` seconds from now
+
+        Parameters
+        ----------
+        question_id:
+            Identifier of the active question
+        duration: Optional[float]
+            Seconds until the question should auto-end, or None for no deadline
+            (the entry can then only be fired with `fire_now` or dropped with `cancel`)
+        """
+        member = str(question_id)
+        deadline = time.time() + duration if duration is not None else float("inf")
+        if self.redis is not None:
+            try:
+                await self.redis.zadd(DEADLINES_KEY, {member: deadline})
+                return
+            except Exception as e:
+                print(f"Scheduler: redis zadd failed ({e}), using in-memory schedule")
+        self._local[member] = deadline
+
+    async def cancel(self, question_id) -> bool:
+        """
+        Remove the deadline for a question without firing it
+
+        Returns
+        -------
+        bool
+            True if a pending deadline was removed
+        """
+        return await self._claim(str(question_id))
+
+    async def fire_now(self, question_id) -> bool:
+        """
+        Claim the deadline for a question and fire it immediately
+
+        Returns
+        -------
+        bool
+            True if this call fired the callback, False if it was already claimed elsewhere
+        """
+        member = str(question_id)
+        if not await self._claim(member):
+            return False
+        await self._fire(member)
+        return True
+
+    async def _claim(self, member: str) -> bool:
+        """
+        Atomically remove a deadline -- the caller that removes it owns the firing
+        """
+        claimed = self._local.pop(member, None) is not None
+        if self.redis is not None:
+            try:
+                claimed = bool(await self.redis.zrem(DEADLINES_KEY, member)) or claimed
+            except Exception as e:
+                print(f"Scheduler: redis zrem failed ({e})")
+        return claimed
+
+    async def _due(self) -> list[str]:
+        now = time.time()
+        due = [member for member, deadline in self._local.items() if deadline <= now]
+        if self.redis is not None:
+            try:
+                due.extend(await self.redis.zrangebyscore(DEADLINES_KEY, 0, now))
+            except Exception as e:
+                print(f"Scheduler: redis zrangebyscore failed ({e})")
+        return due
+
+    async def _fire(self, member: str):
+        try:
+            await self.on_due(member)
+        except Exception as e:
+            print(f"Scheduler: auto-end for question {member} failed: {e}")
+
+    async def _claim_many(self, members: list[str]) -> list[str]:
+        """
+        Claim several deadlines in one pipelined round trip, returning the members this worker won
+        """
+        claimed = [member for member in members if self._local.pop(member, None) is not None]
+        remote = [member for member in members if member not in claimed]
+        if self.redis is not None and remote:
+            try:
+                async with self.redis.pipeline(transaction=False) as pipe:
+                    for member in remote:
+                        pipe.zrem(DEADLINES_KEY, member)
+                    removed = await pipe.execute()
+                claimed.extend(member for member, count in zip(remote, removed) if count)
+            except Exception as e:
+                print(f"Scheduler: redis zrem failed ({e})")
+        return claimed
+
+    async def tick(self):
+        """
+        Fire every deadline that is due and claimed by this worker
+        """
+        due = await self._due()
+        if not due:
+            return
+        for member in await self._claim_many(list(dict.fromkeys(due))):
+            await self._fire(member)
+
+    async def _run(self):
+        while True:
+            await self.tick()
+            await asyncio.sleep(self.poll_interval)
+
+    def start(self):
+        """
+        Start the polling loop on the running event loop
+        """
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """
+        Stop the polling loop -- pending deadlines stay in Redis for the next worker
+        """
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
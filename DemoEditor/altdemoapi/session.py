@@ -1,39 +1,70 @@
 import ai_utils
 import time
 from typing import Optional
+from submission import Submission
+from similarity import SimilarityIndex
 
 
 class Session:
     def __init__(self):
         self.prompt = ""
-        self.answers: dict[str, tuple[str, ai_utils.ResponseTemplate]] = {}
+        self.answers: dict[str, Submission] = {}
+        # MinHash/LSH index of the answers for near-duplicate lookups and grouping
+        self.similarity = SimilarityIndex()
         self.agent = None  # Lazy initialize to avoid failures on import
         self.skills: dict[str, list[str]] = {}
         self.num_students = 0
         
         # Track active question metadata
         self.current_question_id: Optional[str] = None
+        self.class_id: Optional[str] = None
         self.current_duration: Optional[int] = None  # in seconds
         self.start_time: Optional[float] = None  # unix timestamp
         self.expected_student_count: int = 0
         self.last_response_time: Optional[float] = None  # Track when last response was received
         self.last_response_count: int = 0  # Track previous response count
         self.no_new_responses_threshold: float = 3.0  # seconds of no new responses to trigger auto-end
+
+        # Bumped on every mutation so readers can cache serialized snapshots per version
+        self.version: int = 0
+        # Monotonic submission sequence -- each stored Submission records the sequence it was added at
+        self.sequence: int = 0
+
+    def _touch(self):
+        self.version += 1
         
     def add_student(self):
         self.num_students += 1
+        self._touch()
 
     def new_prompt(self, prompt: str):
         self.prompt = prompt
+        self._touch()
 
     def has_prompt(self) -> bool:
         return self.prompt != ""
 
     def add_answer(self, user_id: str, answer, ai_response: ai_utils.ResponseTemplate):
-        self.answers[user_id] = answer, ai_response
+        # Keep only the parsed feedback sections -- the raw response text is not needed after parsing
+        self.sequence += 1
+        self.answers[user_id] = Submission.from_response(user_id, answer, ai_response, self.sequence)
+        self.similarity.add(user_id, answer)
         self.last_response_time = time.time()  # Update when we get a new response
+        self._touch()
     
-    def start_question(self, question_id: str, duration: Optional[int], expected_students: int = 0):
+    def attach_feedback(self, user_id: str, seq: int, ai_response) -> bool:
+        """
+        Attach AI feedback to a stored answer graded in the background
+        Ignored (returns False) if the student has submitted again since answer `seq`
+        """
+        submission = self.answers.get(user_id)
+        if submission is None or submission.seq != seq:
+            return False
+        self.add_answer(user_id, submission.code, ai_response)
+        return True
+
+    def start_question(self, question_id: str, duration: Optional[int], expected_students: int = 0,
+                       class_id: Optional[str] = None):
         """
         Mark a question as active and start the timer
         
@@ -45,14 +76,19 @@ class Session:
             Duration in seconds, or None for unlimited
         expected_students : int
             Expected number of students (for auto-end feature)
+        class_id : Optional[str]
+            Class the question was asked in
         """
         self.current_question_id = question_id
+        self.class_id = class_id
         self.current_duration = duration
         self.start_time = time.time()
         self.expected_student_count = expected_students
         self.last_response_time = None
         self.last_response_count = 0
         self.answers = {}  # Clear previous answers
+        self.similarity.clear()
+        self._touch()
     
     def get_time_remaining(self) -> Optional[float]:
         """
@@ -66,6 +102,15 @@ class Session:
         remaining = self.current_duration - elapsed
         return max(0, remaining)
     
+    def expected_reached(self) -> bool:
+        """
+        Check if an active question has received responses from every expected student
+        Only meaningful when expected_student_count is set
+        """
+        if self.current_question_id is None or self.expected_student_count <= 0:
+            return False
+        return len(self.answers) >= self.expected_student_count
+
     def check_all_responded(self) -> bool:
         """
         Check if all expected students have responded.
@@ -120,7 +165,64 @@ class Session:
         self.expected_student_count = 0
         self.last_response_time = None
         self.last_response_count = 0
+        self._touch()
 
     def get_answers(self):
-        answers = [self.answers[student][0] for student in self.answers]
+        answers = [submission.code for submission in self.answers.values()]
         return answers
+
+    def get_answer_groups(self, key) -> dict[str, tuple[str, list[str]]]:
+        """
+        Group students whose stored answers are the same program
+
+        Parameters
+        ----------
+        key: Callable
+            Maps code to a program key (e.g. a hash of the cleaned code)
+
+        Returns
+        -------
+        dict
+            {program key: (code, [student emails])}
+        """
+        groups: dict[str, tuple[str, list[str]]] = {}
+        for submission in self.answers.values():
+            code = submission.code
+            groups.setdefault(key(code), (code, []))[1].append(submission.student)
+        return groups
+
+    def get_answer_page(self, since: int = 0, limit: Optional[int] = None) -> dict:
+        """
+        Get submissions added or changed after sequence number `since`, oldest first
+
+        Parameters
+        ----------
+        since: int
+            Sequence number already seen by the caller (0 for everything)
+        limit: Optional[int]
+            Maximum number of submissions to return, or None for no limit
+
+        Returns
+        -------
+        dict
+            - submissions: list of {student, seq, code, feedback}
+            - next_cursor: sequence number to pass as `since` for the next page, or None when caught up
+            - latest_seq: newest sequence number in the session
+        """
+        changed = sorted((sub for sub in self.answers.values() if sub.seq > since), key=lambda sub: sub.seq)
+        has_more = limit is not None and len(changed) > limit
+        if has_more:
+            changed = changed[:limit]
+
+        submissions = [{
+            "student": sub.student,
+            "seq": sub.seq,
+            "code": sub.code,
+            "feedback": sub.summary(),
+        } for sub in changed]
+
+        return {
+            "submissions": submissions,
+            "next_cursor": changed[-1].seq if has_more else None,
+            "latest_seq": self.sequence,
+        }
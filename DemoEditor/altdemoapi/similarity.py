@@ -0,0 +1,273 @@
+"""
+Submission similarity index
+
+Code is normalized through its AST -- comments and docstrings dropped, user-defined names renamed in order
+of first use -- so submissions that differ only in naming or formatting look the same. The normalized
+token stream is cut into shingles, summarized as a MinHash signature and filed into locality-sensitive
+hashing (LSH) buckets. Looking up similar submissions touches only the student's buckets and compares a
+handful of signatures instead of every pair.
+
+Functions
+---------
+normalize_source:
+    Canonical source text for a code sample (identifiers renamed, comments and docstrings removed)
+
+Classes
+-------
+SimilarityIndex:
+    Incremental MinHash/LSH index of submissions keyed by student
+"""
+
+import ast
+import builtins
+import hashlib
+import io
+import random
+import re
+import tokenize
+from typing import Optional
+
+NUM_PERM = 64
+BANDS = 16
+SHINGLE_SIZE = 4
+
+_PRIME = (1 << 61) - 1
+_MAX_HASH = (1 << 32) - 1
+_TOKEN = re.compile(r"\w+|[^\w\s]")
+_KEEP_NAMES = frozenset(dir(builtins)) | {"self", "cls"}
+
+
+class _Renamer(ast.NodeTransformer):
+    """
+    Rename user-defined identifiers to v0, v1, ... in order of first appearance
+    Builtins and imported module names are kept, as are attribute names (method calls are part of the shape)
+    """
+
+    def __init__(self):
+        self.names: dict[str, str] = {}
+        self.keep = set(_KEEP_NAMES)
+        self.defined: set[str] = set()
+
+    def _rename(self, name: str) -> str:
+        if name in self.keep:
+            return name
+        return self.names.setdefault(name, f"v{len(self.names)}")
+
+    def visit_Import(self, node):
+        for alias in node.names:
+            if alias.asname:
+                alias.asname = self._rename(alias.asname)
+            else:
+                self.keep.add(alias.name.split(".")[0])
+        return node
+
+    def visit_ImportFrom(self, node):
+        for alias in node.names:
+            if alias.asname:
+                alias.asname = self._rename(alias.asname)
+            else:
+                self.keep.add(alias.name)
+        return node
+
+    def visit_Name(self, node):
+        node.id = self._rename(node.id)
+        return node
+
+    def visit_Module(self, node):
+        # Functions and classes the student defines, wherever they appear: only their keyword arguments
+        # name parameters that get renamed
+        self.defined = {child.name for child in ast.walk(node)
+                        if isinstance(child, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef))}
+        return self.generic_visit(node)
+
+    def visit_Call(self, node):
+        user_defined = isinstance(node.func, ast.Name) and node.func.id in self.defined
+        self.generic_visit(node)
+        # Keywords of other calls (print(end=...), sorted(key=...)) are part of the program's meaning
+        if user_defined:
+            for keyword in node.keywords:
+                if keyword.arg is not None:
+                    keyword.arg = self._rename(keyword.arg)
+        return node
+
+    def visit_arg(self, node):
+        node.arg = self._rename(node.arg)
+        node.annotation = None
+        return node
+
+    def _visit_definition(self, node):
+        node.name = self._rename(node.name)
+        body = node.body
+        if body and isinstance(body[0], ast.Expr) and isinstance(body[0].value, ast.Constant) \
+                and isinstance(body[0].value.value, str):
+            node.body = body[1:] or [ast.Pass()]
+        return self.generic_visit(node)
+
+    visit_FunctionDef = _visit_definition
+    visit_AsyncFunctionDef = _visit_definition
+    visit_ClassDef = _visit_definition
+
+    def visit_Global(self, node):
+        node.names = [self._rename(name) for name in node.names]
+        return node
+
+    visit_Nonlocal = visit_Global
+
+
+def _strip_comments(code: str) -> str:
+    try:
+        tokens = [token for token in tokenize.generate_tokens(io.StringIO(code).readline)
+                  if token.type != tokenize.COMMENT]
+        return tokenize.untokenize(tokens)
+    except (tokenize.TokenError, IndentationError, SyntaxError):
+        return re.sub(r"#[^\n]*", "", code)
+
+
+def normalize_source(code: str) -> str:
+    """
+    Canonical form of a code sample -- equal for programs that differ only in names, comments or layout
+
+    Code that does not parse falls back to the source with comments and blank space collapsed
+    """
+    code = code.replace("\r", "")
+    try:
+        tree = ast.parse(code)
+    except (SyntaxError, ValueError):
+        return " ".join(_strip_comments(code).split())
+    if tree.body and isinstance(tree.body[0], ast.Expr) and isinstance(tree.body[0].value, ast.Constant) \
+            and isinstance(tree.body[0].value.value, str):
+        tree.body = tree.body[1:]
+    return ast.unparse(_Renamer().visit(tree))
+
+
+def _stable_hash(text: str) -> int:
+    return int.from_bytes(hashlib.blake2b(text.encode(), digest_size=8).digest(), "big")
+
+
+class SimilarityIndex:
+    """
+    SimilarityIndex keeps one MinHash signature per student
+        - add: (re)index a student's code; unchanged code is skipped
+        - similar: students whose estimated Jaccard similarity to a student is at least `threshold`
+        - groups: clusters of mutually reachable similar students
+    Signatures are split into `bands` bands of `num_perm / bands` rows; two students become candidates
+    when any band matches exactly, which favours pairs above roughly (1 / bands) ** (bands / num_perm)
+    similarity.
+    """
+
+    def __init__(self, num_perm: int = NUM_PERM, bands: int = BANDS, shingle_size: int = SHINGLE_SIZE):
+        if num_perm % bands:
+            raise ValueError("num_perm must be a multiple of bands")
+        self.num_perm = num_perm
+        self.bands = bands
+        self.rows = num_perm // bands
+        self.shingle_size = shingle_size
+        generator = random.Random(num_perm)
+        self._permutations = [(generator.randrange(1, _PRIME), generator.randrange(0, _PRIME))
+                              for _ in range(num_perm)]
+        self._code_hashes: dict[str, int] = {}
+        self._signatures: dict[str, tuple[int, ...]] = {}
+        self._buckets: dict[tuple, set[str]] = {}
+
+    def __len__(self) -> int:
+        return len(self._signatures)
+
+    def shingles(self, code: str) -> set[int]:
+        tokens = _TOKEN.findall(normalize_source(code))
+        if len(tokens) <= self.shingle_size:
+            return {_stable_hash(" ".join(tokens))} if tokens else set()
+        return {_stable_hash(" ".join(tokens[i:i + self.shingle_size]))
+                for i in range(len(tokens) - self.shingle_size + 1)}
+
+    def signature(self, code: str) -> tuple[int, ...]:
+        shingles = self.shingles(code)
+        if not shingles:
+            return (_MAX_HASH,) * self.num_perm
+        return tuple(min(((a * shingle + b) % _PRIME) & _MAX_HASH for shingle in shingles)
+                     for a, b in self._permutations)
+
+    def _band_keys(self, signature: tuple[int, ...]) -> list[tuple]:
+        return [(band, signature[band * self.rows:(band + 1) * self.rows]) for band in range(self.bands)]
+
+    def add(self, key: str, code: str):
+        """
+        Index (or re-index) the code submitted under `key`
+        """
+        code_hash = hash(code)
+        if self._code_hashes.get(key) == code_hash:
+            return
+        self.remove(key)
+        signature = self.signature(code)
+        self._code_hashes[key] = code_hash
+        self._signatures[key] = signature
+        for band_key in self._band_keys(signature):
+            self._buckets.setdefault(band_key, set()).add(key)
+
+    def remove(self, key: str):
+        signature = self._signatures.pop(key, None)
+        self._code_hashes.pop(key, None)
+        if signature is None:
+            return
+        for band_key in self._band_keys(signature):
+            bucket = self._buckets.get(band_key)
+            if bucket is not None:
+                bucket.discard(key)
+                if not bucket:
+                    del self._buckets[band_key]
+
+    def clear(self):
+        self._code_hashes.clear()
+        self._signatures.clear()
+        self._buckets.clear()
+
+    def estimate(self, first: str, second: str) -> float:
+        """
+        Estimated Jaccard similarity of two indexed submissions
+        """
+        a, b = self._signatures[first], self._signatures[second]
+        return sum(x == y for x, y in zip(a, b)) / self.num_perm
+
+    def _candidates(self, key: str) -> set[str]:
+        candidates = set()
+        for band_key in self._band_keys(self._signatures[key]):
+            candidates |= self._buckets.get(band_key, set())
+        candidates.discard(key)
+        return candidates
+
+    def similar(self, key: str, threshold: float = 0.5, limit: Optional[int] = None) -> list[tuple[str, float]]:
+        """
+        Students whose submission resembles `key`'s, most similar first
+
+        Returns
+        -------
+        list
+            (student, estimated similarity) pairs at or above `threshold`; empty if `key` is not indexed
+        """
+        if key not in self._signatures:
+            return []
+        matches = [(other, self.estimate(key, other)) for other in self._candidates(key)]
+        matches = sorted((match for match in matches if match[1] >= threshold), key=lambda match: -match[1])
+        return matches[:limit] if limit is not None else matches
+
+    def groups(self, threshold: float = 0.8) -> list[list[str]]:
+        """
+        Cluster students linked by similarity at or above `threshold`, largest group first
+        Students with no similar submission form groups of one
+        """
+        parent = {key: key for key in self._signatures}
+
+        def find(key: str) -> str:
+            while parent[key] != key:
+                parent[key] = parent[parent[key]]
+                key = parent[key]
+            return key
+
+        for key in self._signatures:
+            for other in self._candidates(key):
+                if self.estimate(key, other) >= threshold:
+                    parent[find(other)] = find(key)
+
+        clusters: dict[str, list[str]] = {}
+        for key in self._signatures:
+            clusters.setdefault(find(key), []).append(key)
+        return sorted((sorted(members) for members in clusters.values()), key=lambda members: -len(members))
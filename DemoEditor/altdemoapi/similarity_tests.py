@@ -0,0 +1,63 @@
+import unittest
+from similarity import SimilarityIndex, normalize_source
+
+TOTAL = '''def total(nums):
+    """Add up the numbers"""
+    s = 0
+    for n in nums:  # running sum
+        s += n
+    return s
+print(total([1, 2, 3]))
+'''
+
+RENAMED = '''def add_all(values):
+    acc = 0
+    for v in values:
+        acc += v
+    return acc
+print(add_all([1, 2, 3]))
+'''
+
+WORD_COUNT = '''words = input().split()
+counts = {}
+for w in words:
+    counts[w] = counts.get(w, 0) + 1
+print(sorted(counts.items()))
+'''
+
+
+class NormalizeTests(unittest.TestCase):
+
+    def test_names_and_comments_ignored(self):
+        self.assertEqual(normalize_source(TOTAL), normalize_source(RENAMED))
+
+    def test_builtins_kept(self):
+        self.assertIn("print(", normalize_source(RENAMED))
+
+    def test_unparsable_code(self):
+        self.assertEqual("def f(: pass", normalize_source("def f(:  # broken\n    pass"))
+
+
+class SimilarityIndexTests(unittest.TestCase):
+
+    def setUp(self):
+        self.index = SimilarityIndex()
+        self.index.add("a", TOTAL)
+        self.index.add("b", RENAMED)
+        self.index.add("c", WORD_COUNT)
+
+    def test_similar(self):
+        self.assertEqual([("b", 1.0)], self.index.similar("a"))
+        self.assertEqual([], self.index.similar("c"))
+
+    def test_groups(self):
+        self.assertEqual([["a", "b"], ["c"]], self.index.groups())
+
+    def test_reindex(self):
+        self.index.add("b", WORD_COUNT)
+        self.assertEqual([], self.index.similar("a"))
+        self.assertEqual([("c", 1.0)], self.index.similar("b"))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,204 @@
+"""
+Skill analytics
+
+Skill labels from graded answers are normalized and folded into running rollups as feedback arrives, so
+dashboards read pre-aggregated counts instead of re-running categorization or scanning submissions:
+    - per class: count of each skill across the students' latest answers to every question
+    - per class and time bucket: the same counts split by when the answers were graded
+    - per student: skill counts and a bounded history of graded answers
+Only a student's latest graded answer to a question counts -- a regraded answer replaces its previous
+labels in every rollup. Rollups are Redis hashes under `skills:<class>:...`, mirrored in memory for when
+Redis is unavailable.
+
+Functions
+---------
+normalize_label:
+    Canonical form of a skill label
+
+Classes
+-------
+SkillAnalytics:
+    Incremental skill rollups with dashboard reads
+"""
+
+import json
+import re
+import time
+from collections import Counter, deque
+from typing import Iterable, Optional
+
+DEFAULT_CLASS = "default"
+_NON_LABEL = re.compile(r"[^\w\s+#/-]")
+
+
+def normalize_label(label: str, aliases: Optional[dict[str, str]] = None) -> str:
+    """
+    Lower-case a label, drop markdown and punctuation, collapse whitespace, then apply `aliases`
+    ('**For-Loops:**' -> 'for-loops'; with aliases {'for-loops': 'loops'} -> 'loops')
+    """
+    normalized = " ".join(_NON_LABEL.sub(" ", label).casefold().split()).strip("-/ ")
+    if aliases:
+        return aliases.get(normalized, normalized)
+    return normalized
+
+
+class SkillAnalytics:
+    """
+    SkillAnalytics keeps skill rollups per class, time bucket and student
+        - record: fold a graded answer's skills into the rollups (replacing that answer's earlier labels)
+        - class_skills / timeline / student_skills: dashboard reads
+    """
+
+    def __init__(self, bucket_seconds: int = 86400, history_limit: int = 100,
+                 aliases: Optional[dict[str, str]] = None):
+        self.bucket_seconds = bucket_seconds
+        self.history_limit = history_limit
+        self.aliases = {normalize_label(label): normalize_label(canonical)
+                        for label, canonical in (aliases or {}).items()}
+        self.redis = None
+        self._hashes: dict[str, Counter] = {}
+        self._lists: dict[str, deque] = {}
+        self._answers: dict[str, dict] = {}
+        self._buckets: dict[str, set[int]] = {}
+
+    def attach(self, redis_client):
+        self.redis = redis_client
+
+    @staticmethod
+    def _prefix(class_id: Optional[str]) -> str:
+        return f"skills:{class_id or DEFAULT_CLASS}"
+
+    def labels(self, skills: Iterable[str]) -> list[str]:
+        """
+        Normalized, de-duplicated labels in first-seen order
+        """
+        return list(dict.fromkeys(label for label in (normalize_label(skill, self.aliases) for skill in skills)
+                                  if label))
+
+    async def _previous(self, answer_key: str) -> Optional[dict]:
+        if self.redis is not None:
+            try:
+                stored = await self.redis.get(answer_key)
+                return json.loads(stored) if stored else None
+            except Exception as e:
+                print(f"Skill analytics: redis read failed ({e})")
+        return self._answers.get(answer_key)
+
+    async def record(self, class_id: Optional[str], student: str, question_id, skills: Iterable[str],
+                     graded_at: Optional[float] = None):
+        """
+        Fold a graded answer into the rollups
+
+        Parameters
+        ----------
+        class_id: Optional[str]
+            Class the question was asked in
+        student: str
+            Student email
+        question_id:
+            Question the answer belongs to
+        skills: Iterable[str]
+            Raw skill labels from the feedback (empty for a correct answer)
+        graded_at: Optional[float]
+            Unix time of grading, defaults to now
+        """
+        prefix = self._prefix(class_id)
+        graded_at = graded_at if graded_at is not None else time.time()
+        bucket = int(graded_at // self.bucket_seconds * self.bucket_seconds)
+        labels = self.labels(skills)
+        answer_key = f"{prefix}:answer:{question_id}:{student}"
+        previous = await self._previous(answer_key)
+
+        changes: list[tuple[str, str, int]] = []
+        if previous is not None:
+            for label in previous["skills"]:
+                changes += [(f"{prefix}:totals", label, -1), (f"{prefix}:bucket:{previous['bucket']}", label, -1),
+                            (f"{prefix}:student:{student}", label, -1)]
+        for label in labels:
+            changes += [(f"{prefix}:totals", label, 1), (f"{prefix}:bucket:{bucket}", label, 1),
+                        (f"{prefix}:student:{student}", label, 1)]
+        answer = {"skills": labels, "bucket": bucket}
+        event = json.dumps({"question_id": str(question_id), "graded_at": graded_at, "skills": labels})
+
+        for key, label, delta in changes:
+            self._hashes.setdefault(key, Counter())[label] += delta
+        self._answers[answer_key] = answer
+        self._buckets.setdefault(prefix, set()).add(bucket)
+        self._lists.setdefault(f"{prefix}:history:{student}", deque(maxlen=self.history_limit)).append(event)
+
+        if self.redis is None:
+            return
+        try:
+            async with self.redis.pipeline(transaction=False) as pipe:
+                for key, label, delta in changes:
+                    pipe.hincrby(key, label, delta)
+                pipe.set(answer_key, json.dumps(answer))
+                pipe.zadd(f"{prefix}:buckets", {str(bucket): bucket})
+                pipe.sadd(f"{prefix}:students", student)
+                pipe.rpush(f"{prefix}:history:{student}", event)
+                pipe.ltrim(f"{prefix}:history:{student}", -self.history_limit, -1)
+                await pipe.execute()
+        except Exception as e:
+            print(f"Skill analytics: redis write failed ({e}), rollup kept in memory")
+
+    async def _read_hash(self, key: str) -> dict[str, int]:
+        if self.redis is not None:
+            try:
+                return {label: int(count) for label, count in (await self.redis.hgetall(key)).items()}
+            except Exception as e:
+                print(f"Skill analytics: redis read failed ({e})")
+        return dict(self._hashes.get(key, {}))
+
+    @staticmethod
+    def _ranked(counts: dict[str, int], top: Optional[int] = None) -> list[dict]:
+        ranked = sorted(((label, count) for label, count in counts.items() if count > 0),
+                        key=lambda item: (-item[1], item[0]))
+        return [{"skill": label, "count": count} for label, count in ranked[:top]]
+
+    async def class_skills(self, class_id: Optional[str], top: Optional[int] = None) -> list[dict]:
+        """
+        Skills across the class's latest graded answers, most common first
+        """
+        return self._ranked(await self._read_hash(f"{self._prefix(class_id)}:totals"), top)
+
+    async def timeline(self, class_id: Optional[str], since: Optional[float] = None,
+                       top: Optional[int] = None) -> list[dict]:
+        """
+        Skill counts per time bucket, oldest bucket first
+
+        Returns
+        -------
+        list
+            [{"start": bucket start (unix time), "skills": [{"skill", "count"}]}]
+        """
+        prefix = self._prefix(class_id)
+        low = since if since is not None else "-inf"
+        starts = None
+        if self.redis is not None:
+            try:
+                starts = [int(start) for start in await self.redis.zrangebyscore(f"{prefix}:buckets", low, "+inf")]
+            except Exception as e:
+                print(f"Skill analytics: redis read failed ({e})")
+        if starts is None:
+            starts = sorted(start for start in self._buckets.get(prefix, ()) if since is None or start >= since)
+        return [{"start": start, "skills": self._ranked(await self._read_hash(f"{prefix}:bucket:{start}"), top)}
+                for start in starts]
+
+    async def student_skills(self, class_id: Optional[str], student: str) -> dict:
+        """
+        A student's skill counts and recent graded answers (newest last)
+        """
+        prefix = self._prefix(class_id)
+        history = None
+        if self.redis is not None:
+            try:
+                history = await self.redis.lrange(f"{prefix}:history:{student}", 0, -1)
+            except Exception as e:
+                print(f"Skill analytics: redis read failed ({e})")
+        if history is None:
+            history = list(self._lists.get(f"{prefix}:history:{student}", ()))
+        return {
+            "student": student,
+            "skills": self._ranked(await self._read_hash(f"{prefix}:student:{student}")),
+            "history": [json.loads(event) for event in history],
+        }
@@ -0,0 +1,79 @@
+"""
+Versioned response snapshots for hot polling routes
+
+Readers ask for a snapshot by key (route name, session version, ...). The first reader for a key builds
+and serializes the payload once; every later reader for the same key gets the cached bytes and ETag.
+Because the key includes the session version, any mutation of the session makes old snapshots unreachable.
+
+Classes
+-------
+Snapshot:
+    Pre-serialized JSON body and its ETag
+SnapshotCache:
+    Small bounded cache of snapshots keyed by version
+"""
+
+import hashlib
+import json
+from collections import OrderedDict
+from typing import Any, Callable
+
+
+class Snapshot:
+    """
+    Pre-serialized response body
+    """
+
+    __slots__ = ("body", "etag")
+
+    def __init__(self, body: bytes):
+        self.body = body
+        self.etag = '"' + hashlib.blake2b(body, digest_size=8).hexdigest() + '"'
+
+    def matches(self, if_none_match) -> bool:
+        """
+        Check an If-None-Match header value against this snapshot's ETag
+
+        Parameters
+        ----------
+        if_none_match:
+            Raw header value (may list several tags, or be None)
+        """
+        if not if_none_match:
+            return False
+        tags = [tag.strip().removeprefix("W/") for tag in if_none_match.split(",")]
+        return self.etag in tags or "*" in tags
+
+
+class SnapshotCache:
+    """
+    SnapshotCache maps snapshot keys to serialized bodies, evicting the oldest keys past `max_entries`
+    """
+
+    def __init__(self, max_entries: int = 64):
+        self.max_entries = max_entries
+        self._snapshots: OrderedDict[tuple, Snapshot] = OrderedDict()
+
+    def get(self, key: tuple, builder: Callable[[], Any]) -> Snapshot:
+        """
+        Return the snapshot for `key`, building and serializing it with `builder` on a miss
+
+        Parameters
+        ----------
+        key: tuple
+            Hashable key -- must change whenever the payload would change
+        builder: Callable
+            Returns a JSON-serializable payload
+        """
+        snapshot = self._snapshots.get(key)
+        if snapshot is not None:
+            self._snapshots.move_to_end(key)
+            return snapshot
+        snapshot = Snapshot(json.dumps(builder(), separators=(",", ":"), default=str).encode())
+        self._snapshots[key] = snapshot
+        while len(self._snapshots) > self.max_entries:
+            self._snapshots.popitem(last=False)
+        return snapshot
+
+    def clear(self):
+        self._snapshots.clear()
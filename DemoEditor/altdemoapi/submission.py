@@ -0,0 +1,152 @@
+"""
+Compact submission records
+
+A Submission keeps one student's latest answer: the code plus only the parsed feedback sections.
+The raw AI response text is dropped once parsed, skill labels are interned (the same few labels repeat
+across a whole class), and the sections are stored as tuples. When serialized, the code and problem lines
+(the bulk of the bytes) go through `codec` and are only decompressed when first read back.
+
+Classes
+-------
+Submission:
+    Slotted record for one student answer with Redis (JSON) and MySQL (row) serialization
+"""
+
+import codec
+import json
+import sys
+import time
+from typing import Optional
+
+
+class Submission:
+    """
+    Submission stores a student answer and its parsed feedback
+        - problems: tuple of problem lines
+        - skills: tuple of (label, description) pairs
+        - correct: True when the AI marked the code correct, None when no feedback is available
+    """
+
+    __slots__ = ("student", "_code", "seq", "correct", "_problems", "skills", "submitted_at")
+
+    def __init__(self, student: str, code, seq: int = 0, correct: Optional[bool] = None,
+                 problems=(), skills: tuple = (), submitted_at: Optional[float] = None):
+        self.student = student
+        self._code = code
+        self.seq = seq
+        self.correct = correct
+        self._problems = problems if isinstance(problems, codec.LazyText) else tuple(problems)
+        self.skills = tuple((sys.intern(label), description) for label, description in skills)
+        self.submitted_at = submitted_at if submitted_at is not None else time.time()
+
+    @classmethod
+    def from_response(cls, student: str, code: str, ai_response, seq: int = 0) -> "Submission":
+        """
+        Build a submission from the output of Agent.run_checker
+
+        Parameters
+        ----------
+        student: str
+            Student email
+        code: str
+            Submitted code
+        ai_response:
+            None (no feedback), a string (code marked correct) or a ResponseTemplate
+        seq: int
+            Session sequence number of this submission
+        """
+        if ai_response is None or getattr(ai_response, "fallback", False):
+            return cls(student, code, seq)
+        if isinstance(ai_response, str):
+            return cls(student, code, seq, correct=True)
+        return cls(student, code, seq, correct=False,
+                   problems=ai_response.problem_section.internal,
+                   skills=ai_response.skill_section.internal.items())
+
+    @property
+    def code(self) -> str:
+        if isinstance(self._code, codec.LazyText):
+            self._code = self._code.value
+        return self._code
+
+    @property
+    def problems(self) -> tuple:
+        if isinstance(self._problems, codec.LazyText):
+            self._problems = tuple(json.loads(self._problems.value))
+        return self._problems
+
+    @property
+    def has_feedback(self) -> bool:
+        return self.correct is not None
+
+    def skill_dict(self) -> dict[str, str]:
+        return dict(self.skills)
+
+    def summary(self) -> dict:
+        """
+        Small feedback summary sent with each submission to the teacher dashboard
+        """
+        if not self.has_feedback:
+            return {"available": False}
+        return {
+            "available": True,
+            "correct": self.correct,
+            "problem_count": len(self.problems),
+            "skills": [label for label, _ in self.skills],
+        }
+
+    def _encoded_code(self) -> str:
+        return self._code.encoded if isinstance(self._code, codec.LazyText) else codec.encode(self._code)
+
+    def _encoded_problems(self) -> str:
+        if isinstance(self._problems, codec.LazyText):
+            return self._problems.encoded
+        return codec.encode(json.dumps(list(self._problems), separators=(",", ":")))
+
+    def to_list(self) -> list:
+        """
+        Positional form used by both serializers -- order matches __slots__
+        """
+        return [self.student, self._encoded_code(), self.seq, self.correct, self._encoded_problems(),
+                [list(skill) for skill in self.skills], self.submitted_at]
+
+    @classmethod
+    def from_list(cls, values: list) -> "Submission":
+        student, code, seq, correct, problems, skills, submitted_at = values
+        return cls(student, codec.LazyText(code), seq, correct, codec.LazyText(problems), skills, submitted_at)
+
+    def to_json(self) -> str:
+        """
+        Serialize for Redis as a compact JSON array
+        """
+        return json.dumps(self.to_list(), separators=(",", ":"))
+
+    @classmethod
+    def from_json(cls, data: str) -> "Submission":
+        return cls.from_list(json.loads(data))
+
+    def to_row(self, question_id) -> dict:
+        """
+        Parameters for load.QUERIES.insert_submission
+        """
+        return {
+            "question_id": str(question_id),
+            "student_email": self.student,
+            "seq": self.seq,
+            "code": self._encoded_code(),
+            "correct": self.correct,
+            "problems": self._encoded_problems(),
+            "skills": json.dumps([list(skill) for skill in self.skills], separators=(",", ":")),
+        }
+
+    @classmethod
+    def from_row(cls, row: tuple) -> "Submission":
+        """
+        Build a submission from a `submissions` row selected as
+        (student_email, code, seq, correct, problems, skills, submitted_at)
+        """
+        student, code, seq, correct, problems, skills, submitted_at = row
+        if hasattr(submitted_at, "timestamp"):
+            submitted_at = submitted_at.timestamp()
+        return cls(student, codec.LazyText(code), seq, None if correct is None else bool(correct),
+                   codec.LazyText(problems or "[]"), json.loads(skills or "[]"), submitted_at)
@@ -0,0 +1,147 @@
+"""
+Submission persistence
+
+Every stored answer (and the same answer again once its feedback arrives) is saved under the question it
+was submitted to. Redis keeps the latest record per student in a hash (`submissions:<question_id>`, the
+compact JSON form of `Submission`, expiring after `ttl` seconds) so any worker can read a question back
+right away. MySQL gets the same records write-behind: saves are buffered and written every
+`flush_interval` seconds in one multi-row upsert, so a burst of submissions costs one round trip. Rows
+that fail to write stay buffered (unless a newer save replaced them) and are retried on the next flush.
+
+Classes
+-------
+SubmissionStore:
+    Write-behind persistence of submissions to Redis and MySQL, with reads falling back from one to the other
+"""
+
+import asyncio
+import threading
+from typing import Any, Callable, Optional
+
+import database
+import load
+from submission import Submission
+
+
+class SubmissionStore:
+    """
+    SubmissionStore saves submissions per question
+        - save: Redis right away, MySQL on the next flush
+        - load: a question's submissions, oldest first -- from Redis, else MySQL
+        - start / stop: background flushing; stop writes whatever is still buffered
+    """
+
+    def __init__(self, db_factory: Callable[[], Any] = database.Database, ttl: int = 86400,
+                 flush_interval: float = 1.0, batch_size: int = 200):
+        self.db_factory = db_factory
+        self.ttl = ttl
+        self.flush_interval = flush_interval
+        self.batch_size = batch_size
+        self.redis = None
+        self._db = None
+        self._db_lock = threading.Lock()
+        self._db_failing = False
+        self._buffer: dict[tuple[str, str], dict] = {}
+        # One flush at a time, so an older batch never lands after a newer one
+        self._flush_lock = asyncio.Lock()
+        self._task: Optional[asyncio.Task] = None
+
+    def attach(self, redis_client):
+        self.redis = redis_client
+
+    @staticmethod
+    def _key(question_id) -> str:
+        return f"submissions:{question_id}"
+
+    async def save(self, question_id, submission: Submission):
+        """
+        Persist a submission under the question it answers
+        """
+        if question_id is None:
+            return
+        row = submission.to_row(question_id)
+        self._buffer[(row["question_id"], row["student_email"])] = row
+        if self.redis is not None:
+            try:
+                async with self.redis.pipeline(transaction=False) as pipe:
+                    pipe.hset(self._key(question_id), submission.student, submission.to_json())
+                    pipe.expire(self._key(question_id), self.ttl)
+                    await pipe.execute()
+            except Exception as e:
+                print(f"Submission store: redis write failed ({e})")
+        if len(self._buffer) >= self.batch_size:
+            await self.flush()
+
+    def _call(self, method: str, *args, **kwargs):
+        with self._db_lock:
+            if self._db is None:
+                self._db = self.db_factory()
+            try:
+                return getattr(self._db, method)(*args, **kwargs)
+            except Exception:
+                # Reconnect on the next call rather than reusing a connection in an unknown state
+                self._db = None
+                raise
+
+    async def flush(self):
+        """
+        Write the buffered rows to MySQL
+        """
+        async with self._flush_lock:
+            if not self._buffer:
+                return
+            batch, self._buffer = self._buffer, {}
+            try:
+                await asyncio.to_thread(self._call, "execute_many", load.QUERIES.insert_submission,
+                                        list(batch.values()))
+            except Exception as e:
+                if not self._db_failing:
+                    print(f"Submission store: database write failed ({e}), will retry")
+                self._db_failing = True
+                for key, row in batch.items():
+                    self._buffer.setdefault(key, row)
+                return
+            if self._db_failing:
+                print("Submission store: database writes resumed")
+            self._db_failing = False
+
+    async def load(self, question_id) -> list[Submission]:
+        """
+        Submissions to a question, oldest first
+        """
+        if self.redis is not None:
+            try:
+                stored = await self.redis.hgetall(self._key(question_id))
+                if stored:
+                    return sorted((Submission.from_json(data) for data in stored.values()),
+                                  key=lambda submission: submission.seq)
+            except Exception as e:
+                print(f"Submission store: redis read failed ({e})")
+        rows = await asyncio.to_thread(self._call, "execute", load.QUERIES.get_question_submissions,
+                                       {"question_id": str(question_id)})
+        submissions = {submission.student: submission for submission in map(Submission.from_row, rows)}
+        # Saves not yet flushed are newer than what MySQL has
+        for (buffered_question, student), row in self._buffer.items():
+            if buffered_question == str(question_id):
+                submissions[student] = Submission.from_row((student, row["code"], row["seq"], row["correct"],
+                                                            row["problems"], row["skills"], None))
+        return sorted(submissions.values(), key=lambda submission: submission.seq)
+
+    async def _flush_loop(self):
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            await self.flush()
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._flush_loop())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self.flush()
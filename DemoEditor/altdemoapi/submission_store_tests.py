@@ -0,0 +1,94 @@
+import asyncio
+import datetime
+import unittest
+
+from submission import Submission
+from submission_store import SubmissionStore
+
+
+class FakeDatabase:
+    """
+    Just enough of database.Database for the submissions table
+    """
+
+    def __init__(self):
+        self.rows = {}
+        self.batches = []
+        self.failing = False
+
+    def execute_many(self, query, rows):
+        if self.failing:
+            raise RuntimeError("database down")
+        self.batches.append(len(rows))
+        for row in rows:
+            self.rows[(row["question_id"], row["student_email"])] = row
+        return len(rows)
+
+    def execute(self, query, params, fetch_one=False, commit=False):
+        submitted_at = datetime.datetime(2026, 1, 1)
+        return [(row["student_email"], row["code"], row["seq"], row["correct"], row["problems"], row["skills"],
+                 submitted_at)
+                for (question_id, _), row in sorted(self.rows.items(), key=lambda item: item[1]["seq"])
+                if question_id == params["question_id"]]
+
+
+def submission(student: str, seq: int, code: str = "print(1)\n" * 100) -> Submission:
+    return Submission(student, code, seq, correct=False, problems=["off by one"],
+                      skills=[("loops", "iterate fully")])
+
+
+class SubmissionStoreTests(unittest.TestCase):
+
+    def setUp(self):
+        self.db = FakeDatabase()
+        self.store = SubmissionStore(db_factory=lambda: self.db)
+
+    def test_saves_flush_in_one_batch(self):
+        async def run():
+            for seq in range(1, 31):
+                await self.store.save("q1", submission(f"s{seq}@example.edu", seq))
+            await self.store.flush()
+            return await self.store.load("q1")
+
+        loaded = asyncio.run(run())
+        self.assertEqual([30], self.db.batches)
+        self.assertEqual(list(range(1, 31)), [entry.seq for entry in loaded])
+        self.assertEqual("print(1)\n" * 100, loaded[0].code)
+        self.assertEqual(("off by one",), loaded[0].problems)
+        self.assertEqual({"loops": "iterate fully"}, loaded[0].skill_dict())
+
+    def test_failed_flush_is_retried_keeping_newer_saves(self):
+        async def run():
+            await self.store.save("q1", submission("ada@example.edu", 1, "old"))
+            self.db.failing = True
+            await self.store.flush()
+            await self.store.save("q1", submission("ada@example.edu", 2, "new"))
+            unflushed = await self.store.load("q1")
+            self.db.failing = False
+            await self.store.flush()
+            return unflushed
+
+        unflushed = asyncio.run(run())
+        self.assertEqual(["new"], [entry.code for entry in unflushed])
+        self.assertEqual([1], self.db.batches)
+        self.assertEqual(2, self.db.rows[("q1", "ada@example.edu")]["seq"])
+
+    def test_stored_code_is_compressed(self):
+        async def run():
+            await self.store.save("q1", submission("ada@example.edu", 1))
+            await self.store.flush()
+
+        asyncio.run(run())
+        row = self.db.rows[("q1", "ada@example.edu")]
+        self.assertTrue(row["code"].startswith("\x00"))
+        self.assertLess(len(row["code"]), len("print(1)\n" * 100))
+
+    def test_json_round_trip(self):
+        original = submission("ada@example.edu", 3)
+        copy = Submission.from_json(original.to_json())
+        self.assertEqual((original.student, original.seq, original.code, original.problems, original.skills),
+                         (copy.student, copy.seq, copy.code, copy.problems, copy.skills))
+
+
+if __name__ == "__main__":
+    unittest.main()
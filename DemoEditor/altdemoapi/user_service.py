@@ -0,0 +1,287 @@
+"""
+User accounts and class rosters
+
+Lookups by user id, email and Google id are served from a short-lived in-memory cache in front of the
+`users` table, so the per-request `get_current_user` check does not hit MySQL. Logins that arrive
+together -- a whole class signing in at the start of a lesson -- are folded into one multi-row upsert
+and one SELECT instead of a round trip pair per student, and a login whose profile is unchanged is
+answered from the cache without writing at all. Rosters are imported from CSV in batched upserts.
+
+Database calls are blocking (pymysql), so they run on a worker thread over one shared connection.
+
+Classes
+-------
+UserService:
+    Cached user lookups, batched login upserts, role updates and roster import
+"""
+
+import asyncio
+import csv
+import io
+import threading
+import time
+from typing import Any, Callable, Optional
+
+import database
+import load
+
+ROLES = ("teacher", "student")
+USER_FIELDS = ("user_id", "google_id", "email", "name", "picture_url", "role")
+
+
+class UserService:
+    """
+    UserService wraps the `users` and `class_rosters` tables
+        - get_user_by_id / get_user_by_email: cached for `cache_ttl` seconds
+        - create_or_update_user: upsert on login, batched over `batch_window` seconds (up to `batch_size`)
+        - update_user_role: validated role change, refreshes the cache
+        - import_roster / get_roster: bulk class membership from CSV
+    """
+
+    def __init__(self, db_factory: Callable[[], Any] = database.Database, cache_ttl: float = 300,
+                 batch_window: float = 0.02, batch_size: int = 200):
+        self.db_factory = db_factory
+        self.cache_ttl = cache_ttl
+        self.batch_window = batch_window
+        self.batch_size = batch_size
+        self._db = None
+        self._db_lock = threading.Lock()
+        self._users: dict[int, tuple[float, dict]] = {}
+        self._ids_by_email: dict[str, int] = {}
+        self._ids_by_google_id: dict[str, int] = {}
+        self._pending: dict[str, tuple[dict, asyncio.Future]] = {}
+        self._flush_task: Optional[asyncio.Task] = None
+
+    # Database access
+
+    def _call(self, method: str, *args, **kwargs):
+        with self._db_lock:
+            if self._db is None:
+                self._db = self.db_factory()
+            try:
+                return getattr(self._db, method)(*args, **kwargs)
+            except Exception:
+                # Reconnect on the next call rather than reusing a connection in an unknown state
+                self._db = None
+                raise
+
+    async def _execute(self, query: load.Query, params: dict[str, Any], **kwargs):
+        return await asyncio.to_thread(self._call, "execute", query, params, **kwargs)
+
+    async def _execute_many(self, query: load.Query, rows: list[dict[str, Any]]) -> int:
+        return await asyncio.to_thread(self._call, "execute_many", query, rows)
+
+    # Cache
+
+    @staticmethod
+    def _row_to_user(row) -> dict:
+        return dict(zip(USER_FIELDS, row))
+
+    def _remember(self, user: dict) -> dict:
+        self._users[user["user_id"]] = (time.monotonic() + self.cache_ttl, user)
+        self._ids_by_email[user["email"].casefold()] = user["user_id"]
+        self._ids_by_google_id[user["google_id"]] = user["user_id"]
+        return user
+
+    def _cached(self, user_id: Optional[int]) -> Optional[dict]:
+        entry = self._users.get(user_id)
+        if entry is None:
+            return None
+        if entry[0] < time.monotonic():
+            self.forget(user_id)
+            return None
+        return entry[1]
+
+    def forget(self, user_id: int):
+        """
+        Drop a user from the cache (the next lookup reads the database)
+        """
+        entry = self._users.pop(user_id, None)
+        if entry is not None:
+            user = entry[1]
+            self._ids_by_email.pop(user["email"].casefold(), None)
+            self._ids_by_google_id.pop(user["google_id"], None)
+
+    # Lookups
+
+    async def get_user_by_id(self, user_id: int) -> Optional[dict]:
+        """
+        User by id, or None if there is no such user
+        """
+        user = self._cached(user_id)
+        if user is not None:
+            return user
+        row = await self._execute(load.QUERIES.get_user_by_id, {"user_id": user_id}, fetch_one=True)
+        return self._remember(self._row_to_user(row)) if row else None
+
+    async def get_user_by_email(self, email: str) -> Optional[dict]:
+        """
+        User by email (case-insensitive), or None if no user has logged in with it
+        """
+        user = self._cached(self._ids_by_email.get(email.strip().casefold()))
+        if user is not None:
+            return user
+        row = await self._execute(load.QUERIES.get_user_by_email, {"email": email.strip()}, fetch_one=True)
+        return self._remember(self._row_to_user(row)) if row else None
+
+    # Logins
+
+    async def create_or_update_user(self, google_user_info: dict) -> dict:
+        """
+        Insert or refresh the user for a verified Google login
+
+        Parameters
+        ----------
+        google_user_info: dict
+            {google_id, email, name, picture} as returned by the OAuth service
+
+        Returns
+        -------
+        dict
+            The stored user: {user_id, google_id, email, name, picture_url, role}
+        """
+        login = {
+            "google_id": str(google_user_info["google_id"]),
+            "email": google_user_info["email"],
+            "name": google_user_info.get("name") or google_user_info["email"],
+            "picture_url": google_user_info.get("picture"),
+        }
+        cached = self._cached(self._ids_by_google_id.get(login["google_id"]))
+        if cached is not None and all(cached[field] == value for field, value in login.items()):
+            return cached
+
+        pending = self._pending.get(login["google_id"])
+        if pending is not None:
+            # Same account logging in twice in one batch -- the newer profile wins, both callers share the row
+            self._pending[login["google_id"]] = (login, pending[1])
+            return await asyncio.shield(pending[1])
+
+        future = asyncio.get_running_loop().create_future()
+        self._pending[login["google_id"]] = (login, future)
+        if len(self._pending) >= self.batch_size:
+            if self._flush_task is not None:
+                self._flush_task.cancel()
+            self._flush_task = asyncio.create_task(self._flush())
+        elif self._flush_task is None:
+            self._flush_task = asyncio.create_task(self._flush_later())
+        return await asyncio.shield(future)
+
+    async def _flush_later(self):
+        await asyncio.sleep(self.batch_window)
+        await self._flush()
+
+    async def _flush(self):
+        # Logins arriving from here on start the next batch
+        self._flush_task = None
+        batch, self._pending = self._pending, {}
+        if not batch:
+            return
+        logins = [login for login, _ in batch.values()]
+        try:
+            await self._execute_many(load.QUERIES.upsert_user, logins)
+            rows = await self._execute(load.QUERIES.get_users_by_logins, {
+                "google_ids": tuple(login["google_id"] for login in logins),
+                "emails": tuple(login["email"] for login in logins),
+            })
+        except Exception as e:
+            for _, future in batch.values():
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        by_google_id, by_email = {}, {}
+        for row in rows:
+            user = self._remember(self._row_to_user(row))
+            by_google_id[user["google_id"]] = user
+            by_email[user["email"].casefold()] = user
+        for google_id, (login, future) in batch.items():
+            # An email already registered under another Google id keeps that account
+            user = by_google_id.get(google_id) or by_email.get(login["email"].casefold())
+            if future.done():
+                continue
+            if user is None:
+                future.set_exception(RuntimeError(f"user {login['email']} was not stored"))
+            else:
+                future.set_result(user)
+
+    # Roles
+
+    async def update_user_role(self, user_id: int, role: str) -> bool:
+        """
+        Set a user's role
+
+        Returns
+        -------
+        bool
+            False if `role` is not one of ROLES or the user does not exist
+        """
+        if role not in ROLES:
+            return False
+        await asyncio.to_thread(self._call, "execute", load.QUERIES.update_user_role,
+                                {"role": role, "user_id": user_id}, commit=True)
+        self.forget(user_id)
+        return await self.get_user_by_id(user_id) is not None
+
+    # Rosters
+
+    @staticmethod
+    def parse_roster(csv_text: str, default_role: str = "student") -> tuple[list[dict], list[int]]:
+        """
+        Parse a roster CSV
+
+        The file may have a header naming `email`, `name` and `role` columns (in any order, other columns
+        ignored); without a header the columns are taken as email, name, role. Emails are
+        de-duplicated case-insensitively, later rows winning.
+
+        Returns
+        -------
+        tuple
+            ([{email, name, role}], line numbers of rows skipped for a missing or invalid email or role)
+        """
+        rows = list(csv.reader(io.StringIO(csv_text.lstrip("\ufeff"))))
+        columns = {"email": 0, "name": 1, "role": 2}
+        start = 0
+        if rows:
+            header = [cell.strip().casefold() for cell in rows[0]]
+            if "email" in header:
+                columns = {field: header.index(field) for field in columns if field in header}
+                start = 1
+
+        def cell(row: list[str], field: str) -> str:
+            index = columns.get(field)
+            return row[index].strip() if index is not None and index < len(row) else ""
+
+        entries: dict[str, dict] = {}
+        skipped = []
+        for line, row in enumerate(rows[start:], start=start + 1):
+            if not any(value.strip() for value in row):
+                continue
+            email = cell(row, "email")
+            role = cell(row, "role").casefold() or default_role
+            if "@" not in email or role not in ROLES:
+                skipped.append(line)
+                continue
+            entries[email.casefold()] = {"email": email, "name": cell(row, "name") or None, "role": role}
+        return list(entries.values()), skipped
+
+    async def import_roster(self, class_id: str, csv_text: str) -> dict:
+        """
+        Add (or update) the students in a roster CSV to a class, `batch_size` rows per statement
+
+        Returns
+        -------
+        dict
+            {"imported": number of roster entries written, "skipped": line numbers that were not valid}
+        """
+        entries, skipped = self.parse_roster(csv_text)
+        rows = [dict(entry, class_id=class_id) for entry in entries]
+        for start in range(0, len(rows), self.batch_size):
+            await self._execute_many(load.QUERIES.upsert_roster_entry, rows[start:start + self.batch_size])
+        return {"imported": len(rows), "skipped": skipped}
+
+    async def get_roster(self, class_id: str) -> list[dict]:
+        """
+        Roster of a class, sorted by email
+        """
+        rows = await self._execute(load.QUERIES.get_class_roster, {"class_id": class_id})
+        return [dict(zip(("email", "name", "role"), row)) for row in rows]
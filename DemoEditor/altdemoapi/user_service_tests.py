@@ -0,0 +1,90 @@
+import asyncio
+import unittest
+from user_service import UserService
+
+ROSTER = '''Name,Email,Role
+Ada Lovelace,ada@example.edu,
+Alan Turing,alan@example.edu,teacher
+No Email,,
+Grace Hopper,ADA@example.edu,student
+Bad Role,bad@example.edu,admin
+'''
+
+
+class FakeDatabase:
+    """
+    Just enough of database.Database for the users table: counts round trips
+    """
+
+    def __init__(self):
+        self.users = {}
+        self.calls = []
+
+    def execute_many(self, query, rows):
+        self.calls.append(query.name)
+        for row in rows:
+            user = self.users.setdefault(row["google_id"], {"user_id": len(self.users) + 1, "role": "student"})
+            user.update(row)
+        return len(rows)
+
+    def execute(self, query, params, fetch_one=False, commit=False):
+        self.calls.append(query.name)
+        rows = [(u["user_id"], google_id, u["email"], u["name"], u["picture_url"], u["role"])
+                for google_id, u in self.users.items()]
+        if query.name == "get_users_by_logins":
+            return [row for row in rows if row[1] in params["google_ids"]]
+        if query.name == "get_user_by_id":
+            return next((row for row in rows if row[0] == params["user_id"]), None)
+        raise AssertionError(query.name)
+
+
+def login(number: int, name: str = "Student") -> dict:
+    return {"google_id": f"g{number}", "email": f"s{number}@example.edu", "name": name, "picture": None}
+
+
+class UserServiceTests(unittest.TestCase):
+
+    def setUp(self):
+        self.db = FakeDatabase()
+        self.service = UserService(db_factory=lambda: self.db, batch_window=0.01)
+
+    def test_concurrent_logins_share_one_upsert(self):
+        async def run():
+            return await asyncio.gather(*(self.service.create_or_update_user(login(n)) for n in range(30)))
+
+        users = asyncio.run(run())
+        self.assertEqual([f"s{n}@example.edu" for n in range(30)], [user["email"] for user in users])
+        self.assertEqual(["upsert_user", "get_users_by_logins"], self.db.calls)
+
+    def test_cached_lookups(self):
+        async def run():
+            user = await self.service.create_or_update_user(login(1))
+            again = await self.service.create_or_update_user(login(1))
+            by_id = await self.service.get_user_by_id(user["user_id"])
+            by_email = await self.service.get_user_by_email("S1@example.edu")
+            renamed = await self.service.create_or_update_user(login(1, name="Renamed"))
+            return user, again, by_id, by_email, renamed
+
+        user, again, by_id, by_email, renamed = asyncio.run(run())
+        self.assertEqual(user, again)
+        self.assertEqual(user, by_id)
+        self.assertEqual(user, by_email)
+        self.assertEqual("Renamed", renamed["name"])
+        self.assertEqual(["upsert_user", "get_users_by_logins"] * 2, self.db.calls)
+
+    def test_parse_roster(self):
+        entries, skipped = UserService.parse_roster(ROSTER)
+        self.assertEqual([{"email": "ADA@example.edu", "name": "Grace Hopper", "role": "student"},
+                          {"email": "alan@example.edu", "name": "Alan Turing", "role": "teacher"}],
+                         sorted(entries, key=lambda entry: entry["email"]))
+        self.assertEqual([4, 6], skipped)
+
+    def test_parse_roster_without_header(self):
+        entries, skipped = UserService.parse_roster("ada@example.edu,Ada\nalan@example.edu\n")
+        self.assertEqual([{"email": "ada@example.edu", "name": "Ada", "role": "student"},
+                          {"email": "alan@example.edu", "name": None, "role": "student"}], entries)
+        self.assertEqual([], skipped)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,132 @@
+"""
+Worker service for queued jobs (see jobs.py)
+
+Usage
+-----
+    python worker.py exec    # runs student code
+    python worker.py ai      # AI grading
+
+A worker runs `--concurrency` consumers (WORKER_CONCURRENCY; defaults to the CPU count for exec and 8 for ai)
+and sends a heartbeat so the API only queues work while a worker is alive. On SIGTERM/SIGINT it stops
+taking jobs, finishes the ones it is running and exits; jobs still queued are left for other workers.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import signal
+import socket
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from redis.asyncio import Redis
+
+import code_executor
+from jobs import REPLY_TTL, WORKER_HEARTBEAT_SECONDS, WORKER_TTL, queue_key, workers_key
+from redis_client import REDIS_URL
+
+_agent = None
+_agent_lock = threading.Lock()
+
+
+def grade(payload: dict) -> dict:
+    """
+    Job handler for the "ai" queue -- {"prompt", "code", "language"} -> Agent.checker_result_to_dict
+    """
+    global _agent
+    import ai_utils
+
+    with _agent_lock:
+        if _agent is None:
+            _agent = ai_utils.Agent()
+    result = _agent.run_checker(payload["prompt"], payload["code"], payload.get("language", "python"))
+    return ai_utils.Agent.checker_result_to_dict(result)
+
+
+HANDLERS = {"exec": code_executor.execute, "ai": grade}
+DEFAULT_CONCURRENCY = {"exec": os.cpu_count() or 1, "ai": 8}
+
+
+async def _heartbeat(redis_client: Redis, role: str, worker_id: str, stopping: asyncio.Event):
+    while not stopping.is_set():
+        now = time.time()
+        try:
+            async with redis_client.pipeline(transaction=False) as pipe:
+                pipe.zadd(workers_key(role), {worker_id: now})
+                pipe.zremrangebyscore(workers_key(role), "-inf", now - WORKER_TTL)
+                await pipe.execute()
+        except Exception as e:
+            print(f"Worker {worker_id}: heartbeat failed ({e})")
+        try:
+            await asyncio.wait_for(stopping.wait(), WORKER_HEARTBEAT_SECONDS)
+        except asyncio.TimeoutError:
+            pass
+
+
+async def _consume(redis_client: Redis, role: str, executor: ThreadPoolExecutor, stopping: asyncio.Event):
+    handler = HANDLERS[role]
+    loop = asyncio.get_running_loop()
+    while not stopping.is_set():
+        try:
+            item = await redis_client.blpop(queue_key(role), timeout=1)
+        except Exception as e:
+            print(f"Worker {role}: queue read failed ({e})")
+            await asyncio.sleep(1)
+            continue
+        if item is None:
+            continue
+
+        job = json.loads(item[1])
+        if job["deadline"] < time.time():
+            # The caller stopped waiting and ran the job itself
+            continue
+        try:
+            reply = {"id": job["id"], "result": await loop.run_in_executor(executor, handler, job["payload"])}
+        except Exception as e:
+            reply = {"id": job["id"], "error": f"{type(e).__name__}: {e}"}
+        try:
+            async with redis_client.pipeline(transaction=False) as pipe:
+                pipe.rpush(job["reply_to"], json.dumps(reply))
+                pipe.expire(job["reply_to"], REPLY_TTL)
+                await pipe.execute()
+        except Exception as e:
+            print(f"Worker {role}: could not send reply for job {job['id']} ({e})")
+
+
+async def serve(role: str, concurrency: int):
+    worker_id = f"{socket.gethostname()}-{os.getpid()}-{uuid.uuid4().hex[:6]}"
+    redis_client = Redis.from_url(REDIS_URL, decode_responses=True, max_connections=concurrency + 2)
+    executor = ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix=f"{role}-job")
+    stopping = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGTERM, signal.SIGINT):
+        loop.add_signal_handler(sig, stopping.set)
+
+    print(f"Worker {worker_id}: serving '{role}' jobs with {concurrency} consumers")
+    heartbeat = asyncio.create_task(_heartbeat(redis_client, role, worker_id, stopping))
+    consumers = [asyncio.create_task(_consume(redis_client, role, executor, stopping)) for _ in range(concurrency)]
+
+    await stopping.wait()
+    print(f"Worker {worker_id}: draining")
+    try:
+        # Stop being picked for new jobs before finishing the running ones
+        await redis_client.zrem(workers_key(role), worker_id)
+    except Exception:
+        pass
+    await asyncio.gather(heartbeat, *consumers)
+    executor.shutdown(wait=True)
+    await redis_client.close()
+    print(f"Worker {worker_id}: stopped")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run a job worker")
+    parser.add_argument("role", choices=sorted(HANDLERS))
+    parser.add_argument("--concurrency", type=int, default=None,
+                        help="Concurrent jobs (default: WORKER_CONCURRENCY, else per-role default)")
+    args = parser.parse_args()
+    concurrency = args.concurrency or int(os.getenv("WORKER_CONCURRENCY", "0")) or DEFAULT_CONCURRENCY[args.role]
+    asyncio.run(serve(args.role, concurrency))
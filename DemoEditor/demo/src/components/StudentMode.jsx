@@ -30,10 +30,24 @@ export default function StudentMode({ email }) {
         fetchProblem();
     }, []);
 
+    // Each student tracks the id of the last problem received; the server returns the next one after it
+    const offsetQuery = () => {
+        const offset = localStorage.getItem("problemOffset");
+        return offset ? `?offset=${encodeURIComponent(offset)}` : "";
+    };
+
+    const consumeProblem = async () => {
+        const response = await fetch(`http://localhost:8000/api/getProblem${offsetQuery()}`);
+        const result = await response.json();
+        if (result.offset) {
+            localStorage.setItem("problemOffset", result.offset);
+        }
+    };
+
     const fetchProblem = async () => {
         try {
             setLoading(true);
-            const response = await fetch("http://localhost:8000/api/peekProblem");
+            const response = await fetch(`http://localhost:8000/api/peekProblem${offsetQuery()}`);
             const result = await response.json();
             console.log("Peeked problem:", result);
 
@@ -48,7 +62,7 @@ export default function StudentMode({ email }) {
                     setHasSubmitted(false);
                     setShowTimedModal(true);
                 } else {
-                    await fetch("http://localhost:8000/api/getProblem");
+                    await consumeProblem();
 
                     setTeacherQuestion(result.prompt);
                     setTimeLimit(null);
@@ -85,7 +99,7 @@ export default function StudentMode({ email }) {
     const handleStartQuiz = async () => {
         if (!pendingQuestion) return;
 
-        await fetch("http://localhost:8000/api/getProblem");
+        await consumeProblem();
 
         setTeacherQuestion(pendingQuestion);
 
@@ -112,6 +126,22 @@ export default function StudentMode({ email }) {
         setPendingDuration(null);
     };
 
+    const fetchFeedback = async (feedbackId) => {
+        for (let attempt = 0; attempt < 10; attempt++) {
+            try {
+                const res = await fetch(`http://localhost:8000/api/feedback/${feedbackId}?wait=25`);
+                const data = await res.json();
+                if (data.feedback_status && data.feedback_status !== "pending") {
+                    setAiResponse(data.ai_response || "");
+                    return;
+                }
+            } catch (err) {
+                console.error("Failed to fetch AI feedback:", err);
+                return;
+            }
+        }
+    };
+
     const submitAnswer = async (codeArg, email) => {
         console.log(email);
 
@@ -157,6 +187,10 @@ export default function StudentMode({ email }) {
                 setAiResponse(feedback);
                 setShowOutputModal(true);
                 setShowTimedModal(false);
+                // AI feedback is produced in the background -- wait for it and update the modal
+                if (data.feedback_status === "pending" && data.feedback_id) {
+                    fetchFeedback(data.feedback_id);
+                }
             } else {
                 alert("Submission failed. Check console and try again.");
             }
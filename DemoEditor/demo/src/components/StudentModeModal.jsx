@@ -21,10 +21,24 @@ export default function StudentMode({ email }) {
     fetchProblem();
   }, []);
 
+  // Each student tracks the id of the last problem received; the server returns the next one after it
+  const offsetQuery = () => {
+    const offset = localStorage.getItem("problemOffset");
+    return offset ? `?offset=${encodeURIComponent(offset)}` : "";
+  };
+
+  const consumeProblem = async () => {
+    const response = await fetch(`http://localhost:8000/api/getProblem${offsetQuery()}`);
+    const result = await response.json();
+    if (result.offset) {
+      localStorage.setItem("problemOffset", result.offset);
+    }
+  };
+
   const fetchProblem = async () => {
     try {
       setLoading(true);
-      const response = await fetch("http://localhost:8000/api/peekProblem");
+      const response = await fetch(`http://localhost:8000/api/peekProblem${offsetQuery()}`);
       const result = await response.json();
       console.log("Peeked problem:", result);
 
@@ -39,7 +53,7 @@ export default function StudentMode({ email }) {
           setHasSubmitted(false);
           setShowTimedModal(true);
         } else {
-          await fetch("http://localhost:8000/api/getProblem");
+          await consumeProblem();
 
           setTeacherQuestion(result.prompt);
           setTimeLimit(null);
@@ -76,7 +90,7 @@ export default function StudentMode({ email }) {
   const handleStartQuiz = async () => {
     if (!pendingQuestion) return;
 
-    await fetch("http://localhost:8000/api/getProblem");
+    await consumeProblem();
 
     setTeacherQuestion(pendingQuestion);
 